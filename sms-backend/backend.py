@@ -1,21 +1,36 @@
 from fastapi import FastAPI, Form, Response, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 import uvicorn
 import uuid
 from datetime import datetime
 import random
 import os
+import time
 import asyncio
-import json
-import websockets
+import gzip
 import requests
 from dotenv import load_dotenv
 
 # Import modular services
-from models import Signal
+from models import Signal, Subscription, Team
 from services.intelligence import IntelligenceEngine
 from services.mock_data import MockDataGenerator
+from services.pushbullet_stream import PushbulletStreamConsumer
+from services import export
+from services.rollups import RESOLUTIONS
+from services.admission import AdmissionController, PRIORITY_VERIFICATION, PRIORITY_BACKGROUND, classify
+from services.infrastructure import InfrastructureGraph
+from services.osm_layers import OSMLayerStore, LAYERS
+from services.subscriptions import SubscriptionRegistry
+from services.rasters import RasterProxies
+from services.sar import SARStack, CoherenceChangeDetector
+from services.dispatch import DispatchQueue
+from services.spool import SpoolIngestor, read_spool
+from services.readmodel import ReadModel
+from services.rules import RuleSet, RuleFile, DEFAULT_RULES
+from services.tracing import Tracer, current_trace
+from services.edge import EdgeOutbox, EdgeSync, EdgeReceiver
 
 # Load environment variables from .env file
 load_dotenv()
@@ -23,6 +38,30 @@ load_dotenv()
 # Pushbullet Config
 PUSHBULLET_API_KEY = os.getenv("PUSHBULLET_API_KEY")
 PUSHBULLET_DEVICE_ID = os.getenv("PUSHBULLET_DEVICE_ID")
+PUSHBULLET_STREAM_URL = os.getenv("PUSHBULLET_STREAM_URL", "wss://stream.pushbullet.com/websocket/")
+PUSHBULLET_API_URL = os.getenv("PUSHBULLET_API_URL", "https://api.pushbullet.com/v2")
+
+# Local infrastructure network (substations, water plants, pipe segments -> sectors)
+INFRA_GEOJSON = os.getenv("SADA_INFRA_GEOJSON", os.path.join(os.path.dirname(__file__), "data", "khartoum_infrastructure.geojson"))
+# Local OSM extract (.osm, .osm.gz, .geojson) for the offline water/power map layers
+OSM_EXTRACT = os.getenv("SADA_OSM_EXTRACT", os.path.join(os.path.dirname(__file__), "data", "khartoum_networks.geojson"))
+# Local VIIRS/WAPOR rasters (viirs.npy/.json, wapor.npy/.json) for the Offline Switch; mocked if absent
+RASTER_DIR = os.getenv("SADA_RASTER_DIR", os.path.join(os.path.dirname(__file__), "data", "rasters"))
+# Co-registered Sentinel-1 SLC stacks (pre.npy/.json, post.npy/.json) for coherence change detection
+SAR_DIR = os.getenv("SADA_SAR_DIR", os.path.join(os.path.dirname(__file__), "data", "sar"))
+# Spool directory for offline-delivered CSV/NDJSON batches (USB drops, delayed partner syncs)
+SPOOL_DIR = os.getenv("SADA_SPOOL_DIR", os.path.join(os.path.dirname(__file__), "data", "spool"))
+# Correlation rule table, reloaded when the file changes
+RULES_PATH = os.getenv("SADA_RULES", DEFAULT_RULES)
+# Longest a cluster waits to be re-scored during a burst; 0 scores on every signal
+EVAL_WINDOW_S = float(os.getenv("SADA_EVAL_WINDOW_S", "0.05"))
+# Guardian edge mode: SADA_MODE=edge journals everything this node ingests under SADA_EDGE_DIR and
+# pushes it to SADA_CENTRAL_URL as compressed delta frames; every backend accepts frames on /edge/sync
+EDGE_MODE = os.getenv("SADA_MODE", "central").lower() == "edge"
+CENTRAL_URL = os.getenv("SADA_CENTRAL_URL", "")
+EDGE_DIR = os.getenv("SADA_EDGE_DIR", os.path.join(os.path.dirname(__file__), "data", "edge"))
+# Historical signals (a /export/signals CSV or NDJSON) to warm-start the per-location anomaly baselines
+BASELINE_HISTORY = os.getenv("SADA_BASELINE_HISTORY", os.path.join(os.path.dirname(__file__), "data", "signal_history.csv"))
 
 app = FastAPI()
 
@@ -36,15 +75,60 @@ app.add_middleware(
 )
 
 # Initialize Services
-engine = IntelligenceEngine()
+engine = IntelligenceEngine(
+    infrastructure=InfrastructureGraph.from_geojson(INFRA_GEOJSON) if os.path.exists(INFRA_GEOJSON) else None,
+    rasters=RasterProxies.from_dir(RASTER_DIR),
+    rules=RuleSet.load(RULES_PATH),
+    batch_window_s=EVAL_WINDOW_S,
+)
+rule_file = RuleFile(RULES_PATH, engine.set_rules)
+# Per-report latency traces, receipt -> alert; the most recent SADA_TRACE_CAPACITY are kept
+tracer = Tracer(capacity=int(os.getenv("SADA_TRACE_CAPACITY", "2048")))
+engine.tracer = tracer
+if os.path.exists(BASELINE_HISTORY):
+    # read_spool validates every row: badly typed ones come back as None and are skipped
+    engine.baselines.warm_start(sig for _, sig in read_spool(BASELINE_HISTORY) if sig is not None)
 mock_gen = MockDataGenerator()
+osm_layers = OSMLayerStore.load(OSM_EXTRACT) if os.path.exists(OSM_EXTRACT) else OSMLayerStore()
+edge_outbox = EdgeOutbox(EDGE_DIR, node_id=os.getenv("SADA_NODE_ID")) if EDGE_MODE else None
+edge_sync = EdgeSync(
+    edge_outbox, CENTRAL_URL, engine,
+    max_batch=int(os.getenv("SADA_EDGE_BATCH", "1000")),
+    interval=float(os.getenv("SADA_EDGE_INTERVAL_S", "1.0")),
+    backoff_max=float(os.getenv("SADA_EDGE_BACKOFF_MAX_S", "30.0")),
+) if edge_outbox is not None and CENTRAL_URL else None
+
+def ingest_at_edge(signal: Signal):
+    """Edge mode: ingest locally, then journal what the engine kept for the central."""
+    events = engine.ingest_signal(signal)
+    if not signal.metadata.get("duplicate"):
+        edge_outbox.append(signal)
+    return events
+
+admission = AdmissionController(ingest_at_edge if edge_outbox is not None else engine.ingest_signal,
+                                shed_lag_s=float(os.getenv("SADA_SHED_LAG_S", "2.0")),
+                                tracer=tracer, flush=engine.flush if EVAL_WINDOW_S > 0 else None,
+                                batch_window_s=EVAL_WINDOW_S)
+pushbullet_consumer = None
+# Frames from Guardian nodes arrive late by nature: like spooled data, they are never shed by lag
+edge_receiver = EdgeReceiver(lambda sig: admission.submit(sig, min(classify(sig), PRIORITY_VERIFICATION)))
+subscriptions = SubscriptionRegistry()
+dispatch = DispatchQueue(on_change=engine.touch)
+# GET /events, /signals and /messages are served from immutable snapshots republished after ingest
+read_model = ReadModel(engine, interval=float(os.getenv("SADA_READ_PUBLISH_S", "0.05")))
+# Late-delivered data is never shed by lag: reports keep their class, everything else ranks as verification
+spool = SpoolIngestor(
+    SPOOL_DIR,
+    lambda sig: admission.submit(sig, min(classify(sig), PRIORITY_VERIFICATION)),
+    workers=int(os.getenv("SADA_SPOOL_WORKERS", "2")),
+) if os.path.isdir(SPOOL_DIR) else None
 
 def send_sms_via_pushbullet(to: str, message: str):
     if not PUSHBULLET_API_KEY or not PUSHBULLET_DEVICE_ID:
         print("Pushbullet skipping: Missing API Key or Device ID")
         return False
     try:
-        url = "https://api.pushbullet.com/v2/texts"
+        url = f"{PUSHBULLET_API_URL}/texts"
         headers = {"Access-Token": PUSHBULLET_API_KEY}
         payload = {
             "data": {
@@ -64,22 +148,77 @@ def send_sms_via_pushbullet(to: str, message: str):
         print(f"Pushbullet error: {e}")
         return False
 
+def send_traced_alert(trace_id, to: str, message: str):
+    """Sends an alert (in an executor thread) and records the send in the report's trace."""
+    start = time.perf_counter()
+    ok = send_sms_via_pushbullet(to, message)
+    tracer.record(trace_id, "alert_send", start, ok=ok)
+    return ok
+
+def alert_subscribers(event, change: str):
+    """
+    Engine listener: fans a created/escalated event out to every geofenced
+    subscription it falls in. Sends run off the event loop.
+    """
+    if change == "merged":
+        return
+    trace_id = current_trace.get()
+    start = time.perf_counter()
+    matched = subscriptions.match(event)
+    tracer.record(trace_id, "alert_match", start, subscribers=len(matched))
+    if not matched:
+        return
+    print(f"--- Alerting {len(matched)} subscriber(s) for {change} event {event.id} ---")
+    msg_body = f"SADA ALERT: {event.severity.upper()} {event.type.replace('_', ' ')} in {event.location} ({int(event.confidence * 100)}% confidence)."
+    loop = asyncio.get_running_loop()
+    for sub in matched:
+        loop.run_in_executor(None, send_traced_alert, trace_id, sub.phone, msg_body)
+
+def queue_for_dispatch(event, change: str):
+    """Engine listener: new and escalated events go (back) into the dispatch queue."""
+    if change == "merged":
+        # Folded into another cluster's event; release any team working it
+        dispatch.complete(event.id)
+    else:
+        dispatch.upsert(event)
+    for a in dispatch.dispatch():
+        print(f"--- Dispatched event {a['event_id']} to team {a['team_id']} ({a['distance_km']} km) ---")
+
+engine.event_listeners.append(alert_subscribers)
+engine.event_listeners.append(queue_for_dispatch)
+
 # --- Autonomous Monitoring & Verification Logic ---
 
-async def simulate_verification(location: str, coords: list[float]):
+async def simulate_verification(location: str, coords: list[float], trace_id: str = None):
     """
     Simulates a targeted satellite/sensor sweep triggered by a human report.
-    Delays for effect, then generates corroborating data.
+    Delays for effect, then generates corroborating data. The corroborating
+    signals carry the report's trace ID.
     """
+    start = time.perf_counter()
     await asyncio.sleep(5) # Wait 5 seconds to simulate satellite tasking
-    
-    # 1. Check Nightlights (VIIRS)
-    sat_signal = mock_gen.generate_satellite_nightlight(location, coords)
-    engine.ingest_signal(sat_signal)
+    tracer.record(trace_id, "verification_wait", start)
+    start = time.perf_counter()
+    signals = []
+
+    # 1. Check Nightlights (VIIRS), read from the local raster when there is one
+    sat_signal = engine.rasters.signal("VIIRS", location, coords) if engine.rasters else None
+    signals.append(sat_signal or mock_gen.generate_satellite_nightlight(location, coords))
+
+    # Soil moisture (WAPOR) is only checked when a raster is available
+    if engine.rasters:
+        moisture_signal = engine.rasters.signal("WAPOR", location, coords)
+        if moisture_signal:
+            signals.append(moisture_signal)
     
     # 2. Check Infrastructure Status (Grid)
-    grid_signal = mock_gen.generate_grid_status(location, coords)
-    engine.ingest_signal(grid_signal)
+    signals.append(mock_gen.generate_grid_status(location, coords))
+    tracer.record(trace_id, "verification_fetch", start, sources=[s.source for s in signals])
+
+    for sig in signals:
+        if trace_id:
+            sig.metadata["trace_id"] = trace_id
+        admission.submit(sig, PRIORITY_VERIFICATION)
 
 async def autonomous_monitoring_loop():
     """
@@ -106,15 +245,25 @@ async def autonomous_monitoring_loop():
         # Only ingest if it's actually an anomaly (value check) to reduce noise?
         # The generators randomize anomalies. We'll ingest everything, 
         # but the frontend only cares about what's pushed to the feed/map.
-        engine.ingest_signal(sig)
+        admission.submit(sig, PRIORITY_BACKGROUND)
 
 @app.on_event("startup")
 async def startup_event():
     # Start the autonomous loop in the background
     asyncio.create_task(autonomous_monitoring_loop())
+    # Pick up edits to the rule table without a restart
+    asyncio.create_task(rule_file.run())
+    # Republish read snapshots as ingest moves on
+    asyncio.create_task(read_model.run())
     # Start Pushbullet listener if API key is present
     if PUSHBULLET_API_KEY:
         asyncio.create_task(pushbullet_listener_loop())
+    # Watch the spool directory if one is configured
+    if spool:
+        asyncio.create_task(spool.run())
+    # Guardian node: push the outbox to the central server
+    if edge_sync:
+        asyncio.create_task(edge_sync.run())
 
 # --- SMS Simulator UI ---
 @app.get("/", response_class=HTMLResponse)
@@ -298,11 +447,14 @@ def extract_location(text: str) -> dict:
 
 # --- API Endpoints ---
 
-async def handle_sms_signal(body: str, from_number: str, background_tasks: BackgroundTasks, source: str = "SADA_SMS"):
+async def handle_sms_signal(body: str, from_number: str, background_tasks: BackgroundTasks, source: str = "SADA_SMS",
+                            trace_id: str = None):
     """
     Centralized logic to process SADA SMS reports.
-    Used by both the REST endpoint and the Pushbullet listener.
+    Used by both the REST endpoint and the Pushbullet listener, which start
+    the report's trace at receipt.
     """
+    start = time.perf_counter()
     body = body.strip().upper()
     
     # ULTRA-LOUD LOGGING for REAL PHONE
@@ -332,20 +484,32 @@ async def handle_sms_signal(body: str, from_number: str, background_tasks: Backg
         value=100.0 if report_type == "SOS" else 50.0,
         metadata={"raw_body": body, "report_type": report_type, "sender": from_number}
     )
+    if trace_id:
+        new_signal.metadata["trace_id"] = trace_id
+        tracer.annotate(trace_id, source=source, report_type=report_type, location=loc_data["name"])
+        tracer.record(trace_id, "parse", start)
     
-    # 2. Ingest into Intelligence Engine
-    events = engine.ingest_signal(new_signal)
+    # 2. Ingest into Intelligence Engine (SOS/AID reports jump the ingest queue)
+    events = await admission.submit(new_signal)
+    if events is None:
+        print(f"--- Report shed under overload: {body} ---")
+        tracer.mark(trace_id, "shed")
+        return False
+    if new_signal.metadata.get("duplicate"):
+        print(f"--- Duplicate report suppressed: {body} ---")
+        return False
     
     # 3. Trigger Autonomous Verification (Simulation)
-    background_tasks.add_task(simulate_verification, loc_data["name"], loc_data["coords"])
+    background_tasks.add_task(simulate_verification, loc_data["name"], loc_data["coords"], trace_id)
     
-    # Check if this triggered/updated an event
-    active_events = [e for e in events if e.location == loc_data["name"]]
-    return len(active_events) > 0
+    # Check if this triggered/updated an event: events are keyed by the cluster the report joined
+    return engine.event_for_signal(new_signal) is not None
 
 @app.post("/reciveSms")
 async def getsms(request: Request, background_tasks: BackgroundTasks):
     print("--- DEBUG: Incoming Webhook Request Received ---")
+    start = time.perf_counter()
+    trace_id = tracer.start("sms", channel="http")
     try:
         data = await request.json()
     except:
@@ -354,14 +518,17 @@ async def getsms(request: Request, background_tasks: BackgroundTasks):
         
     body = data.get('message', data.get('Body', '')).strip().upper()
     from_number = data.get('sender', data.get('From', 'Personal Phone'))
+    tracer.record(trace_id, "receive", start)
     
-    event_triggered = await handle_sms_signal(body, from_number, background_tasks, source="SMS_SIMULATOR")
-    return {"status": "received", "event_triggered": event_triggered}
+    event_triggered = await handle_sms_signal(body, from_number, background_tasks, source="SMS_SIMULATOR",
+                                              trace_id=trace_id)
+    return {"status": "received", "event_triggered": event_triggered, "trace_id": trace_id}
 
 async def pushbullet_listener_loop():
     """
     Listens to Pushbullet WebSocket for real-time notifications/SMS.
     """
+    global pushbullet_consumer
     if not PUSHBULLET_API_KEY:
         return
 
@@ -369,100 +536,23 @@ async def pushbullet_listener_loop():
         def add_task(self, func, *args):
             asyncio.create_task(func(*args))
 
-    uri = f"wss://stream.pushbullet.com/websocket/{PUSHBULLET_API_KEY}"
-    print(f"--- Pushbullet Listener: Connecting to {uri[:25]}... ---")
+    async def on_push(msg_body: str, msg_title: str):
+        print(f"--- [Pushbullet] Extracted Signal: '{msg_body}' ---")
+        trace_id = tracer.start("sms", channel="pushbullet")
+        await handle_sms_signal(msg_body, msg_title, MockTasks(), source="REAL_SMS", trace_id=trace_id)
 
-    while True:
-        try:
-            # ping_interval=None disables pings to avoid timeout errors
-            async with websockets.connect(uri, ping_interval=None, ping_timeout=None) as websocket:
-                print("--- Pushbullet Listener: CONNECTION ESTABLISHED ---")
-                while True:
-                    raw_msg = await websocket.recv()
-                    data = json.loads(raw_msg)
-                    
-                    if data.get('type') == 'nop':
-                        continue # Skip heartbeats to keep console clean
-                    
-                    # LOG EVERYTHING (RAW)
-                    print(f"\n--- [Pushbullet RAW] {raw_msg} ---")
-                    
-                    if data.get('type') == 'push':
-                        push = data.get('push', {})
-                        p_type = push.get('type', 'unknown')
-                        
-                        # 1. Broad Detection System
-                        msg_body = ""
-                        msg_title = "SADA Node"
-                        
-                        if p_type == 'sms_changed':
-                            # SMS detection
-                            notifs = push.get('notifications', [])
-                            if notifs:
-                                msg_body = notifs[0].get('body', '')
-                                msg_title = notifs[0].get('title', 'SMS')
-                        else:
-                            # Standard notification or link/note
-                            msg_body = push.get('body', '')
-                            msg_title = push.get('title', 'Notification')
-
-                        # 2. Urgent Fallback: If # tag exists anywhere in the push, we treat it as a signal
-                        if not msg_body and '#' in str(push):
-                            print("--- [Pushbullet] Tag detected in non-standard field! ---")
-                            # Extracting # tag via regex or simple search
-                            for tag in ["#POWER", "#WATER", "#AID", "#SOS", "#BROKEN", "#DIRTY"]:
-                                if tag in str(push).upper():
-                                    msg_body = tag
-                                    break
-                        
-                        # 3. Final Ingestion
-                        if msg_body:
-                            print(f"--- [Pushbullet] Extracted Signal: '{msg_body}' ---")
-                            await handle_sms_signal(msg_body, msg_title, MockTasks(), source="REAL_SMS")
-                        else:
-                            print(f"--- [Pushbullet] Push type '{p_type}' had no usable content ---")
-        except Exception as e:
-            print(f"--- Pushbullet Listener ERROR: {e}. Reconnecting in 5s... ---")
-            await asyncio.sleep(5)
+    uri = f"{PUSHBULLET_STREAM_URL}{PUSHBULLET_API_KEY}"
+    print(f"--- Pushbullet Listener: Connecting to {uri[:25]}... ---")
+    pushbullet_consumer = PushbulletStreamConsumer(uri, on_push)
+    await pushbullet_consumer.run()
 
 @app.get("/messages")
 async def get_messages(limit: int = 50):
     """
-    Returns recent signals specifically formatted for the frontend feed.
-    Prioritizes SMS reports and high-severity signals.
+    Returns recent signals specifically formatted for the frontend feed,
+    newest first, from the latest read snapshot.
     """
-    # Sort by timestamp desc (assuming simple append order for now)
-    recent = engine.signals[-limit:]
-    recent.reverse()
-    
-    # Map internal signal model to frontend expected props where needed
-    # (The frontend expects: timestamp, signal_type, location, coords, from/source, body)
-    results = []
-    for s in recent:
-        # Determine source label
-        src_label = s.source
-        if s.source == "SADA_SMS": src_label = "SMS"
-        if s.source == "REAL_SMS": src_label = "REAL SMS"
-        if s.source == "SMS_SIMULATOR": src_label = "SIMULATOR"
-        
-        # Determine urgency/priority for frontend highlighting
-        priority = 0
-        if s.type == "SOS" or (s.metadata and s.metadata.get("urgency") == "high"):
-            priority = 100
-        
-        results.append({
-            "id": s.id,
-            "time": s.timestamp,
-            "type": s.metadata.get("report_type", s.type) if s.type == "report" else s.type,
-            "location": s.location,
-            "coords": s.coords,
-            "source": src_label,
-            "body": s.metadata.get("raw_body") or s.metadata.get("notes") or f"Detected {s.type} anomaly",
-            "priority": priority,
-            "action": s.metadata.get("status") or "Verify"
-        })
-        
-    return results
+    return Response(content=read_model.snapshot.messages_body(limit), media_type="application/json")
 
 @app.post("/demo")
 async def run_demo(type: str = "water", loc: str = ""):
@@ -480,106 +570,443 @@ async def run_demo(type: str = "water", loc: str = ""):
         # Simulate Nightlight Drop
         loc_data = LOCATIONS.get(loc_key, LOCATIONS["RIYADH"])
         sat_signal = mock_gen.generate_satellite_nightlight(loc_data["name"], loc_data["coords"])
-        events = engine.ingest_signal(sat_signal)
+        events = await admission.submit(sat_signal, PRIORITY_BACKGROUND)
         return {"status": "injected", "signal": sat_signal, "current_events": events}
         
     elif type.lower() == "leak":
         # Simulate Soil Moisture Spike
         loc_data = LOCATIONS.get(loc_key, LOCATIONS["SOUQ"])
         sensor_signal = mock_gen.generate_soil_moisture(loc_data["name"], loc_data["coords"])
-        events = engine.ingest_signal(sensor_signal)
+        events = await admission.submit(sensor_signal, PRIORITY_BACKGROUND)
         return {"status": "injected", "signal": sensor_signal, "current_events": events}
 
     # Add handlers for all other 9 indicators
     elif type.lower() == "air":
         loc_data = LOCATIONS.get(loc_key, LOCATIONS["KARARI"])
         sig = mock_gen.generate_air_quality(loc_data["name"], loc_data["coords"])
-        events = engine.ingest_signal(sig)
+        events = await admission.submit(sig, PRIORITY_BACKGROUND)
         return {"status": "injected", "signal": sig}
         
     elif type.lower() == "market":
         loc_data = LOCATIONS.get(loc_key, LOCATIONS["OMDURMAN"])
         sig = mock_gen.generate_market_price(loc_data["name"], loc_data["coords"])
-        events = engine.ingest_signal(sig)
+        events = await admission.submit(sig, PRIORITY_BACKGROUND)
         return {"status": "injected", "signal": sig}
         
     elif type.lower() == "health":
         loc_data = LOCATIONS.get(loc_key, LOCATIONS["KALAKLA"])
         sig = mock_gen.generate_health_alert(loc_data["name"], loc_data["coords"])
-        events = engine.ingest_signal(sig)
+        events = await admission.submit(sig, PRIORITY_BACKGROUND)
         return {"status": "injected", "signal": sig}
         
     elif type.lower() == "mobility":
         loc_data = LOCATIONS.get(loc_key, LOCATIONS["SHAMBAT"])
         sig = mock_gen.generate_displacement(loc_data["name"], loc_data["coords"])
-        events = engine.ingest_signal(sig)
+        events = await admission.submit(sig, PRIORITY_BACKGROUND)
         return {"status": "injected", "signal": sig}
         
     elif type.lower() == "network":
         loc_data = LOCATIONS.get(loc_key, LOCATIONS["BAHRI"])
         sig = mock_gen.generate_connectivity(loc_data["name"], loc_data["coords"])
-        events = engine.ingest_signal(sig)
+        events = await admission.submit(sig, PRIORITY_BACKGROUND)
         return {"status": "injected", "signal": sig}
 
     elif type.lower() == "water":
         loc_data = LOCATIONS.get(loc_key, LOCATIONS["BURRI"])
         sig = mock_gen.generate_water_quality(loc_data["name"], loc_data["coords"])
-        events = engine.ingest_signal(sig)
+        events = await admission.submit(sig, PRIORITY_BACKGROUND)
         return {"status": "injected", "signal": sig}
 
     elif type.lower() == "security":
         loc_data = LOCATIONS.get(loc_key, LOCATIONS["JABRA"])
         sig = mock_gen.generate_social_conflict(loc_data["name"], loc_data["coords"])
-        events = engine.ingest_signal(sig)
+        events = await admission.submit(sig, PRIORITY_BACKGROUND)
         return {"status": "injected", "signal": sig}
 
     elif type.lower() == "aquastat":
         loc_data = LOCATIONS.get(loc_key, LOCATIONS["SHAMBAT"])
         sig = mock_gen.generate_aquastat_update(loc_data["name"], loc_data["coords"])
-        events = engine.ingest_signal(sig)
+        events = await admission.submit(sig, PRIORITY_BACKGROUND)
         return {"status": "injected", "signal": sig}
 
     elif type.lower() == "hdx":
         loc_data = LOCATIONS.get(loc_key, LOCATIONS["BAHRI"])
         sig = mock_gen.generate_hdx_damage(loc_data["name"], loc_data["coords"])
-        events = engine.ingest_signal(sig)
+        events = await admission.submit(sig, PRIORITY_BACKGROUND)
         return {"status": "injected", "signal": sig}
 
     elif type.lower() == "grid":
         loc_data = LOCATIONS.get(loc_key, LOCATIONS["RIYADH"])
         sig = mock_gen.generate_grid_status(loc_data["name"], loc_data["coords"])
-        events = engine.ingest_signal(sig)
+        events = await admission.submit(sig, PRIORITY_BACKGROUND)
         return {"status": "injected", "signal": sig}
 
     return {"status": "unknown_type"}
 
 @app.get("/events")
 async def get_events():
-    return engine.get_active_events()
+    return Response(content=read_model.snapshot.events_body, media_type="application/json")
 
 @app.get("/signals")
 async def get_signals():
-    return engine.signals
+    return Response(content=read_model.snapshot.signals_body(), media_type="application/json")
+
+@app.get("/rollups")
+async def get_rollup_keys():
+    """
+    Lists the (location, source) pairs that currently have rollups.
+    """
+    return engine.rollups.keys()
+
+@app.get("/rollups/series")
+async def get_rollup_series(location: str, source: str, resolution: str = "1m", limit: int = 60):
+    """
+    Returns count/min/max/mean buckets for one location and source
+    at a 1m, 1h or 1d resolution, oldest first.
+    """
+    try:
+        series = engine.rollups.series(location, source, resolution, limit)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    return {"location": location, "source": source, "resolution": resolution, "series": series}
+
+@app.get("/baselines")
+async def get_baselines(location: str = "", source: str = ""):
+    """
+    Lists the per-location anomaly baselines (EWMA mean/std), optionally
+    filtered by location and source.
+    """
+    return engine.baselines.snapshot(location, source)
+
+@app.get("/export/{dataset}")
+async def export_dataset(dataset: str, format: str = "", since: str = "", until: str = "",
+                         bbox: str = "", resolution: str = "", chunk_size: int = 10000):
+    """
+    Streams signals, events or rollups for Data-as-a-Service consumers.
+    Parquet/Arrow IPC need pyarrow; chunked CSV is always available.
+    bbox is min_lng,min_lat,max_lng,max_lat.
+    """
+    fmt = (format or export.available_formats()[0]).lower()
+    if dataset not in export.DATASETS:
+        return {"status": "error", "message": f"Unknown dataset '{dataset}'"}
+    if fmt not in export.available_formats():
+        return {"status": "error", "message": f"Format '{fmt}' unavailable. Use one of {export.available_formats()}"}
+    if resolution and resolution not in RESOLUTIONS:
+        return {"status": "error", "message": f"Unknown resolution '{resolution}'"}
+    try:
+        flt = export.ExportFilter(since or None, until or None, bbox or None)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+    filename = f"sada_{dataset}.{export.EXTENSIONS[fmt]}"
+    return StreamingResponse(
+        export.stream_export(dataset, engine, fmt, flt, max(1, chunk_size), resolution or None),
+        media_type=export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/infrastructure")
+async def get_infrastructure():
+    """
+    Infrastructure assets with their current status and the sectors
+    cut off by offline upstream assets.
+    """
+    graph = engine.infrastructure
+    if not graph:
+        return {"nodes": [], "affected_sectors": {}}
+    return {"nodes": list(graph.nodes.values()), "affected_sectors": graph.affected_sectors()}
+
+@app.post("/infrastructure/{node_id}/status")
+async def set_infrastructure_status(node_id: str, status: str):
+    """
+    Manual status override from field teams (active, degraded, offline).
+    Readings cannot undo it; setting the asset back to active is the recovery.
+    """
+    graph = engine.infrastructure
+    if not graph or node_id not in graph.nodes:
+        return {"status": "error", "message": "Asset not found"}
+    if status not in ("active", "degraded", "offline"):
+        return {"status": "error", "message": f"Unknown status '{status}'"}
+    changed = graph.override(node_id, status)
+    return {"status": "success", "node": graph.nodes[node_id], "changed_sectors": changed}
+
+def _layer_response(request: Request, data: bytes) -> Response:
+    headers = {"Cache-Control": "public, max-age=3600", "Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        headers["Content-Encoding"] = "gzip"
+    else:
+        data = gzip.decompress(data)
+    return Response(content=data, media_type="application/geo+json", headers=headers)
+
+@app.get("/layers/{layer}/tiles/{z}/{x}/{y}")
+async def get_layer_tile(request: Request, layer: str, z: int, x: int, y: int):
+    """
+    Water/power network as gzip GeoJSON slippy-map tiles, simplified per zoom.
+    """
+    if layer not in LAYERS:
+        return {"status": "error", "message": f"Unknown layer '{layer}'"}
+    return _layer_response(request, osm_layers.tile(layer, z, x, y))
+
+@app.get("/layers/{layer}")
+async def get_layer_bbox(request: Request, layer: str, bbox: str = "32.30,15.40,32.75,15.80", zoom: int = 12):
+    """
+    Water/power network for a bbox (min_lng,min_lat,max_lng,max_lat) at a zoom level.
+    """
+    if layer not in LAYERS:
+        return {"status": "error", "message": f"Unknown layer '{layer}'"}
+    try:
+        min_lng, min_lat, max_lng, max_lat = [float(v) for v in bbox.split(",")]
+    except ValueError:
+        return {"status": "error", "message": "bbox must be min_lng,min_lat,max_lng,max_lat"}
+    return _layer_response(request, osm_layers.render(layer, (min_lng, min_lat, max_lng, max_lat), zoom))
+
+@app.post("/infrastructure/reload")
+async def reload_infrastructure():
+    """
+    Reloads the infrastructure GeoJSON and rebuilds the nearest-asset index.
+    """
+    if not os.path.exists(INFRA_GEOJSON):
+        return {"status": "error", "message": f"{INFRA_GEOJSON} not found"}
+    engine.set_infrastructure(InfrastructureGraph.from_geojson(INFRA_GEOJSON))
+    return {"status": "success", "assets": len(engine.assets.assets)}
+
+@app.get("/rules")
+async def get_rules():
+    """
+    Describes the correlation rule table in force.
+    """
+    return {**engine.rules.describe(), "reload": rule_file.stats}
+
+@app.post("/rules/reload")
+async def reload_rules():
+    """
+    Recompiles the rule table now; a table that fails to compile leaves the current rules in force.
+    """
+    try:
+        rules = rule_file.reload()
+    except (OSError, ValueError, TypeError, KeyError) as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", "rules": len(rules)}
+
+@app.post("/sar/scan")
+async def scan_sar():
+    """
+    Runs coherence change detection over the local pre/post SAR stacks and
+    ingests a SENTINEL_1 signal for every cell that lost coherence.
+    """
+    pre, post = os.path.join(SAR_DIR, "pre"), os.path.join(SAR_DIR, "post")
+    if not (os.path.exists(pre + ".npy") and os.path.exists(post + ".npy")):
+        return {"status": "error", "message": f"pre/post stacks not found in {SAR_DIR}"}
+
+    def locate(coords):
+        sector = engine.infrastructure.nearest_sector(coords) if engine.infrastructure else None
+        return engine.infrastructure.nodes[sector].name if sector else None
+
+    detector = CoherenceChangeDetector()
+    signals = await asyncio.get_running_loop().run_in_executor(
+        None, detector.detect, SARStack(pre), SARStack(post), locate
+    )
+    # Detections feed SMS corroboration: like spooled data, they are never shed by lag
+    results = await asyncio.gather(*(admission.submit(sig, min(classify(sig), PRIORITY_VERIFICATION))
+                                     for sig in signals))
+    return {"status": "success", "signals": len(signals), "shed": sum(1 for r in results if r is None)}
+
+@app.get("/assets")
+async def get_assets():
+    """
+    Infrastructure assets with the signals attributed to each.
+    """
+    return engine.assets.summary()
+
+@app.post("/subscriptions")
+async def create_subscription(sub: Subscription):
+    """
+    Registers a responder geofence (polygon or center + radius_km) with
+    optional event-type and minimum-severity filters.
+    """
+    try:
+        return {"status": "success", "subscription": subscriptions.add(sub)}
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/subscriptions")
+async def list_subscriptions(limit: int = 100):
+    return {"count": len(subscriptions), "subscriptions": list(subscriptions.subscriptions.values())[:limit]}
+
+@app.delete("/subscriptions/{sub_id}")
+async def delete_subscription(sub_id: str):
+    if subscriptions.remove(sub_id):
+        return {"status": "success"}
+    return {"status": "error", "message": "Subscription not found"}
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Operational counters for the ingest pipeline.
+    """
+    return {
+        "pushbullet": pushbullet_consumer.stats if pushbullet_consumer else None,
+        "dedup": engine.dedup.stats(),
+        "admission": admission.snapshot(),
+        "osm_layers": osm_layers.stats(),
+        "rasters": engine.rasters.stats(),
+        "spool": spool.stats if spool else None,
+        "baselines": engine.baselines.stats(),
+        "read_model": read_model.snapshot_stats(),
+        "edge": {"mode": "edge" if EDGE_MODE else "central", "sync": edge_sync.snapshot() if edge_sync else None,
+                 "receiver": dict(edge_receiver.stats)},
+        "batching": {"window_s": engine.batch_window_s, "pending": len(engine.pending), **engine.batch_stats},
+        "tracing": tracer.stats(),
+    }
+
+@app.get("/debug/traces")
+async def get_traces(limit: int = 20, kind: str = "", stage: str = ""):
+    """
+    The slowest recent report traces (optionally ranked by one stage) with
+    per-stage totals, plus per-stage latency percentiles over the ring.
+    """
+    return {**tracer.stats(), "stages": tracer.stage_stats(kind), "slowest": tracer.slowest(limit, kind, stage)}
+
+@app.get("/debug/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """
+    Every span of one trace, with offsets from receipt.
+    """
+    trace = tracer.get(trace_id)
+    if trace is None:
+        return {"status": "error", "message": "Trace not found (or already evicted)"}
+    return trace
 
 @app.post("/verify_event/{event_id}")
 async def verify_event(event_id: str):
     """
     Endpoint for ERRs (Guardians) to manuall confirm an event.
     """
-    for event in engine.events:
-        if event.id == event_id or str(event.id) == event_id: # Handle int/str mismatch
-             event.status = "verified"
-             event.confidence = min(event.confidence + 0.2, 1.0)
-             event.proxy_details["MANUAL_VERIFICATION"] = 1.0
-             
-             # Send Alert via Pushbullet if configured
-             alert_recipient = os.getenv("ALERT_PHONE_NUMBER", "+1234567890")
-             msg_body = f"SADA ALERT: Verified {event.severity} event in {event.location}. Deploying teams."
-             send_sms_via_pushbullet(alert_recipient, msg_body)
-
-             # Manual verification complete
-             return {"status": "success", "event": event}
-    return {"status": "error", "message": "Event not found"}
+    event = engine.events_by_id.get(event_id)
+    if event is None:
+        return {"status": "error", "message": "Event not found"}
+    # A merged event lives on in the event it was folded into
+    while event.merged_into and event.merged_into in engine.events_by_id:
+        event = engine.events_by_id[event.merged_into]
+    if event.status == "resolved":
+        return {"status": "error", "message": "Event already resolved"}
+
+    if event.status != "dispatched":
+        event.status = "verified"
+    event.confidence = min(event.confidence + 0.2, 1.0)
+    event.proxy_details["MANUAL_VERIFICATION"] = 1.0
+    engine.touch(event)
+    dispatch.upsert(event)
+    dispatch.dispatch()
+    read_model.publish()
+
+    # Send Alert via Pushbullet if configured, off the event loop
+    alert_recipient = os.getenv("ALERT_PHONE_NUMBER", "+1234567890")
+    msg_body = f"SADA ALERT: Verified {event.severity} event in {event.location}. Deploying teams."
+    trace_id = tracer.trace_for_event(event.id)
+    tracer.mark(trace_id, "manual_verification", event_id=event.id)
+    asyncio.get_running_loop().run_in_executor(None, send_traced_alert, trace_id, alert_recipient, msg_body)
+
+    # Manual verification complete
+    if event.id != event_id:
+        return {"status": "success", "event": event, "merged_from": event_id}
+    return {"status": "success", "event": event}
+
+@app.post("/teams")
+async def register_team(team: Team):
+    """
+    Registers (or replaces) a field team and hands it any queued events.
+    """
+    try:
+        dispatch.add_team(team)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", "team": team, "assigned": dispatch.dispatch()}
+
+@app.get("/teams")
+async def list_teams():
+    return list(dispatch.teams.values())
+
+@app.get("/teams/{team_id}")
+async def get_team(team_id: str):
+    """
+    A team's current assignments, for the Guardian portal.
+    """
+    team = dispatch.teams.get(team_id)
+    if team is None:
+        return {"status": "error", "message": "Team not found"}
+    return {"team": team, "events": [engine.events_by_id[eid] for eid in team.assignments if eid in engine.events_by_id]}
+
+@app.post("/teams/{team_id}/position")
+async def update_team_position(team_id: str, coords: list[float]):
+    if team_id not in dispatch.teams:
+        return {"status": "error", "message": "Team not found"}
+    return {"status": "success", "team": dispatch.move_team(team_id, coords), "assigned": dispatch.dispatch()}
+
+@app.delete("/teams/{team_id}")
+async def remove_team(team_id: str):
+    """
+    Removes a team; its open assignments go back into the queue.
+    """
+    if not dispatch.remove_team(team_id):
+        return {"status": "error", "message": "Team not found"}
+    return {"status": "success", "assigned": dispatch.dispatch()}
+
+@app.get("/dispatch")
+async def get_dispatch_queue(limit: int = 50):
+    """
+    Open events still waiting for a team, highest priority first.
+    """
+    return {"pending": dispatch.pending(), "queue": dispatch.queue(limit)}
+
+@app.post("/dispatch/{event_id}/complete")
+async def complete_dispatch(event_id: str):
+    """
+    A team closed out its event: resolve it and give the team its next one.
+    """
+    event = dispatch.complete(event_id)
+    if event is None:
+        return {"status": "error", "message": "Event not dispatched"}
+    assigned = dispatch.dispatch()
+    read_model.publish()
+    return {"status": "success", "event": event, "assigned": assigned}
+
+@app.post("/edge/sync")
+async def edge_sync_frame(request: Request):
+    """
+    Applies one delta frame from a Guardian node and returns the highest
+    sequence number held for it; resent frames are skipped, not re-applied.
+    """
+    return await edge_receiver.apply(await request.body())
+
+@app.get("/edge/nodes")
+async def get_edge_nodes():
+    """
+    Sync state of every Guardian node that has reported in.
+    """
+    return edge_receiver.snapshot()
+
+@app.get("/edge/nodes/{node_id}/clusters")
+async def get_edge_clusters(node_id: str):
+    """
+    A node's pre-clustered view: aggregates and event verdicts per cluster.
+    """
+    clusters = edge_receiver.clusters(node_id)
+    if clusters is None:
+        return {"status": "error", "message": "Unknown node"}
+    return clusters
+
+@app.get("/edge/status")
+async def get_edge_status():
+    """
+    This node's outbox and sync progress (edge mode only).
+    """
+    if edge_outbox is None:
+        return {"mode": "central"}
+    if not edge_sync:
+        return {"mode": "edge", "node_id": edge_outbox.node_id, "acked": edge_outbox.acked,
+                "captured": edge_outbox.next_seq - 1, "pending": len(edge_outbox), "central": None}
+    return {"mode": "edge", **edge_sync.snapshot()}
 
 @app.post("/clear")
 async def clear_data():
@@ -587,6 +1014,8 @@ async def clear_data():
     Clears all signals and events from the engine.
     """
     engine.reset()
+    dispatch.reset()
+    read_model.reset()
     return {"status": "cleared"}
 
 if __name__ == "__main__":
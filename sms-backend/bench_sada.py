@@ -0,0 +1,779 @@
+"""
+SADA micro-benchmarks. Run from sms-backend/:
+
+    python bench_sada.py pushbullet --total 20000 --burst 500
+    python bench_sada.py flood --background 50000 --sos-every 200
+    python bench_sada.py osm --ways 40000
+    python bench_sada.py subscriptions --subs 100000
+    python bench_sada.py rasters --size 8192 [--out data/rasters]
+    python bench_sada.py sar --size 8192 [--out data/sar]
+    python bench_sada.py spool --files 16 --records 20000
+    python bench_sada.py baselines --locations 2000 --history 200
+    python bench_sada.py snapshots --signals 50000 --batch 200
+    python bench_sada.py rules --rules 10000 --categories 60
+    python bench_sada.py tracing --signals 20000
+    python bench_sada.py bursts --bursts 50 --burst-size 200 --window 0.05
+    python bench_sada.py edge --reports 1000 --batch 1000
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+def bench_pushbullet(args):
+    from pushbullet_standin import PushbulletStandin
+    from services.pushbullet_stream import PushbulletStreamConsumer
+
+    async def run():
+        standin = PushbulletStandin(total=args.total, burst_size=args.burst,
+                                    drop_after=args.drop_after, port=args.port)
+        handled = 0
+
+        async def handler(body, title):
+            nonlocal handled
+            handled += 1
+
+        consumer = PushbulletStreamConsumer(standin.uri, handler, backoff_initial=0.05)
+        async with standin.serve():
+            start = time.perf_counter()
+            task = asyncio.create_task(consumer.run())
+            while handled < args.total:
+                await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - start
+            task.cancel()
+
+        print(f"pushes={args.total} burst={args.burst} elapsed={elapsed:.3f}s "
+              f"rate={args.total / elapsed:,.0f} msg/s")
+        print(f"stats={consumer.stats}")
+
+    asyncio.run(run())
+
+def bench_flood(args):
+    from models import Signal
+    from services.intelligence import IntelligenceEngine
+    from services.admission import AdmissionController, PRIORITY_BACKGROUND, PRIORITY_VERIFICATION
+
+    names = [f"Sector {i}" for i in range(50)]
+
+    def sensor(i):
+        return Signal(type="sensor", source="WAPOR", location=names[i % 50],
+                      coords=[15.5 + (i % 50) * 0.01, 32.5], value=float(i % 100))
+
+    async def run():
+        engine = IntelligenceEngine()
+        admission = AdmissionController(engine.ingest_signal, shed_lag_s=args.shed_lag)
+        sos_futures = []
+        start = time.perf_counter()
+        for i in range(args.background):
+            admission.submit(sensor(i), PRIORITY_VERIFICATION if i % 10 == 0 else PRIORITY_BACKGROUND)
+            if i % args.sos_every == 0:
+                sos = Signal(type="report", source="SMS_SIMULATOR", location=names[i % 50],
+                             coords=[15.5 + (i % 50) * 0.01, 32.5], value=50.0,
+                             metadata={"raw_body": f"#SOS {i}", "report_type": "AID", "sender": str(i)})
+                sos_futures.append(admission.submit(sos))
+            if i % args.yield_every == 0:
+                # Producers share the loop with the worker, like request handlers do
+                await asyncio.sleep(0)
+        await asyncio.gather(*sos_futures)
+        elapsed = time.perf_counter() - start
+        snap = admission.snapshot()
+        print(f"submitted={args.background} background + {len(sos_futures)} SOS in {elapsed:.2f}s")
+        for name, c in snap["classes"].items():
+            print(f"  {name:<13} processed={c['processed']:<7} shed={c['shed']:<7} "
+                  f"queued={c['queued']:<6} p50={c['p50_ms']}ms p99={c['p99_ms']}ms")
+
+    asyncio.run(run())
+
+def _write_synthetic_osm(path, ways, nodes_per_way):
+    """City-sized .osm extract: random-walk pipelines and power lines over greater Khartoum."""
+    rng = random.Random(42)
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n')
+        node_id = 1
+        way_nodes = []
+        for _ in range(ways):
+            lat, lng = rng.uniform(15.40, 15.80), rng.uniform(32.35, 32.70)
+            ids = []
+            for _ in range(nodes_per_way):
+                lat += rng.uniform(-0.0008, 0.0008)
+                lng += rng.uniform(-0.0008, 0.0008)
+                f.write(f'<node id="{node_id}" lat="{lat:.7f}" lon="{lng:.7f}"/>\n')
+                ids.append(node_id)
+                node_id += 1
+            way_nodes.append(ids)
+        for w, ids in enumerate(way_nodes):
+            tag = '<tag k="man_made" v="pipeline"/><tag k="substance" v="water"/>' if w % 2 else '<tag k="power" v="minor_line"/>'
+            refs = "".join(f'<nd ref="{i}"/>' for i in ids)
+            f.write(f'<way id="{w + 1}">{refs}{tag}</way>\n')
+        f.write("</osm>\n")
+
+def bench_osm(args):
+    from services.osm_layers import OSMLayerStore
+
+    path = args.extract
+    if not path:
+        path = os.path.join(tempfile.mkdtemp(), "synthetic_city.osm")
+        start = time.perf_counter()
+        _write_synthetic_osm(path, args.ways, args.nodes_per_way)
+        print(f"wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB) in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    store = OSMLayerStore.load(path)
+    print(f"load+index: {time.perf_counter() - start:.2f}s features={store.counts()}")
+
+    # Every tile covering the city at a few zoom levels, cold then warm
+    for z in (11, 13, 15):
+        n = 2 ** z
+        x0, x1 = int((32.35 + 180) / 360 * n), int((32.70 + 180) / 360 * n)
+        ty = lambda lat: int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+        y0, y1 = ty(15.80), ty(15.40)
+        tiles = [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+        for phase in ("cold", "warm"):
+            start = time.perf_counter()
+            size = sum(len(store.tile("water", z, x, y)) for x, y in tiles)
+            elapsed = time.perf_counter() - start
+            print(f"z{z} {phase}: {len(tiles)} tiles in {elapsed:.2f}s "
+                  f"({elapsed / len(tiles) * 1000:.2f} ms/tile, {size / 1e6:.2f} MB gzip)")
+
+def bench_subscriptions(args):
+    from models import Subscription
+    from services.subscriptions import SubscriptionRegistry
+
+    rng = random.Random(7)
+    registry = SubscriptionRegistry()
+
+    def random_point():
+        # 30% of responders in greater Khartoum, the rest spread across Sudan
+        if rng.random() < 0.3:
+            return rng.uniform(15.40, 15.80), rng.uniform(32.35, 32.70)
+        return rng.uniform(9.0, 22.0), rng.uniform(22.0, 38.0)
+
+    start = time.perf_counter()
+    for i in range(args.subs):
+        lat, lng = random_point()
+        if i % 2:
+            size = rng.uniform(0.005, 0.05)
+            polygon = [[lat, lng], [lat + size, lng], [lat + size, lng + size], [lat, lng + size]]
+            sub = Subscription(name=f"sub{i}", phone="+249", polygon=polygon)
+        else:
+            sub = Subscription(name=f"sub{i}", phone="+249", center=[lat, lng], radius_km=rng.uniform(0.2, 5.0),
+                               min_severity=rng.choice(["info", "warning", "critical"]))
+        registry.add(sub)
+    print(f"indexed {args.subs} subscriptions in {time.perf_counter() - start:.2f}s ({len(registry.index)} cells)")
+
+    points = [list(random_point()) for _ in range(args.events)]
+    start = time.perf_counter()
+    matched = sum(len(registry.match_point(p, "verified_water_issue", "critical")) for p in points)
+    elapsed = time.perf_counter() - start
+    print(f"matched {args.events} events in {elapsed:.2f}s: {elapsed / args.events * 1e6:.1f} us/event, "
+          f"{matched / args.events:.1f} subscribers/event")
+
+def _write_synthetic_rasters(directory, size):
+    """City-extent VIIRS/WAPOR rasters with a few dark / wet patches, built a band at a time."""
+    import numpy as np
+    from services.rasters import write_raster
+
+    west, north, res = 32.35, 15.80, 0.40 / size
+    rng = np.random.default_rng(11)
+    patches = rng.uniform(0, size, (40, 2))
+    for product, base, anomaly in (("viirs", (80, 100), (10, 30)), ("wapor", (10, 30), (80, 100))):
+        grid = np.lib.format.open_memmap(os.path.join(directory, product + "_src.npy"), mode="w+",
+                                         dtype=np.float32, shape=(size, size))
+        cols = np.arange(size)
+        for r0 in range(0, size, 512):
+            rows = np.arange(r0, min(size, r0 + 512))[:, None]
+            band = rng.uniform(*base, (len(rows), size)).astype(np.float32)
+            for py, px in patches:
+                inside = (rows - py) ** 2 + (cols - px) ** 2 < (size / 60) ** 2
+                band[inside] = rng.uniform(*anomaly, inside.sum())
+            grid[r0:r0 + len(rows)] = band
+        write_raster(os.path.join(directory, product), grid, west, north, res)
+        del grid
+        os.remove(os.path.join(directory, product + "_src.npy"))
+    return patches * res
+
+def bench_rasters(args):
+    import numpy as np
+    from services.rasters import RasterProxies
+
+    directory = args.out or tempfile.mkdtemp()
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    _write_synthetic_rasters(directory, args.size)
+    size_mb = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 1e6
+    print(f"wrote {args.size}x{args.size} viirs+wapor ({size_mb:.0f} MB) in {time.perf_counter() - start:.2f}s")
+
+    proxies = RasterProxies.from_dir(directory, cache_tiles=args.cache_tiles)
+    rng = np.random.default_rng(3)
+    scattered = np.column_stack([rng.uniform(15.40, 15.80, args.points), rng.uniform(32.35, 32.70, args.points)])
+    hotspots = rng.uniform([15.45, 32.40], [15.75, 32.65], (20, 2))
+    clustered = hotspots[rng.integers(0, 20, args.points)] + rng.normal(0, 0.002, (args.points, 2))
+
+    for name, pts in (("scattered", scattered), ("clustered", clustered)):
+        for phase in ("cold", "warm"):
+            start = time.perf_counter()
+            for i in range(0, len(pts), args.batch):
+                proxies.sample("VIIRS", pts[i:i + args.batch])
+            elapsed = time.perf_counter() - start
+            print(f"{name} {phase}: {len(pts)} 3x3 samples in {elapsed:.2f}s ({len(pts) / elapsed:,.0f} points/s)")
+        proxies.rasters["VIIRS"]._cache.clear()
+
+    start = time.perf_counter()
+    for lat, lng in clustered[:2000]:
+        proxies.interrogate([lat, lng])
+    elapsed = time.perf_counter() - start
+    print(f"offline switch: 2000 single-report interrogations in {elapsed:.2f}s ({elapsed / 2000 * 1e6:.0f} us each)")
+    cached_mb = sum(len(r._cache) for r in proxies.rasters.values()) * 256 * 256 * 4 / 1e6
+    print(f"decoded tiles held: {cached_mb:.0f} MB of {size_mb:.0f} MB on disk; {proxies.stats()}")
+
+def _write_synthetic_sar(directory, size, sites, cell=32):
+    """Pre (2 dates) and post (1 date) stacks; `sites` 2x2-cell blocks decorrelate after the event."""
+    import numpy as np
+    from services.sar import create_stack
+
+    west, north, res = 32.35, 15.80, 0.40 / size
+    rng = np.random.default_rng(5)
+    damaged = {(int(r), int(c)) for r, c in rng.integers(0, size // cell - 1, (sites, 2))}
+    mask_cells = np.zeros((size // cell, size // cell), dtype=bool)
+    for r, c in damaged:
+        mask_cells[r:r + 2, c:c + 2] = True
+    pre = create_stack(os.path.join(directory, "pre"), 2, size, size, west, north, res, ["2024-01-01", "2024-01-13"])
+    post = create_stack(os.path.join(directory, "post"), 1, size, size, west, north, res, ["2024-01-25"])
+    noise = lambda shape: (rng.standard_normal(shape) + 1j * rng.standard_normal(shape)).astype(np.complex64)
+    for r0 in range(0, size, 512):
+        r1 = min(size, r0 + 512)
+        scatter = noise((r1 - r0, size))
+        pre[0, r0:r1] = scatter + 0.5 * noise(scatter.shape)
+        pre[1, r0:r1] = scatter + 0.5 * noise(scatter.shape)
+        after = scatter + 0.5 * noise(scatter.shape)
+        mask = np.repeat(np.repeat(mask_cells[r0 // cell:r1 // cell], cell, 0), cell, 1)
+        after[mask] = noise(int(mask.sum()))
+        post[0, r0:r1] = after
+    pre.flush()
+    post.flush()
+    return mask_cells
+
+def bench_sar(args):
+    import numpy as np
+    from services.sar import SARStack, CoherenceChangeDetector
+
+    directory = args.out or tempfile.mkdtemp()
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    truth = _write_synthetic_sar(directory, args.size, args.sites)
+    size_mb = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 1e6
+    print(f"wrote {args.size}x{args.size} pre/post SLC stacks ({size_mb:.0f} MB) in {time.perf_counter() - start:.2f}s")
+
+    pre, post = SARStack(os.path.join(directory, "pre")), SARStack(os.path.join(directory, "post"))
+    for chunk_rows in args.chunk_rows:
+        detector = CoherenceChangeDetector(chunk_rows=chunk_rows)
+        tracemalloc.start()
+        start = time.perf_counter()
+        cells = list(detector.cells(pre, post))
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        found = np.zeros_like(truth)
+        for c in cells:
+            found[c["row"], c["col"]] = True
+        hits = int((found & truth).sum())
+        print(f"chunk_rows={chunk_rows}: {args.size ** 2 / elapsed / 1e6:.1f} Mpx/s ({elapsed:.2f}s), "
+              f"peak {peak / 1e6:.0f} MB, flagged {len(cells)} cells, "
+              f"recall {hits / max(1, truth.sum()):.3f}, precision {hits / max(1, len(cells)):.3f}")
+
+def _write_spool_files(directory, files, records):
+    import csv
+    import gzip
+    import json
+
+    rng = random.Random(9)
+    sources = [("VIIRS", "satellite"), ("WAPOR", "sensor"), ("GRID_GIS", "sensor"), ("FAO_AQUASTAT", "sensor")]
+    sites = [(rng.uniform(15.40, 15.80), rng.uniform(32.35, 32.70)) for _ in range(300)]
+    for f in range(files):
+        rows = []
+        for i in range(records):
+            source, kind = rng.choice(sources)
+            site = rng.randrange(len(sites))
+            lat, lng = sites[site]
+            rows.append({"timestamp": f"2024-03-{1 + f % 28:02d}T{i % 24:02d}:{i % 60:02d}:00", "type": kind,
+                         "source": source, "location": f"Spool site {site}",
+                         "lat": round(lat + rng.gauss(0, 0.002), 5), "lng": round(lng + rng.gauss(0, 0.002), 5),
+                         "value": round(rng.uniform(0, 100), 2), "node": f"guardian-{f % 4}"})
+        if f % 2:
+            with gzip.open(os.path.join(directory, f"batch{f:03d}.ndjson.gz"), "wt") as out:
+                for row in rows:
+                    out.write(json.dumps(row) + "\n")
+        else:
+            with open(os.path.join(directory, f"batch{f:03d}.csv"), "w", newline="") as out:
+                writer = csv.DictWriter(out, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+
+def bench_spool(args):
+    import shutil
+    from services.intelligence import IntelligenceEngine
+    from services.admission import AdmissionController, PRIORITY_VERIFICATION
+    from services.spool import SpoolIngestor
+
+    directory = tempfile.mkdtemp()
+    start = time.perf_counter()
+    _write_spool_files(directory, args.files, args.records)
+    total = args.files * args.records
+    print(f"wrote {args.files} spool files ({total} records) in {time.perf_counter() - start:.2f}s")
+
+    async def ingest(workers, checkpoint, crash_after=None):
+        engine = IntelligenceEngine()
+        admission = AdmissionController(engine.ingest_signal)
+
+        def submit(sig):
+            if crash_after is not None and admission.stats[PRIORITY_VERIFICATION].submitted >= crash_after:
+                raise RuntimeError("simulated crash")
+            return admission.submit(sig, PRIORITY_VERIFICATION)
+
+        spool = SpoolIngestor(directory, submit, checkpoint_path=checkpoint, workers=workers, settle_s=0)
+        start = time.perf_counter()
+        try:
+            count = await spool.scan()
+        except RuntimeError:
+            count = sum(entry["records"] for entry in spool.files.values())
+        elapsed = time.perf_counter() - start
+        spool.close()
+        return count, elapsed, len(engine.signals)
+
+    for workers in args.workers:
+        checkpoint = os.path.join(tempfile.mkdtemp(), "checkpoint.json")
+        count, elapsed, signals = asyncio.run(ingest(workers, checkpoint))
+        print(f"workers={workers}: {count} records in {elapsed:.2f}s ({count / elapsed:,.0f} records/s), engine holds {signals}")
+
+    # Crash part-way through the second file, then resume from the checkpoint
+    checkpoint = os.path.join(tempfile.mkdtemp(), "checkpoint.json")
+    crash_at = args.records + args.records // 3 + 7
+    committed, _, _ = asyncio.run(ingest(args.workers[-1], checkpoint, crash_after=crash_at))
+    resumed, _, _ = asyncio.run(ingest(args.workers[-1], checkpoint))
+    print(f"crash after {crash_at} submits: {committed} committed, {resumed} ingested on resume "
+          f"({committed + resumed} of {total})")
+
+    # Restart against the same checkpoint: nothing is ingested twice
+    count, _, _ = asyncio.run(ingest(args.workers[-1], checkpoint))
+    print(f"restart with checkpoint: {count} records re-ingested")
+    # A byte-identical copy delivered under a new name is skipped too
+    shutil.copy(os.path.join(directory, "batch000.csv"), os.path.join(directory, "usb-copy.csv"))
+    count, _, _ = asyncio.run(ingest(args.workers[-1], checkpoint))
+    print(f"redelivered copy: {count} records re-ingested")
+
+def bench_baselines(args):
+    from models import Signal
+    from services.baselines import BaselineStore, MONITORED, fixed_assessment
+
+    rng = random.Random(11)
+    # Every location has its own normal level: industrial areas glow, outskirts are dim
+    series = []
+    for i in range(args.locations):
+        source = rng.choice(["VIIRS", "WAPOR", "FAO_AQUASTAT"])
+        direction = MONITORED[source][0]
+        series.append((f"Sector {i}", source, direction, rng.uniform(15, 90), rng.uniform(2, 6)))
+
+    def reading(loc, source, mean, std, t, value=None):
+        return Signal(type="sensor", source=source, location=loc, coords=[15.5, 32.5],
+                      value=mean + rng.gauss(0, std) if value is None else value, timestamp=f"2024-03-01T00:00:{t:06d}")
+
+    history = [reading(loc, src, mean, std, t) for t in range(args.history) for loc, src, _, mean, std in series]
+    print(f"{len(series)} series, {len(history)} historical signals")
+
+    warm = BaselineStore(anomaly_weight=1.0)
+    start = time.perf_counter()
+    warm.warm_start(history)
+    warm_s = time.perf_counter() - start
+
+    sequential = BaselineStore(anomaly_weight=1.0)
+    start = time.perf_counter()
+    for sig in history:
+        sequential.observe(sig)
+    seq_s = time.perf_counter() - start
+    drift = max(max(abs(a[1] - b[1]), abs(a[2] - b[2])) for a, b in
+                ((warm.series[k], sequential.series[k]) for k in warm.series))
+    print(f"warm start: {warm_s:.2f}s ({len(history) / warm_s:,.0f} signals/s), "
+          f"sequential observe: {seq_s:.2f}s ({len(history) / seq_s:,.0f} signals/s), max |diff| {drift:.2e}")
+
+    # Live stream: 2% of readings are a 5-sigma departure in the monitored direction
+    store = BaselineStore()
+    store.warm_start(history)
+    tally = {"baseline": [0, 0, 0], "fixed": [0, 0, 0]}  # hits, false alarms, misses
+    for t in range(args.live):
+        for loc, src, direction, mean, std in series:
+            anomaly = rng.random() < 0.02
+            value = mean + (5 if direction == "above" else -5) * std + rng.gauss(0, std) * 0.5 if anomaly else None
+            sig = reading(loc, src, mean, std, args.history + t, value)
+            for name, flagged in (("baseline", store.observe(sig)["anomalous"]),
+                                  ("fixed", fixed_assessment(src, sig.value)["anomalous"])):
+                if flagged:
+                    tally[name][0 if anomaly else 1] += 1
+                elif anomaly:
+                    tally[name][2] += 1
+    for name, (tp, fp, fn) in tally.items():
+        print(f"{name:>8}: precision {tp / max(tp + fp, 1):.3f}, recall {tp / max(tp + fn, 1):.3f} ({tp} hits, {fp} false alarms)")
+
+def bench_snapshots(args):
+    import json
+    from fastapi.encoders import jsonable_encoder
+    from models import Signal
+    from services.intelligence import IntelligenceEngine
+    from services.readmodel import ReadModel, message_view
+
+    rng = random.Random(5)
+    engine = IntelligenceEngine()
+    read_model = ReadModel(engine)
+    sources = [("SADA_SMS", "report"), ("VIIRS", "satellite"), ("WAPOR", "sensor"), ("GRID_GIS", "sensor")]
+    sites = [(15.40 + rng.random() * 0.4, 32.35 + rng.random() * 0.35) for _ in range(args.sites)]
+
+    builds = []
+    for start in range(0, args.signals, args.batch):
+        for i in range(start, min(start + args.batch, args.signals)):
+            source, kind = rng.choice(sources)
+            lat, lng = rng.choice(sites)
+            engine.ingest_signal(Signal(type=kind, source=source, location=f"Site {i % args.sites}",
+                                        coords=[lat + rng.gauss(0, 0.0005), lng + rng.gauss(0, 0.0005)],
+                                        value=rng.uniform(0, 100), metadata={"raw_body": f"report {i}"}))
+        t = time.perf_counter()
+        read_model.publish()
+        builds.append((time.perf_counter() - t) * 1000)
+    builds.sort()
+    snap = read_model.snapshot
+    print(f"{len(engine.signals)} signals, {snap.event_count} active events, {len(builds)} publishes of {args.batch}-signal batches")
+    print(f"publish (incremental): p50={builds[len(builds) // 2]:.2f}ms p99={builds[int(len(builds) * 0.99)]:.2f}ms "
+          f"max={builds[-1]:.2f}ms")
+
+    def timed(fn, repeat):
+        t = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - t) / repeat * 1000
+
+    # What every GET used to do: walk the live lists and encode them per request
+    old = {
+        "/events": lambda: json.dumps(jsonable_encoder(engine.get_active_events())).encode(),
+        "/messages": lambda: json.dumps([message_view(s) for s in reversed(engine.signals[-50:])]).encode(),
+        "/signals": lambda: json.dumps(jsonable_encoder(engine.signals)).encode(),
+    }
+    new = {
+        "/events": lambda: read_model.snapshot.events_body,
+        "/messages": lambda: read_model.snapshot.messages_body(50),
+        "/signals": lambda: read_model.snapshot.signals_body(),
+    }
+    for path in old:
+        repeat = 3 if path == "/signals" else 50
+        print(f"GET {path:<9} per request: live encode {timed(old[path], repeat):8.3f}ms, snapshot {timed(new[path], repeat):8.3f}ms")
+    full = timed(lambda: (old["/events"](), old["/signals"]()), 1)
+    print(f"full rebuild of /events + /signals for comparison: {full:.1f}ms")
+
+def bench_rules(args):
+    from services.rules import RuleSet
+
+    rng = random.Random(13)
+    categories = [f"C{i}" for i in range(args.categories)]
+    proxies = {f"P{i}": {"category": c, "confidence": [0.3, 1.0]} for i, c in enumerate(categories)}
+    rules = []
+    for i in range(args.rules):
+        rule = {"name": f"r{i}", "requires": [f"P{j}" for j in rng.sample(range(args.categories), rng.randint(1, 3))],
+                "confidence": round(rng.uniform(0.5, 0.99), 2), "event_type": f"type_{i % 50}"}
+        if rng.random() < 0.3:
+            rule["min_counts"] = {rng.choice(categories): rng.randint(2, 20)}
+        if rng.random() < 0.1:
+            rule["min_sources"] = rng.randint(2, 5)
+        rules.append(rule)
+    rules.append({"name": "noise", "confidence": 0.2, "event_type": "noise"})
+    start = time.perf_counter()
+    table = RuleSet({"proxies": proxies, "rules": rules})
+    print(f"compiled {len(table)} rules over {args.categories} categories in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    # A signal stream over many clusters; each cluster leans on a few categories
+    stream = []
+    for _ in range(args.signals):
+        cluster = rng.randrange(args.clusters)
+        stream.append((cluster, categories[(cluster * 7 + int(rng.expovariate(0.5))) % args.categories]))
+
+    def run(evaluate):
+        counts = [{} for _ in range(args.clusters)]
+        winners = [None] * args.clusters
+        start = time.perf_counter()
+        for cluster, cat in stream:
+            c = counts[cluster]
+            c[cat] = c.get(cat, 0) + 1
+            details = dict.fromkeys((f"P{cat[1:]}" for cat in c), 0.5)
+            winners[cluster] = evaluate(winners[cluster], cat, details, c)
+        return time.perf_counter() - start, winners
+
+    def linear(_, cat, details, counts):
+        return next(r.index for r in table.rules if r.matches(details, counts))
+
+    def indexed(_, cat, details, counts):
+        return table.best(details, counts)
+
+    def incremental(winner, cat, details, counts):
+        if winner is None:
+            return table.best(details, counts)
+        return table.improve(winner, [cat], details, counts, counts[cat] == 1)
+
+    overhead, _ = run(lambda winner, cat, details, counts: winner)
+    print(f"stream bookkeeping alone: {overhead / len(stream) * 1e6:.1f} us per signal (subtracted below)")
+    results = {}
+    for name, fn in (("linear scan", linear), ("indexed best", indexed), ("incremental", incremental)):
+        elapsed, winners = run(fn)
+        results[name] = winners
+        per = max(elapsed - overhead, 1e-9) / len(stream)
+        print(f"{name:>13}: {1 / per:>10,.0f} evaluations/s ({per * 1e6:.2f} us each)")
+    agree = results["linear scan"] == results["indexed best"] == results["incremental"]
+    print(f"all three pick the same rule for every cluster: {agree}")
+
+def bench_tracing(args):
+    from models import Signal
+    from services.intelligence import IntelligenceEngine
+    from services.tracing import Tracer
+
+    rng = random.Random(17)
+    sites = [(15.40 + rng.random() * 0.4, 32.35 + rng.random() * 0.35) for _ in range(args.sites)]
+    sources = [("SADA_SMS", "report"), ("VIIRS", "satellite"), ("GRID_GIS", "sensor")]
+
+    def stream():
+        for i in range(args.signals):
+            source, kind = rng.choice(sources)
+            lat, lng = rng.choice(sites)
+            yield Signal(type=kind, source=source, location=f"Site {i % args.sites}",
+                         coords=[lat + rng.gauss(0, 0.0005), lng + rng.gauss(0, 0.0005)],
+                         value=rng.uniform(0, 100), metadata={"raw_body": f"report {i}", "report_type": "SOS"})
+
+    def run(tracer):
+        engine = IntelligenceEngine()
+        engine.tracer = tracer
+        signals = list(stream())
+        start = time.perf_counter()
+        for s in signals:
+            if tracer:
+                s.metadata["trace_id"] = tracer.start("sms", channel="bench")
+            engine.ingest_signal(s)
+        return args.signals / (time.perf_counter() - start)
+
+    # Alternate the two modes and keep the best round of each; single runs are noisy
+    plain = traced = 0.0
+    for _ in range(args.rounds):
+        rng.seed(17)
+        plain = max(plain, run(None))
+        rng.seed(17)
+        tracer = Tracer(capacity=args.capacity)
+        traced = max(traced, run(tracer))
+    print(f"ingest untraced: {plain:,.0f} signals/s, traced: {traced:,.0f} signals/s "
+          f"({(1 - traced / plain) * 100:+.1f}% overhead)")
+    print(f"ring holds {tracer.stats()['traces']} of {args.signals} traces (capacity {args.capacity})")
+    for stage, st in tracer.stage_stats().items():
+        print(f"  {stage:<16} n={st['count']:<6} p50={st['p50_ms']:.3f}ms p99={st['p99_ms']:.3f}ms max={st['max_ms']:.3f}ms")
+    start = time.perf_counter()
+    tracer.slowest(20)
+    tracer.stage_stats()
+    print(f"/debug/traces over a full ring: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+def bench_bursts(args):
+    from models import Signal
+    from services.admission import AdmissionController
+    from services.intelligence import IntelligenceEngine
+
+    rng = random.Random(21)
+    sites = [(15.40 + rng.random() * 0.4, 32.35 + rng.random() * 0.35) for _ in range(args.bursts)]
+    bursts = []
+    for b, (lat, lng) in enumerate(sites):
+        burst = []
+        for i in range(args.burst_size):
+            # Mostly reports, a few corroborating proxies and the odd SOS
+            roll = rng.random()
+            if roll < 0.15:
+                source, kind, value = rng.choice([("VIIRS", "satellite", 5.0), ("GRID_GIS", "sensor", 0.0)])
+            else:
+                source, kind, value = "SADA_SMS", "report", 50.0
+            meta = {"raw_body": f"burst {b} report {i}", "report_type": "AID" if roll > 0.99 else "WATER"}
+            burst.append(Signal(type=kind, source=source, location=f"Site {b}", coords=[lat + rng.gauss(0, 0.0005), lng + rng.gauss(0, 0.0005)],
+                                value=value, metadata=meta if kind == "report" else {}))
+        bursts.append(burst)
+
+    async def run(window):
+        engine = IntelligenceEngine(batch_window_s=window)
+        admission = AdmissionController(engine.ingest_signal, max_queue=10 ** 6,
+                                        flush=engine.flush if window > 0 else None, batch_window_s=window)
+        signals = [s.model_copy(deep=True) for burst in bursts for s in burst]
+        start = time.perf_counter()
+        futures = [admission.submit(s) for s in signals]
+        await asyncio.gather(*futures)
+        elapsed = time.perf_counter() - start
+
+        # One report on its own, once the bursts are over
+        lone = []
+        for i in range(args.lone):
+            lat, lng = 14.0 + i * 0.05, 30.0
+            sig = Signal(type="report", source="SADA_SMS", location=f"Lone {i}", coords=[lat, lng], value=50.0,
+                         metadata={"raw_body": f"lone {i}", "report_type": "WATER"})
+            t = time.perf_counter()
+            await admission.submit(sig)
+            lone.append((time.perf_counter() - t) * 1000)
+            await asyncio.sleep(0.001)
+        lone.sort()
+        total = sum(len(b) for b in bursts)
+        verdicts = {e.location: (e.type, e.severity) for e in engine.get_active_events() if e.location.startswith("Site")}
+        return total / elapsed, engine.batch_stats, lone, verdicts
+
+    results = {}
+    for window in (0.0, args.window):
+        rate, stats, lone, verdicts = asyncio.run(run(window))
+        results[window] = verdicts
+        label = "per-signal" if window == 0 else f"batched ({window * 1000:.0f}ms)"
+        print(f"{label:<16} {rate:9,.0f} signals/s, {stats['evaluations']:6} evaluations "
+              f"(fast path {stats['fast_path']}, largest batch {stats['max_batch']}); "
+              f"lone report p50={lone[len(lone) // 2]:.3f}ms max={lone[-1]:.3f}ms")
+    plain, batched = results[0.0], results[args.window]
+    same = sum(1 for loc, v in plain.items() if batched.get(loc) == v)
+    print(f"final event type/severity agree on {same}/{len(plain)} clusters")
+
+def bench_edge(args):
+    import gzip
+    import json
+    from models import Signal
+    from services.edge import encode_frame, decode_frame, wire_record, cluster_view
+    from services.intelligence import IntelligenceEngine
+    from services.mock_data import MockDataGenerator
+    from pushbullet_standin import LOCATION_WORDS, TAGS
+
+    # What a Guardian node captures: each report and the verification sweep it triggers
+    rng = random.Random(23)
+    mock = MockDataGenerator()
+    engine = IntelligenceEngine()
+    engine.changed_clusters = {}
+    sites = [(15.45 + rng.random() * 0.25, 32.45 + rng.random() * 0.2) for _ in range(len(LOCATION_WORDS))]
+    signals = []
+    for i in range(args.reports):
+        w = rng.randrange(len(LOCATION_WORDS))
+        lat, lng = sites[w][0] + rng.gauss(0, 0.002), sites[w][1] + rng.gauss(0, 0.002)
+        location = f"{LOCATION_WORDS[w].title()} Sector"
+        report = Signal(type="report", source="SADA_SMS", location=location, coords=[lat, lng], value=50.0,
+                        metadata={"raw_body": f"{rng.choice(TAGS)} {LOCATION_WORDS[w]}", "report_type": "WATER",
+                                  "sender": f"+2499{rng.randrange(10 ** 7):07d}"})
+        signals.append(report)
+        if rng.random() < args.verified:
+            signals.append(mock.generate_satellite_nightlight(location, [lat, lng]))
+            signals.append(mock.generate_grid_status(location, [lat, lng]))
+    for s in signals:
+        engine.ingest_signal(s)
+    records = [wire_record(s) for s in signals]
+    clusters = [cluster_view(engine, key) for key in engine.changed_clusters]
+
+    # The same fields as NDJSON (IDs and engine-derived metadata left out, as in the frames)
+    as_json = b"\n".join(json.dumps(rec).encode() for rec in records)
+    start = time.perf_counter()
+    frames = [encode_frame("guardian-bench", 1 + i, records[i:i + args.batch],
+                           clusters if i + args.batch >= len(records) else [])
+              for i in range(0, len(records), args.batch)]
+    encode_s = time.perf_counter() - start
+    start = time.perf_counter()
+    decoded = sum(len(decode_frame(f)["signals"]) for f in frames)
+    decode_s = time.perf_counter() - start
+    framed = sum(len(f) for f in frames)
+
+    per_k = 1000 / args.reports
+    print(f"{args.reports} reports -> {len(signals)} signals, {len(clusters)} cluster aggregates, "
+          f"{len(frames)} frames of up to {args.batch} signals")
+    print(f"per 1,000 reports: JSON {len(as_json) * per_k:,.0f} B, gzip JSON {len(gzip.compress(as_json, 9)) * per_k:,.0f} B, "
+          f"frames {framed * per_k:,.0f} B ({framed / len(signals):.1f} B/signal)")
+    print(f"encode {len(signals) / encode_s:,.0f} signals/s, decode {decoded / decode_s:,.0f} signals/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SADA micro-benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("pushbullet", help="Replay push bursts through a local websocket stand-in")
+    p.add_argument("--total", type=int, default=20000)
+    p.add_argument("--burst", type=int, default=500)
+    p.add_argument("--drop-after", type=int, default=5000, help="Drop the first connection after N pushes (0 = never)")
+    p.add_argument("--port", type=int, default=8765)
+    p.set_defaults(func=bench_pushbullet)
+
+    p = sub.add_parser("flood", help="Synthetic sensor flood with interleaved SOS reports")
+    p.add_argument("--background", type=int, default=50000)
+    p.add_argument("--sos-every", type=int, default=200)
+    p.add_argument("--yield-every", type=int, default=20)
+    p.add_argument("--shed-lag", type=float, default=0.5)
+    p.set_defaults(func=bench_flood)
+
+    p = sub.add_parser("osm", help="Load a city-sized OSM extract and render water tiles")
+    p.add_argument("--extract", default="", help="Existing .osm/.geojson; a synthetic one is generated if omitted")
+    p.add_argument("--ways", type=int, default=40000)
+    p.add_argument("--nodes-per-way", type=int, default=25)
+    p.set_defaults(func=bench_osm)
+
+    p = sub.add_parser("subscriptions", help="Match events against many geofenced subscriptions")
+    p.add_argument("--subs", type=int, default=100000)
+    p.add_argument("--events", type=int, default=10000)
+    p.set_defaults(func=bench_subscriptions)
+
+    p = sub.add_parser("rasters", help="Sample memory-mapped VIIRS/WAPOR rasters")
+    p.add_argument("--size", type=int, default=8192, help="Raster width/height in pixels")
+    p.add_argument("--points", type=int, default=200000)
+    p.add_argument("--batch", type=int, default=1000)
+    p.add_argument("--cache-tiles", type=int, default=64)
+    p.add_argument("--out", default="", help="Keep the rasters here (e.g. data/rasters) instead of a temp dir")
+    p.set_defaults(func=bench_rasters)
+
+    p = sub.add_parser("sar", help="Chunked SAR coherence change detection over a city-sized scene")
+    p.add_argument("--size", type=int, default=8192, help="Scene width/height in pixels")
+    p.add_argument("--sites", type=int, default=60, help="Planted 2x2-cell collapse sites")
+    p.add_argument("--chunk-rows", type=int, nargs="+", default=[256, 1024])
+    p.add_argument("--out", default="", help="Keep the stacks here (e.g. data/sar) instead of a temp dir")
+    p.set_defaults(func=bench_sar)
+
+    p = sub.add_parser("spool", help="Ingest CSV/NDJSON spool files through the process pool")
+    p.add_argument("--files", type=int, default=16)
+    p.add_argument("--records", type=int, default=20000, help="Records per file")
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    p.set_defaults(func=bench_spool)
+
+    p = sub.add_parser("baselines", help="Warm-start per-location anomaly baselines and compare with fixed thresholds")
+    p.add_argument("--locations", type=int, default=2000)
+    p.add_argument("--history", type=int, default=200, help="Historical readings per location")
+    p.add_argument("--live", type=int, default=50, help="Live readings per location")
+    p.set_defaults(func=bench_baselines)
+
+    p = sub.add_parser("snapshots", help="Publish cost of the immutable read snapshots vs encoding live lists")
+    p.add_argument("--signals", type=int, default=50000)
+    p.add_argument("--batch", type=int, default=200, help="Signals ingested between publishes")
+    p.add_argument("--sites", type=int, default=500)
+    p.set_defaults(func=bench_snapshots)
+
+    p = sub.add_parser("rules", help="Rule-table evaluation: linear scan vs category index vs incremental")
+    p.add_argument("--rules", type=int, default=10000)
+    p.add_argument("--categories", type=int, default=60)
+    p.add_argument("--clusters", type=int, default=2000)
+    p.add_argument("--signals", type=int, default=50000)
+    p.set_defaults(func=bench_rules)
+
+    p = sub.add_parser("tracing", help="Ingest throughput with per-report tracing on and off")
+    p.add_argument("--signals", type=int, default=20000)
+    p.add_argument("--sites", type=int, default=500)
+    p.add_argument("--capacity", type=int, default=2048)
+    p.add_argument("--rounds", type=int, default=3)
+    p.set_defaults(func=bench_tracing)
+
+    p = sub.add_parser("bursts", help="Per-signal scoring vs micro-batched cluster re-evaluation under bursts")
+    p.add_argument("--bursts", type=int, default=50, help="Clusters hit by a burst")
+    p.add_argument("--burst-size", type=int, default=200)
+    p.add_argument("--window", type=float, default=0.05, help="Batch latency bound in seconds")
+    p.add_argument("--lone", type=int, default=200, help="Isolated reports timed after the bursts")
+    p.set_defaults(func=bench_bursts)
+
+    p = sub.add_parser("edge", help="Guardian delta frames vs JSON: bytes per 1,000 reports and codec speed")
+    p.add_argument("--reports", type=int, default=1000)
+    p.add_argument("--batch", type=int, default=1000, help="Signals per frame")
+    p.add_argument("--verified", type=float, default=0.5, help="Share of reports followed by a verification sweep")
+    p.set_defaults(func=bench_edge)
+
+    args = parser.parse_args()
+    args.func(args)
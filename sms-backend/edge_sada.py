@@ -0,0 +1,176 @@
+"""
+Two-process Guardian node sync check. Run from sms-backend/:
+
+    python edge_sada.py --reports 2000 --drop-rate 0.2 --cut-rate 0.2 --outage 3 --kill-edge
+
+Starts a central backend and an edge backend (SADA_MODE=edge) as
+subprocesses with a FlakyLink between them: connections are refused,
+replies are cut after the central has applied a frame, and the link goes
+down for --outage seconds. Reports are texted to the edge; with
+--kill-edge the edge is SIGKILLed halfway and restarted on the same
+journal. The run passes when the central holds every signal the edge
+captured exactly once; it prints what crossed the link per 1,000 reports.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from flaky_link import FlakyLink
+from pushbullet_standin import LOCATION_WORDS, TAGS
+
+NODE_ID = "guardian-test"
+
+async def wait_ready(client, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/metrics")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"backend at {client.base_url} did not become ready")
+
+def start_backend(port: int, env_extra: dict, log_path: str):
+    env = dict(os.environ)
+    env.update({"PUSHBULLET_API_KEY": "", "SADA_SPOOL_DIR": os.path.join(tempfile.gettempdir(), "sada-no-spool")})
+    env.update(env_extra)
+    log = open(log_path, "a")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+async def send_reports(client, args, sent, start_at, step):
+    for i in range(start_at, args.reports, step):
+        body = f"{TAGS[i % len(TAGS)]} {LOCATION_WORDS[i % len(LOCATION_WORDS)]} report {i}"
+        # A phone keeps retrying while the edge is down or restarting
+        while True:
+            try:
+                r = await client.post("/reciveSms", json={"message": body, "sender": f"+2499{i % 500:07d}"})
+                if r.status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+        sent[0] += 1
+
+async def run(args) -> bool:
+    workdir = tempfile.mkdtemp(prefix="sada-edge-")
+    log_path = os.path.join(workdir, "backends.log")
+    edge_env = {"SADA_MODE": "edge", "SADA_CENTRAL_URL": f"http://127.0.0.1:{args.link_port}",
+                "SADA_NODE_ID": NODE_ID, "SADA_EDGE_DIR": os.path.join(workdir, "edge"),
+                "SADA_EDGE_INTERVAL_S": "0.2", "SADA_EDGE_BACKOFF_MAX_S": "2.0", "SADA_EDGE_BATCH": str(args.batch)}
+    link = FlakyLink(args.central_port, port=args.link_port, drop_rate=args.drop_rate, cut_rate=args.cut_rate,
+                     latency_s=args.latency)
+    print(f"work dir and backend logs: {workdir}")
+
+    central = start_backend(args.central_port, {"SADA_MODE": "central"}, log_path)
+    edge = start_backend(args.edge_port, edge_env, log_path)
+    async with link.serve(), \
+            httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.central_port}", timeout=60.0) as central_client, \
+            httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.edge_port}", timeout=30.0) as edge_client:
+        try:
+            await wait_ready(central_client)
+            await wait_ready(edge_client)
+            start = time.perf_counter()
+            sent = [0]
+            senders = [asyncio.create_task(send_reports(edge_client, args, sent, w, args.senders))
+                       for w in range(args.senders)]
+
+            async def outage():
+                while sent[0] < args.reports // 4:
+                    await asyncio.sleep(0.05)
+                print(f"[{time.perf_counter() - start:5.1f}s] link down for {args.outage}s")
+                link.down()
+                await asyncio.sleep(args.outage)
+                link.up()
+                print(f"[{time.perf_counter() - start:5.1f}s] link up")
+
+            async def kill_edge():
+                nonlocal edge
+                while sent[0] < args.reports // 2:
+                    await asyncio.sleep(0.05)
+                print(f"[{time.perf_counter() - start:5.1f}s] SIGKILL edge after {sent[0]} reports, restarting")
+                edge.kill()
+                edge.wait()
+                edge = start_backend(args.edge_port, edge_env, log_path)
+
+            chaos = ([outage()] if args.outage else []) + ([kill_edge()] if args.kill_edge else [])
+            await asyncio.gather(*chaos, *senders)
+            print(f"[{time.perf_counter() - start:5.1f}s] {args.reports} reports delivered to the edge")
+
+            # Verification sweeps land ~5 s after each report; then wait for the outbox to drain
+            await asyncio.sleep(6)
+            deadline, last = time.monotonic() + args.drain_timeout, None
+            while time.monotonic() < deadline:
+                try:
+                    status = (await edge_client.get("/edge/status")).json()
+                except httpx.HTTPError:
+                    status = None
+                if status and status["pending"] == 0 and status["clusters_pending"] == 0 and last == status["captured"]:
+                    break
+                last = status["captured"] if status else None
+                await asyncio.sleep(0.5)
+            elapsed = time.perf_counter() - start
+            print(f"[{elapsed:5.1f}s] edge outbox drained" if status and status["pending"] == 0
+                  else f"[{elapsed:5.1f}s] gave up waiting for the outbox to drain")
+
+            nodes = (await central_client.get("/edge/nodes")).json()
+            node = nodes["nodes"].get(NODE_ID, {})
+            signals = (await central_client.get("/signals")).json()
+            seqs = [s["metadata"]["edge_seq"] for s in signals if s["metadata"].get("edge_node") == NODE_ID]
+            central_metrics = (await central_client.get("/metrics")).json()
+            clusters = (await central_client.get(f"/edge/nodes/{NODE_ID}/clusters")).json()
+        finally:
+            for proc in (edge, central):
+                proc.terminate()
+                proc.wait(timeout=10)
+
+    captured = status["captured"] if status else -1
+    suppressed = central_metrics["dedup"].get("suppressed", 0)
+    print(f"edge captured {captured} signals; edge sent {status['frames']} frames, "
+          f"{status['failures']} failed attempts, {status['gaps']} gaps")
+    print(f"central applied up to seq {node.get('applied')}, {node.get('signals')} signals ingested, "
+          f"{node.get('duplicates')} resent signals skipped, {node.get('resyncs')} resyncs")
+    print(f"central engine holds {len(seqs)} edge signals ({len(set(seqs))} distinct seqs, "
+          f"{suppressed} resent SMS suppressed by the central's report dedup)")
+    print(f"edge view at the central: {node.get('clusters')} clusters, {node.get('events')} with events "
+          f"({len(clusters)} listed)")
+    link_stats = link.stats
+    print(f"link: {link_stats['connections']} connections, {link_stats['dropped']} refused, {link_stats['cut']} cut, "
+          f"{link_stats['severed']} severed; {link_stats['bytes_up']:,} bytes up, {link_stats['bytes_down']:,} down")
+    per_k = 1000 / max(1, args.reports)
+    print(f"per 1,000 reports ({captured / max(1, args.reports):.1f} signals each with verification): "
+          f"{link_stats['bytes_up'] * per_k:,.0f} bytes up / {link_stats['bytes_down'] * per_k:,.0f} down on the wire, "
+          f"{status['bytes'] * per_k:,.0f} bytes of acknowledged frames")
+
+    exactly_once = (node.get("applied") == captured and node.get("signals") == captured
+                    and len(seqs) == len(set(seqs)) and len(seqs) + suppressed == captured)
+    print("PASS: every captured signal reached the central exactly once" if exactly_once
+          else "FAIL: central and edge disagree")
+    return exactly_once
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=2000)
+    parser.add_argument("--senders", type=int, default=8, help="Concurrent SMS senders")
+    parser.add_argument("--batch", type=int, default=1000, help="Signals per frame")
+    parser.add_argument("--drop-rate", type=float, default=0.2, help="Share of link connections refused")
+    parser.add_argument("--cut-rate", type=float, default=0.2, help="Share of replies cut after the central applied")
+    parser.add_argument("--latency", type=float, default=0.05, help="Per-chunk link latency in seconds")
+    parser.add_argument("--outage", type=float, default=3.0, help="Seconds the link is fully down")
+    parser.add_argument("--kill-edge", action="store_true", help="SIGKILL and restart the edge halfway")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--central-port", type=int, default=8011)
+    parser.add_argument("--edge-port", type=int, default=8012)
+    parser.add_argument("--link-port", type=int, default=8790)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
@@ -0,0 +1,84 @@
+import asyncio
+import random
+from contextlib import asynccontextmanager
+
+class FlakyLink:
+    """
+    Local stand-in for the intermittent backhaul between a Guardian node
+    and the central server: a TCP proxy to `target_port`. Each connection
+    may be refused outright (`drop_rate`) or have its reply cut off after
+    the request went through (`cut_rate` -- the central applied the frame,
+    the node never hears back), and every chunk is delayed by `latency_s`.
+    `down()` / `up()` take the whole link out, severing open connections.
+    Bytes are counted in each direction, so a run reports what actually
+    crossed the link, retries included.
+    """
+    def __init__(self, target_port: int, target_host: str = "127.0.0.1", port: int = 8790, host: str = "127.0.0.1",
+                 drop_rate: float = 0.0, cut_rate: float = 0.0, latency_s: float = 0.0, seed: int = 7):
+        self.target_host = target_host
+        self.target_port = target_port
+        self.host = host
+        self.port = port
+        self.drop_rate = drop_rate
+        self.cut_rate = cut_rate
+        self.latency_s = latency_s
+        self.rng = random.Random(seed)
+        self.is_down = False
+        self.stats = {"connections": 0, "dropped": 0, "cut": 0, "severed": 0, "bytes_up": 0, "bytes_down": 0}
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def down(self):
+        self.is_down = True
+
+    def up(self):
+        self.is_down = False
+
+    async def _pipe(self, reader, writer, direction: str, cut: bool = False):
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                if self.latency_s:
+                    await asyncio.sleep(self.latency_s)
+                if self.is_down:
+                    self.stats["severed"] += 1
+                    break
+                if cut:
+                    # Deliver part of the reply, then drop the connection
+                    chunk = chunk[:len(chunk) // 2]
+                    writer.write(chunk)
+                    self.stats[direction] += len(chunk)
+                    self.stats["cut"] += 1
+                    break
+                writer.write(chunk)
+                self.stats[direction] += len(chunk)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, reader, writer):
+        self.stats["connections"] += 1
+        if self.is_down or self.rng.random() < self.drop_rate:
+            self.stats["dropped"] += 1
+            writer.close()
+            return
+        try:
+            up_reader, up_writer = await asyncio.open_connection(self.target_host, self.target_port)
+        except OSError:
+            writer.close()
+            return
+        cut = self.rng.random() < self.cut_rate
+        await asyncio.gather(self._pipe(reader, up_writer, "bytes_up"),
+                             self._pipe(up_reader, writer, "bytes_down", cut=cut))
+
+    @asynccontextmanager
+    async def serve(self):
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        async with server:
+            yield self
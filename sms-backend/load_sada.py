@@ -0,0 +1,222 @@
+"""
+End-to-end HTTP load harness for the SADA backend. Run from sms-backend/:
+
+    python load_sada.py --duration 30 --sms-workers 16 --readers 8 --verifiers 2 --json run.json
+    python load_sada.py --duration 30 --sms-workers 16 --readers 8 --verifiers 2 --compare run.json
+
+Unless --url is given, the backend is started as a subprocess wired to
+local Pushbullet stand-ins (REST texts API and websocket stream), so no
+traffic leaves the machine. Each worker type is a closed loop with a fixed
+seed; the first --warmup seconds are not recorded.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from pushbullet_standin import PushbulletStandin, PushbulletRestStandin, LOCATION_WORDS, TAGS
+
+class Recorder:
+    """Per-endpoint latencies (ms) and error counts, recorded only while `recording`."""
+    def __init__(self):
+        self.recording = False
+        self.latencies = {}
+        self.errors = {}
+
+    async def call(self, label: str, request):
+        start = time.perf_counter()
+        try:
+            response = await request
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        if self.recording:
+            self.latencies.setdefault(label, []).append((time.perf_counter() - start) * 1000)
+            if not ok:
+                self.errors[label] = self.errors.get(label, 0) + 1
+        return response if ok else None
+
+def _percentile(sorted_values, q):
+    # Nearest-rank, so results are exact and repeatable
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))]
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    results = {}
+    for label in sorted(recorder.latencies):
+        values = sorted(recorder.latencies[label])
+        results[label] = {
+            "requests": len(values),
+            "errors": recorder.errors.get(label, 0),
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(_percentile(values, 50), 2),
+            "p95_ms": round(_percentile(values, 95), 2),
+            "p99_ms": round(_percentile(values, 99), 2),
+            "max_ms": round(values[-1], 2),
+        }
+    return results
+
+async def sms_worker(client, rec, worker_id, args, stop):
+    rng = random.Random(args.seed * 1000 + worker_id)
+    n = 0
+    last = None
+    while not stop.is_set():
+        if last and rng.random() < args.duplicates:
+            payload = last  # resend, as phones do on a flaky network
+        else:
+            n += 1
+            payload = {
+                "message": f"{rng.choice(TAGS)} {rng.choice(LOCATION_WORDS)} block {rng.randint(1, 400)}",
+                "sender": f"+2499{worker_id:03d}{n:04d}",
+            }
+            last = payload
+        await rec.call("POST /reciveSms", client.post("/reciveSms", json=payload))
+        if args.think:
+            await asyncio.sleep(args.think)
+
+async def reader_worker(client, rec, worker_id, args, stop):
+    # Mirrors the dashboard: poll the event list and the message feed
+    while not stop.is_set():
+        await rec.call("GET /events", client.get("/events"))
+        await rec.call("GET /messages", client.get("/messages", params={"limit": 50}))
+        if args.poll_interval:
+            await asyncio.sleep(args.poll_interval)
+
+async def verifier_worker(client, rec, worker_id, args, stop):
+    rng = random.Random(args.seed * 2000 + worker_id)
+    while not stop.is_set():
+        response = await rec.call("GET /events", client.get("/events"))
+        pending = [e["id"] for e in (response.json() if response else []) if e.get("status") != "resolved"]
+        if pending:
+            event_id = rng.choice(pending)
+            await rec.call("POST /verify_event/{id}", client.post(f"/verify_event/{event_id}"))
+        await asyncio.sleep(args.verify_interval)
+
+async def wait_ready(client, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/metrics")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("backend did not become ready")
+
+def start_backend(args, rest: PushbulletRestStandin, stream: PushbulletStandin, log_path: str):
+    env = dict(os.environ)
+    env.update({
+        "PUSHBULLET_API_KEY": "standin",
+        "PUSHBULLET_DEVICE_ID": "standin-device",
+        "PUSHBULLET_API_URL": rest.url,
+        "PUSHBULLET_STREAM_URL": stream.uri.rsplit("/", 1)[0] + "/",
+    })
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend:app", "--host", "127.0.0.1", "--port", str(args.port),
+         "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+async def run(args) -> dict:
+    rest = PushbulletRestStandin(port=args.rest_port, latency=args.pushbullet_latency)
+    pushes = int(args.push_rate * (args.warmup + args.duration))
+    stream = PushbulletStandin(total=max(1, pushes), burst_size=max(1, args.push_rate // 10),
+                               burst_interval=0.1 if args.push_rate else 3600, port=args.stream_port)
+    server = None
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.sms_workers + args.readers + args.verifiers + 4)
+    async with stream.serve(), httpx.AsyncClient(base_url=base_url, timeout=30.0, limits=limits) as client:
+        if not args.url:
+            rest.start()
+            log_path = os.path.join(tempfile.gettempdir(), "sada_load_backend.log")
+            server = start_backend(args, rest, stream, log_path)
+            print(f"backend log: {log_path}")
+        try:
+            await wait_ready(client)
+            await client.post("/clear")
+
+            rec, stop = Recorder(), asyncio.Event()
+            workers = [sms_worker(client, rec, i, args, stop) for i in range(args.sms_workers)]
+            workers += [reader_worker(client, rec, i, args, stop) for i in range(args.readers)]
+            workers += [verifier_worker(client, rec, i, args, stop) for i in range(args.verifiers)]
+            tasks = [asyncio.create_task(w) for w in workers]
+
+            await asyncio.sleep(args.warmup)
+            texts_before = rest.texts
+            rec.recording = True
+            start = time.perf_counter()
+            await asyncio.sleep(args.duration)
+            rec.recording = False
+            elapsed = time.perf_counter() - start
+            stop.set()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            metrics = (await client.get("/metrics")).json()
+        finally:
+            if server:
+                server.terminate()
+                server.wait(timeout=10)
+            rest.stop()
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare", "url", "port", "rest_port", "stream_port")},
+        "elapsed_s": round(elapsed, 2),
+        "endpoints": summarize(rec, elapsed),
+        "pushbullet": {"texts_sent": rest.texts - texts_before, "stream_pushes": stream.sent},
+        "server": {"admission": metrics.get("admission"), "dedup": metrics.get("dedup")},
+    }
+
+def print_report(result: dict, baseline: dict = None):
+    header = f"{'endpoint':<26}{'reqs':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for label, r in result["endpoints"].items():
+        print(f"{label:<26}{r['requests']:>8}{r['errors']:>6}{r['rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}")
+        base = (baseline or {}).get("endpoints", {}).get(label)
+        if base:
+            delta = lambda k: f"{(r[k] - base[k]) / base[k] * 100:+.0f}%" if base[k] else "n/a"
+            print(f"{'  vs baseline':<26}{'':>8}{'':>6}{delta('rps'):>9}{delta('p50_ms'):>9}{delta('p95_ms'):>9}{delta('p99_ms'):>9}")
+    print(f"pushbullet texts sent: {result['pushbullet']['texts_sent']}, stream pushes: {result['pushbullet']['stream_pushes']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SADA end-to-end HTTP load harness")
+    parser.add_argument("--url", default="", help="Target an already running backend instead of starting one")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--rest-port", type=int, default=8766)
+    parser.add_argument("--stream-port", type=int, default=8767)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sms-workers", type=int, default=16)
+    parser.add_argument("--think", type=float, default=0.0, help="Pause between SMS posts per worker (s)")
+    parser.add_argument("--duplicates", type=float, default=0.05, help="Fraction of SMS posts that are resends")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--poll-interval", type=float, default=0.0, help="Pause between reader polls (s)")
+    parser.add_argument("--verifiers", type=int, default=2)
+    parser.add_argument("--verify-interval", type=float, default=0.5)
+    parser.add_argument("--push-rate", type=int, default=50, help="Pushes/s on the stand-in Pushbullet stream")
+    parser.add_argument("--pushbullet-latency", type=float, default=0.05, help="Stand-in REST response delay (s)")
+    parser.add_argument("--json", default="", help="Write results here")
+    parser.add_argument("--compare", default="", help="Baseline results JSON to compare against")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != result["config"]:
+            print("warning: baseline was run with a different configuration")
+    print_report(result, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
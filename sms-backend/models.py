@@ -1,16 +1,16 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 import uuid
 
 class Signal(BaseModel):
-    id: str = str(uuid.uuid4())
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     type: str  # "satellite", "report", "sensor"
     source: str # "VIIRS", "SADA_SMS", "WAPOR"
     location: str
     coords: List[float] # [lat, lng]
     value: float # Normalized 0-100
-    timestamp: str = datetime.utcnow().isoformat()
+    timestamp: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
     metadata: dict = {}
 
 class InfrastructureStatus(BaseModel):
@@ -19,10 +19,10 @@ class InfrastructureStatus(BaseModel):
     type: str # "water_plant", "substation", "pipeline"
     coords: List[float]
     status: str # "active", "degraded", "offline"
-    last_updated: str = datetime.utcnow().isoformat()
+    last_updated: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
 
 class Event(BaseModel):
-    id: str = str(uuid.uuid4())
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
     type: str # "power_outage", "water_leak", "contamination"
     severity: str # "critical", "warning", "info"
@@ -32,4 +32,24 @@ class Event(BaseModel):
     signals: List[str] # List of Signal IDs
     proxy_details: dict = {} # e.g., {"VIIRS": 0.9, "GRID": 1.0}
     status: str # "detected", "verified", "dispatched", "resolved"
-    timestamp: str = datetime.utcnow().isoformat()
+    timestamp: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
+    assigned_team: Optional[str] = None # Team ID once dispatched
+    merged_into: Optional[str] = None # Event ID this one was folded into when clusters merged
+
+class Subscription(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str # responder / NGO name
+    phone: str # alert destination
+    polygon: Optional[List[List[float]]] = None # [[lat, lng], ...] geofence
+    center: Optional[List[float]] = None # [lat, lng] for radius geofences
+    radius_km: Optional[float] = None
+    event_types: List[str] = [] # empty = every type
+    min_severity: str = "info" # "info", "warning", "critical"
+
+class Team(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str # ERR / Guardian field team
+    coords: List[float] # [lat, lng] current position
+    capacity: int = 1 # events the team can handle at once
+    active: bool = True
+    assignments: List[str] = [] # Event IDs currently assigned
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import websockets
+
+LOCATION_WORDS = ["KHARTOUM", "BAHRI", "OMDURMAN", "KALAKLA", "JABRA", "KARARI", "SHAMBAT", "BURRI"]
+TAGS = ["#SOS", "#AID", "#POWER", "#WATER", "#BROKEN", "#DIRTY"]
+
+def make_push(i: int) -> dict:
+    """Builds an sms_changed push shaped like the real Pushbullet stream."""
+    return {
+        "type": "push",
+        "push": {
+            "type": "sms_changed",
+            "source_device_iden": "standin-device",
+            "notifications": [{
+                "thread_id": str(i % 97),
+                "title": f"+2499{i % 10000000:07d}",
+                "body": f"{TAGS[i % len(TAGS)]} {LOCATION_WORDS[i % len(LOCATION_WORDS)]}",
+                "timestamp": 1700000000 + i,
+            }],
+            "iden": uuid.uuid5(uuid.NAMESPACE_OID, str(i)).hex,
+        },
+    }
+
+class PushbulletStandin:
+    """
+    Local stand-in for wss://stream.pushbullet.com. Each connection replays
+    `total` pushes in bursts of `burst_size`, interleaved with nop heartbeats.
+    `drop_after` closes the first connection early so clients exercise
+    reconnects; the next connection redelivers from the last burst start.
+    """
+    def __init__(self, total: int = 10000, burst_size: int = 500, burst_interval: float = 0.0,
+                 drop_after: int = 0, host: str = "127.0.0.1", port: int = 8765):
+        self.total = total
+        self.burst_size = burst_size
+        self.burst_interval = burst_interval
+        self.drop_after = drop_after
+        self.host = host
+        self.port = port
+        self.sent = 0
+        self.connections = 0
+        self._frames = [json.dumps(make_push(i)) for i in range(total)]
+
+    @property
+    def uri(self) -> str:
+        return f"ws://{self.host}:{self.port}/websocket/standin"
+
+    async def _serve(self, websocket, *args):
+        self.connections += 1
+        first = self.connections == 1
+        start = 0 if first else max(0, self.sent - self.burst_size)
+        try:
+            for i in range(start, self.total):
+                if first and self.drop_after and i >= self.drop_after:
+                    await websocket.close()
+                    return
+                await websocket.send(self._frames[i])
+                self.sent = max(self.sent, i + 1)
+                if (i + 1) % self.burst_size == 0:
+                    await websocket.send('{"type": "nop"}')
+                    await asyncio.sleep(self.burst_interval)
+            await websocket.wait_closed()
+        except websockets.ConnectionClosed:
+            pass  # client went away; it resumes from the last burst on reconnect
+
+    def serve(self):
+        """Async context manager that runs the server."""
+        return websockets.serve(self._serve, self.host, self.port)
+
+class PushbulletRestStandin:
+    """
+    Local stand-in for the Pushbullet REST API (POST /v2/texts), served from
+    a background thread. `latency` delays every response to mimic the real
+    round trip; accepted texts are counted.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 8766, latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.texts = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/v2"
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if standin.latency:
+                    time.sleep(standin.latency)
+                if self.path != "/v2/texts":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                with standin._lock:
+                    standin.texts += 1
+                body = json.dumps({"iden": uuid.uuid4().hex, "active": True}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,181 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, List, Optional
+from models import Signal, Event
+
+# Lower value = served first
+PRIORITY_CRITICAL = 0      # #SOS / #AID human reports
+PRIORITY_REPORT = 1        # other human reports
+PRIORITY_VERIFICATION = 2  # proxies fetched to corroborate a report
+PRIORITY_BACKGROUND = 3    # autonomous sweeps, /demo injections
+CLASS_NAMES = ["critical", "report", "verification", "background"]
+
+def classify(signal: Signal) -> int:
+    if signal.type == "report" and signal.metadata.get("raw_body") is not None:
+        if signal.metadata.get("report_type") == "AID":
+            return PRIORITY_CRITICAL
+        return PRIORITY_REPORT
+    return PRIORITY_BACKGROUND
+
+class _ClassStats:
+    def __init__(self):
+        self.submitted = 0
+        self.processed = 0
+        self.shed = 0
+        self.latencies = deque(maxlen=2000)
+
+    def snapshot(self, queued: int, lag: float) -> dict:
+        lat = sorted(self.latencies)
+        pct = lambda p: round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 3) if lat else None
+        return {
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "shed": self.shed,
+            "queued": queued,
+            "lag_s": round(lag, 3),
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+        }
+
+class AdmissionController:
+    """
+    Priority ingest queue in front of IntelligenceEngine.ingest_signal.
+
+    Signals are served strictly by class. Once ingest lag (age of the oldest
+    queued signal) crosses `shed_lag_s`, new background signals are dropped
+    and queued ones older than `shed_lag_s` are discarded when reached;
+    verification proxies are deferred behind human reports but never shed
+    by lag. Human reports are only dropped if the whole queue is full of them.
+
+    With a `flush` hook (the engine scoring in micro-batches), futures of
+    non-critical signals resolve once their batch has been scored: when the
+    queue drains, or `batch_window_s` after the oldest one was ingested.
+    """
+    def __init__(self, ingest: Callable[[Signal], List[Event]], shed_lag_s: float = 2.0, max_queue: int = 10000,
+                 tracer=None, flush: Optional[Callable[[], int]] = None, batch_window_s: float = 0.05):
+        self.ingest = ingest
+        self.flush = flush
+        self.batch_window_s = batch_window_s
+        self._held: List[tuple] = []  # (future, priority, enqueued, events, ingested at), awaiting a flush
+        self.tracer = tracer  # records queue wait for signals carrying a trace_id
+        self.shed_lag_s = shed_lag_s
+        self.max_queue = max_queue
+        self.queues = [deque() for _ in CLASS_NAMES]
+        self.stats = [_ClassStats() for _ in CLASS_NAMES]
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop = None
+
+    def lag(self) -> float:
+        now = time.perf_counter()
+        return max((now - q[0][1] for q in self.queues if q), default=0.0)
+
+    def queued(self) -> int:
+        return sum(len(q) for q in self.queues)
+
+    def _shed(self, priority: int, fut: asyncio.Future):
+        self.stats[priority].shed += 1
+        if not fut.done():
+            fut.set_result(None)
+
+    def submit(self, signal: Signal, priority: Optional[int] = None) -> asyncio.Future:
+        """
+        Queues a signal and returns a future resolving to the engine's events,
+        or to None if the signal was shed.
+        """
+        if priority is None:
+            priority = classify(signal)
+        self._ensure_worker()
+        fut = asyncio.get_running_loop().create_future()
+        self.stats[priority].submitted += 1
+
+        if priority == PRIORITY_BACKGROUND and self.lag() > self.shed_lag_s:
+            self._shed(priority, fut)
+            return fut
+
+        if self.queued() >= self.max_queue:
+            # Make room by evicting the newest item of the lowest non-empty class below this one
+            victim = next((p for p in range(len(self.queues) - 1, priority, -1) if self.queues[p]), None)
+            if victim is None:
+                self._shed(priority, fut)
+                return fut
+            _, _, victim_fut = self.queues[victim].pop()
+            self._shed(victim, victim_fut)
+
+        self.queues[priority].append((signal, time.perf_counter(), fut))
+        self._wakeup.set()
+        return fut
+
+    def _resolve(self, fut: asyncio.Future, priority: int, enqueued: float, events: List[Event]):
+        if not fut.done():
+            fut.set_result(events)
+        self.stats[priority].latencies.append(time.perf_counter() - enqueued)
+
+    def _release(self):
+        """Scores the pending micro-batch and resolves the futures waiting on it."""
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"--- [Admission] Batch flush failed: {e} ---")
+        held, self._held = self._held, []
+        for fut, priority, enqueued, events, _ in held:
+            self._resolve(fut, priority, enqueued, events)
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker.done():
+            # The worker is bound to the loop that serves requests; started lazily on first submit
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._worker = loop.create_task(self.run())
+
+    def _next(self):
+        for priority, q in enumerate(self.queues):
+            if q:
+                return priority, q.popleft()
+        return None, None
+
+    async def run(self):
+        while True:
+            priority, item = self._next()
+            if item is None:
+                if self._held:
+                    self._release()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            signal, enqueued, fut = item
+            if priority == PRIORITY_BACKGROUND and time.perf_counter() - enqueued > self.shed_lag_s:
+                self._shed(priority, fut)
+                continue
+            if self.tracer and "trace_id" in signal.metadata:
+                self.tracer.record(signal.metadata["trace_id"], "admission_wait", enqueued, queue=CLASS_NAMES[priority])
+
+            try:
+                events = self.ingest(signal)
+                if self.flush is not None and priority != PRIORITY_CRITICAL:
+                    self._held.append((fut, priority, enqueued, events, time.perf_counter()))
+                else:
+                    self._resolve(fut, priority, enqueued, events)
+            except Exception as e:
+                print(f"--- [Admission] Ingest failed for {signal.source}: {e} ---")
+                if not fut.done():
+                    fut.set_exception(e)
+            self.stats[priority].processed += 1
+            if self._held and (not self.queued() or time.perf_counter() - self._held[0][4] >= self.batch_window_s):
+                self._release()
+            # Let request handlers enqueue between signals so new SOS reports can jump ahead
+            await asyncio.sleep(0)
+
+    def snapshot(self) -> dict:
+        now = time.perf_counter()
+        return {
+            "ingest_lag_s": round(self.lag(), 3),
+            "shed_lag_s": self.shed_lag_s,
+            "classes": {
+                name: self.stats[p].snapshot(len(self.queues[p]), now - self.queues[p][0][1] if self.queues[p] else 0.0)
+                for p, name in enumerate(CLASS_NAMES)
+            },
+        }
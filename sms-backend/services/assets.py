@@ -0,0 +1,71 @@
+from typing import Dict, List
+from models import Signal, InfrastructureStatus
+from services.spatial import KDTree
+
+class AssetIndex:
+    """
+    KD-tree over the infrastructure asset catalogue. Every ingested signal
+    is tagged with its k nearest assets and counted against the closest one.
+    `rebuild` builds a fresh tree and swaps it in, keeping the per-asset
+    rollups of assets that are still in the catalogue.
+    """
+    def __init__(self, k: int = 3, max_km: float = 5.0):
+        self.k = k
+        self.max_km = max_km
+        self.assets: Dict[str, InfrastructureStatus] = {}
+        self.tree = KDTree([], [])
+        self.rollups: Dict[str, dict] = {}
+
+    def rebuild(self, assets: List[InfrastructureStatus], vertices: List[tuple] = None):
+        """
+        `vertices` optionally gives several ([lat, lng], asset_id) points per
+        asset (e.g. every pipe vertex); otherwise each asset is one point.
+        """
+        catalogue = {a.id: a for a in assets}
+        vertices = vertices or [(a.coords, a.id) for a in catalogue.values()]
+        tree = KDTree([v[0] for v in vertices], [v[1] for v in vertices])
+        rollups = {aid: self.rollups.get(aid) or {"signal_count": 0, "by_source": {}, "last_seen": None}
+                   for aid in catalogue}
+        self.assets, self.tree, self.rollups = catalogue, tree, rollups
+
+    def nearest(self, coords: List[float], k: int = None) -> List[dict]:
+        k = k or self.k
+        # Over-fetch vertices and keep the closest vertex of each asset, widening
+        # the fetch until k assets are found or every vertex within max_km was seen
+        fetch = k * 4
+        while True:
+            hits = self.tree.nearest(coords[0], coords[1], min(fetch, len(self.tree)), self.max_km)
+            seen, matches = set(), []
+            for dist, aid in hits:
+                if aid in seen:
+                    continue
+                seen.add(aid)
+                matches.append({
+                    "id": aid,
+                    "name": self.assets[aid].name,
+                    "type": self.assets[aid].type,
+                    "distance_km": round(dist, 4),
+                })
+                if len(matches) == k:
+                    return matches
+            if len(hits) < fetch or fetch >= len(self.tree):
+                return matches
+            fetch *= 4
+
+    def attribute(self, signal: Signal) -> List[dict]:
+        if not self.assets:
+            return []
+        matches = self.nearest(signal.coords)
+        if matches:
+            signal.metadata["nearest_assets"] = matches
+            rollup = self.rollups[matches[0]["id"]]
+            rollup["signal_count"] += 1
+            rollup["by_source"][signal.source] = rollup["by_source"].get(signal.source, 0) + 1
+            rollup["last_seen"] = signal.timestamp
+        return matches
+
+    def summary(self) -> List[dict]:
+        return [{"asset": self.assets[aid], **rollup} for aid, rollup in self.rollups.items()]
+
+    def reset_rollups(self):
+        self.rollups = {aid: {"signal_count": 0, "by_source": {}, "last_seen": None} for aid in self.assets}
@@ -0,0 +1,156 @@
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from models import Signal
+
+# Source or metric -> (direction, fixed threshold, minimum std). The fixed
+# thresholds are the original cut-offs, used until a baseline has warmed up;
+# the std floor keeps a flat-lined series from flagging every wobble.
+MONITORED = {
+    "VIIRS": ("below", 40.0, 2.0),          # night-time radiance, dark = outage
+    "GRID_GIS": ("below", 0.5, 5.0),        # 0 = offline, 100 = active
+    "WAPOR": ("above", 70.0, 2.0),          # soil moisture, wet = leak / burst
+    "FAO_AQUASTAT": ("above", 70.0, 2.0),
+    "turbidity_ntu": ("above", 50.0, 1.0),  # metric, whichever sensor reports it
+}
+
+def monitored_name(source: str, metric: str = "") -> Optional[str]:
+    return metric if metric in MONITORED else source if source in MONITORED else None
+
+def fixed_assessment(name: str, value: float) -> dict:
+    """Judges a reading against the fixed threshold alone."""
+    direction, threshold, _ = MONITORED[name]
+    if direction == "above":
+        excess = (value - threshold) / (100 - threshold)
+    else:
+        excess = (threshold - value) / threshold
+    return {"anomalous": excess > 0, "excess": round(excess, 3), "basis": "fixed"}
+
+def is_anomalous(signal: Signal) -> bool:
+    """The engine's verdict for a signal, or the fixed threshold for signals it has not judged."""
+    verdict = signal.metadata.get("baseline")
+    if verdict is not None:
+        return verdict["anomalous"]
+    name = monitored_name(signal.source, signal.metadata.get("metric") or "")
+    return name is not None and fixed_assessment(name, signal.value)["anomalous"]
+
+class BaselineStore:
+    """
+    Per-(location, source, metric) streaming baselines: an exponentially
+    weighted mean and variance, three numbers per series however long it
+    runs. The step size is max(alpha, 1/n), so the first readings give a
+    plain running mean and the baseline then forgets at rate alpha.
+
+    A reading is judged against the baseline before it is folded in and is
+    anomalous when it lies more than `z_threshold` standard deviations out
+    in the monitored direction. Until a series has `min_samples` readings
+    the fixed threshold decides. Anomalous readings are folded in at
+    `anomaly_weight` of the normal step, so an outage does not become the
+    new normal within minutes, but a lasting shift is eventually learnt.
+    """
+    def __init__(self, alpha: float = 0.05, z_threshold: float = 3.0, min_samples: int = 10,
+                 anomaly_weight: float = 0.1):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.anomaly_weight = anomaly_weight
+        self.series: Dict[Tuple[str, str, str], List[float]] = {}  # key -> [n, mean, var]
+        self._warm: Dict[Tuple[str, str, str], List[float]] = {}
+        self.counts = {"baseline": 0, "fixed": 0, "anomalies": 0}
+
+    def __len__(self):
+        return len(self.series)
+
+    def assess(self, location: str, source: str, value: float, metric: str = "") -> Optional[dict]:
+        """Judges a reading without learning from it; None for unmonitored sources."""
+        name = monitored_name(source, metric)
+        if name is None:
+            return None
+        state = self.series.get((location, source, metric))
+        if state is None or state[0] < self.min_samples:
+            return fixed_assessment(name, value)
+        direction, _, min_std = MONITORED[name]
+        std = max(math.sqrt(state[2]), min_std)
+        z = (value - state[1]) / std
+        excess = ((z if direction == "above" else -z) - self.z_threshold) / self.z_threshold
+        return {"anomalous": excess > 0, "excess": round(excess, 3), "basis": "baseline",
+                "z": round(z, 2), "mean": round(state[1], 3), "std": round(std, 3)}
+
+    def observe(self, signal: Signal) -> Optional[dict]:
+        """Judges a signal, records the verdict in its metadata and updates the baseline."""
+        metric = signal.metadata.get("metric") or ""
+        verdict = self.assess(signal.location, signal.source, signal.value, metric)
+        if verdict is None:
+            return None
+        signal.metadata["baseline"] = verdict
+        self.counts[verdict["basis"]] += 1
+        if verdict["anomalous"]:
+            self.counts["anomalies"] += 1
+
+        state = self.series.setdefault((signal.location, signal.source, metric), [0, 0.0, 0.0])
+        state[0] += 1
+        step = max(self.alpha, 1.0 / state[0])
+        if verdict["anomalous"] and state[0] > self.min_samples:
+            step *= self.anomaly_weight
+        diff = signal.value - state[1]
+        state[1] += step * diff
+        state[2] = (1 - step) * (state[2] + step * diff * diff)
+        return verdict
+
+    def warm_start(self, signals: Iterable[Signal]) -> int:
+        """
+        Builds baselines from historical signals in one vectorised pass and
+        returns the number of series built; they replace any existing state
+        for the same keys and survive `reset`.
+
+        Unrolling the update gives every reading a fixed weight: reading i
+        of n gets step_i * prod_{j > i} (1 - step_j). Mean and variance are
+        then weighted sums per series -- the same numbers `observe` would
+        reach reading the history one by one, without the anomaly damping.
+        """
+        keys, codes, values, stamps = {}, [], [], []
+        for s in signals:
+            metric = s.metadata.get("metric") or ""
+            if monitored_name(s.source, metric) is None:
+                continue
+            codes.append(keys.setdefault((s.location, s.source, metric), len(keys)))
+            values.append(s.value)
+            stamps.append(s.timestamp)
+        if not keys:
+            return 0
+
+        order = np.lexsort((np.array(stamps), np.array(codes)))
+        g = np.array(codes, dtype=np.int64)[order]
+        x = np.array(values, dtype=np.float64)[order]
+        counts = np.bincount(g, minlength=len(keys))
+        ends = np.cumsum(counts)
+        starts = ends - counts
+        pos = np.arange(len(g)) - starts[g] + 1  # 1-based position within its series
+
+        step = np.maximum(self.alpha, 1.0 / pos)
+        keep = np.where(pos > 1, np.log1p(-np.minimum(step, 1 - 1e-12)), 0.0)
+        cum = np.cumsum(keep)
+        weight = step * np.exp(cum[ends[g] - 1] - cum)  # step_i * prod over the later readings
+        mean = np.bincount(g, weight * x, minlength=len(keys))
+        var = np.bincount(g, weight * (x - mean[g]) ** 2, minlength=len(keys))
+
+        for key, code in keys.items():
+            self.series[key] = [int(counts[code]), float(mean[code]), float(var[code])]
+        self._warm = {key: list(self.series[key]) for key in keys}
+        return len(keys)
+
+    def snapshot(self, location: str = "", source: str = "") -> List[dict]:
+        return [{"location": loc, "source": src, "metric": metric, "samples": n,
+                 "mean": round(mean, 3), "std": round(math.sqrt(var), 3)}
+                for (loc, src, metric), (n, mean, var) in self.series.items()
+                if (not location or loc == location) and (not source or src == source)]
+
+    def stats(self) -> dict:
+        return {"series": len(self.series), "warm": sum(1 for s in self.series.values() if s[0] >= self.min_samples),
+                "warm_started": len(self._warm), **self.counts}
+
+    def reset(self):
+        """Forgets live readings; baselines built by `warm_start` are kept."""
+        self.series = {key: list(state) for key, state in self._warm.items()}
+        self.counts = {"baseline": 0, "fixed": 0, "anomalies": 0}
@@ -0,0 +1,198 @@
+import math
+from typing import Dict, List, Tuple
+from models import Signal
+from services.baselines import is_anomalous
+
+KM_PER_DEG = 111.195
+
+def categorize(signal: Signal) -> List[str]:
+    """Evidence categories a signal counts towards in its cluster."""
+    cats = []
+    if signal.source in ("VIIRS", "GRID_GIS", "WAPOR", "FAO_AQUASTAT") and is_anomalous(signal):
+        cats.append(signal.source)
+    elif signal.source == "HDX_HOT" and signal.value > 0:
+        cats.append("HDX_HOT")
+    elif signal.source == "SENTINEL_1":
+        cats.append("SENTINEL_1")
+    if signal.type == "sensor" and signal.metadata.get("metric") == "turbidity_ntu" and is_anomalous(signal):
+        cats.append("TURBIDITY")
+    if signal.type == "report" or signal.source in ("SMS", "ERR"):
+        cats.append("REPORTS")
+    return cats
+
+class Cluster:
+    """Running aggregates for one spatial cluster: centroid, extent and evidence counts."""
+    __slots__ = ("key", "signal_ids", "sum_lat", "sum_lng", "min_lat", "min_lng", "max_lat", "max_lng",
+                 "categories", "first_seen", "last_seen")
+
+    def __init__(self, key: str, signal: Signal):
+        self.key = key
+        self.signal_ids: List[str] = []
+        self.sum_lat = self.sum_lng = 0.0
+        self.min_lat, self.min_lng = signal.coords[0], signal.coords[1]
+        self.max_lat, self.max_lng = signal.coords[0], signal.coords[1]
+        self.categories: Dict[str, int] = {}
+        self.first_seen = self.last_seen = signal.timestamp
+
+    def __len__(self):
+        return len(self.signal_ids)
+
+    @property
+    def centroid(self) -> List[float]:
+        n = len(self.signal_ids) or 1
+        return [self.sum_lat / n, self.sum_lng / n]
+
+    @property
+    def extent(self) -> List[float]:
+        return [self.min_lat, self.min_lng, self.max_lat, self.max_lng]
+
+    def add(self, signal: Signal):
+        lat, lng = signal.coords[0], signal.coords[1]
+        self.signal_ids.append(signal.id)
+        self.sum_lat += lat
+        self.sum_lng += lng
+        self.min_lat, self.max_lat = min(self.min_lat, lat), max(self.max_lat, lat)
+        self.min_lng, self.max_lng = min(self.min_lng, lng), max(self.max_lng, lng)
+        for cat in categorize(signal):
+            self.categories[cat] = self.categories.get(cat, 0) + 1
+        self.first_seen = min(self.first_seen, signal.timestamp)
+        self.last_seen = max(self.last_seen, signal.timestamp)
+
+    def absorb(self, other: "Cluster"):
+        self.signal_ids.extend(other.signal_ids)
+        self.sum_lat += other.sum_lat
+        self.sum_lng += other.sum_lng
+        self.min_lat, self.max_lat = min(self.min_lat, other.min_lat), max(self.max_lat, other.max_lat)
+        self.min_lng, self.max_lng = min(self.min_lng, other.min_lng), max(self.max_lng, other.max_lng)
+        for cat, n in other.categories.items():
+            self.categories[cat] = self.categories.get(cat, 0) + n
+        self.first_seen = min(self.first_seen, other.first_seen)
+        self.last_seen = max(self.last_seen, other.last_seen)
+
+class ClusterIndex:
+    """
+    Online single-linkage clustering. A signal joins every cluster whose
+    extent lies within `radius_km`; if it bridges several, they are merged
+    through union-find (union by size, path halving), so a merge costs the
+    smaller cluster's signal list and lookups stay near-constant.
+
+    Clusters are registered on a grid of `radius_km` cells covering their
+    extent. Cells are only ever added: an absorbed cluster's entries resolve
+    to the survivor through `find`, whose extent covers them. Clusters are
+    capped at `max_extent_km` across so chains of reports cannot swallow a
+    whole city.
+    """
+    def __init__(self, radius_km: float = 0.2, max_extent_km: float = 2.0):
+        self.radius_km = radius_km
+        self.max_extent_km = max_extent_km
+        self.cell_deg = radius_km / KM_PER_DEG
+        self.clusters: Dict[str, Cluster] = {}  # roots only
+        self.parent: Dict[str, str] = {}
+        self.by_name: Dict[str, str] = {}
+        self.grid: Dict[Tuple[int, int], List[str]] = {}
+        self._cells: Dict[str, Tuple[int, int, int, int]] = {}
+        self.merges = 0
+
+    def __len__(self):
+        return len(self.clusters)
+
+    def find(self, key: str) -> str:
+        parent = self.parent
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    def get(self, key: str) -> Cluster:
+        return self.clusters.get(self.find(key)) if key in self.parent else None
+
+    def _register(self, cluster: Cluster):
+        # Only newly covered cells get an entry; extents never shrink. A degree of
+        # longitude shrinks by cos(lat), so radius_km spans more of them away from
+        # the equator: pad by the widest it gets at the cluster's poleward edge.
+        pad = self.cell_deg
+        lng_pad = pad / max(math.cos(math.radians(min(90.0, max(abs(cluster.min_lat), abs(cluster.max_lat)) + pad))), 1e-6)
+        r0, r1 = math.floor((cluster.min_lat - pad) / self.cell_deg), math.floor((cluster.max_lat + pad) / self.cell_deg)
+        c0, c1 = math.floor((cluster.min_lng - lng_pad) / self.cell_deg), math.floor((cluster.max_lng + lng_pad) / self.cell_deg)
+        old = self._cells.get(cluster.key)
+        for r in range(r0, r1 + 1):
+            for c in range(c0, c1 + 1):
+                if old and old[0] <= r <= old[1] and old[2] <= c <= old[3]:
+                    continue
+                self.grid.setdefault((r, c), []).append(cluster.key)
+        self._cells[cluster.key] = (r0, r1, c0, c1)
+
+    def _distance_km(self, lat: float, lng: float, cluster: Cluster) -> float:
+        dlat = max(cluster.min_lat - lat, 0.0, lat - cluster.max_lat)
+        dlng = max(cluster.min_lng - lng, 0.0, lng - cluster.max_lng)
+        return math.hypot(dlat * KM_PER_DEG, dlng * KM_PER_DEG * math.cos(math.radians(lat)))
+
+    def _span_km(self, min_lat, min_lng, max_lat, max_lng) -> float:
+        return math.hypot((max_lat - min_lat) * KM_PER_DEG,
+                          (max_lng - min_lng) * KM_PER_DEG * math.cos(math.radians((min_lat + max_lat) / 2)))
+
+    def _fits(self, clusters: List[Cluster], lat: float, lng: float) -> bool:
+        return self._span_km(min([c.min_lat for c in clusters] + [lat]), min([c.min_lng for c in clusters] + [lng]),
+                             max([c.max_lat for c in clusters] + [lat]), max([c.max_lng for c in clusters] + [lng])) <= self.max_extent_km
+
+    def _unique_key(self, name: str) -> str:
+        if name not in self.parent:
+            return name
+        n = 2
+        while f"{name} #{n}" in self.parent:
+            n += 1
+        return f"{name} #{n}"
+
+    def assign(self, signal: Signal) -> Tuple[Cluster, List[str]]:
+        """
+        Adds a signal and returns (its root cluster, keys of clusters merged
+        into it by this signal).
+        """
+        lat, lng = signal.coords[0], signal.coords[1]
+        roots: Dict[str, Cluster] = {}
+        r, c = math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+        for key in self.grid.get((r, c), ()):
+            root = self.find(key)
+            if root not in roots and self._distance_km(lat, lng, self.clusters[root]) <= self.radius_km:
+                roots[root] = self.clusters[root]
+
+        # Named locations keep their legacy meaning (same name, same cluster) as long as
+        # the extent stays bounded -- a catch-all name like "Unknown Sector" must not
+        # chain a whole region together; spatial neighbours join largest first
+        named = self.find(self.by_name[signal.location]) if signal.location in self.by_name else None
+        if named is not None and not self._fits([self.clusters[named]], lat, lng):
+            named = None
+        ordered = sorted(roots.values(), key=len, reverse=True)
+        if named is not None:
+            roots.pop(named, None)
+            ordered = [self.clusters[named]] + [cl for cl in ordered if cl.key != named]
+        chosen: List[Cluster] = []
+        for cluster in ordered:
+            if cluster.key == named or self._fits(chosen + [cluster], lat, lng):
+                chosen.append(cluster)
+
+        if not chosen:
+            key = self._unique_key(signal.location)
+            survivor = Cluster(key, signal)
+            self.clusters[key] = survivor
+            self.parent[key] = key
+            self.by_name.setdefault(signal.location, key)
+            absorbed = []
+        else:
+            survivor, absorbed = max(chosen, key=len), []
+            for other in chosen:
+                if other is survivor:
+                    continue
+                survivor.absorb(other)
+                self.parent[other.key] = survivor.key
+                del self.clusters[other.key]
+                absorbed.append(other.key)
+                self.merges += 1
+            self.by_name.setdefault(signal.location, survivor.key)
+
+        survivor.add(signal)
+        self._register(survivor)
+        return survivor, absorbed
+
+    def reset(self):
+        self.__init__(self.radius_km, self.max_extent_km)
@@ -0,0 +1,83 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Callable, Tuple
+from models import Signal
+from services.rollups import signal_epoch
+
+_NON_WORD = re.compile(r"[^\w#]+")
+
+def normalise_body(body: str) -> str:
+    """Case, punctuation and whitespace differences don't make a new report."""
+    return " ".join(_NON_WORD.sub(" ", body.upper()).split())
+
+class DuplicateFilter:
+    """
+    Sliding-window duplicate detector for human reports, keyed on
+    normalised body + sender + location. Keys are stored as 8-byte digests
+    in a TTL LRU capped at `max_entries`, and per-location counts keep only
+    the `max_locations` most recently suppressed, so memory is fixed.
+
+    Entries expire by arrival time, which is monotonic however skewed the
+    reports' own stamps are (spooled and edge reports arrive late); a
+    repeat must also be stamped within the window of the first, so a
+    replayed backlog is not mistaken for a burst of resends.
+    """
+    def __init__(self, window_s: float = 600, max_entries: int = 50000, max_locations: int = 1000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window_s = window_s
+        self.max_entries = max_entries
+        self.max_locations = max_locations
+        self.clock = clock
+        self.entries: "OrderedDict[bytes, Tuple[float, float]]" = OrderedDict()  # key -> (arrived, stamped)
+        self.checked = 0
+        self.suppressed = 0
+        self.suppressed_by_location: "OrderedDict[str, int]" = OrderedDict()
+
+    def _key(self, signal: Signal) -> bytes:
+        raw = "|".join([
+            normalise_body(signal.metadata.get("raw_body", "")),
+            str(signal.metadata.get("sender", "")),
+            signal.location,
+        ])
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).digest()
+
+    def is_duplicate(self, signal: Signal) -> bool:
+        if signal.type != "report" or "raw_body" not in signal.metadata:
+            return False
+        self.checked += 1
+        now = self.clock()
+
+        # Entries are in arrival order, so expired ones sit at the front
+        while self.entries:
+            arrived, _ = next(iter(self.entries.values()))
+            if now - arrived < self.window_s:
+                break
+            self.entries.popitem(last=False)
+
+        key = self._key(signal)
+        stamped = signal_epoch(signal)
+        seen = self.entries.get(key)
+        if seen is not None and abs(stamped - seen[1]) < self.window_s:
+            self.suppressed += 1
+            by_location = self.suppressed_by_location
+            by_location[signal.location] = by_location.pop(signal.location, 0) + 1
+            if len(by_location) > self.max_locations:
+                by_location.popitem(last=False)
+            return True
+
+        self.entries[key] = (now, stamped)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "window_s": self.window_s,
+            "tracked": len(self.entries),
+            "checked": self.checked,
+            "suppressed": self.suppressed,
+            "suppressed_by_location": dict(self.suppressed_by_location),
+        }
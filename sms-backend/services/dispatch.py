@@ -0,0 +1,169 @@
+import heapq
+import math
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from models import Event, Team
+from services.spatial import KDTree
+
+SEVERITY_WEIGHT = {"info": 1.0, "warning": 3.0, "critical": 9.0}
+
+class DispatchQueue:
+    """
+    Open events waiting for a field team, highest priority first, and the
+    teams that can take them.
+
+    Priority is severity x confidence x exp(age / tau). Taking the log turns
+    that into log(severity x confidence) - first_seen / tau plus a term that
+    is the same for every event, so heap keys never need re-aging. Updates
+    push a new entry and bump the event's version; stale entries are dropped
+    when they surface. Each event goes to the nearest team with spare
+    capacity, found through a KD-tree over team positions.
+
+    `on_change(event)` is called whenever the queue changes an event's
+    status or assignment.
+    """
+    def __init__(self, tau_s: float = 900.0, on_change: Optional[Callable[[Event], None]] = None):
+        self.tau_s = tau_s
+        self.on_change = on_change
+        self.teams: Dict[str, Team] = {}
+        self.events: Dict[str, Event] = {}
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._version: Dict[str, int] = {}
+        self._first_seen: Dict[str, float] = {}
+        self._seq = 0
+        self._epoch = time.time()
+        self._tree: Optional[KDTree] = None
+        self._free_slots = 0  # spare capacity across active teams; 0 short-circuits dispatch
+
+    def _changed(self, event: Event):
+        if self.on_change:
+            self.on_change(event)
+
+    @staticmethod
+    def _free(team: Team) -> int:
+        return max(0, team.capacity - len(team.assignments)) if team.active else 0
+
+    # --- Teams ---
+
+    def add_team(self, team: Team) -> Team:
+        if team.capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if team.id in self.teams:
+            team.assignments = self.teams[team.id].assignments
+            self._free_slots -= self._free(self.teams[team.id])
+        self.teams[team.id] = team
+        self._free_slots += self._free(team)
+        self._tree = None
+        return team
+
+    def remove_team(self, team_id: str) -> bool:
+        team = self.teams.pop(team_id, None)
+        if team is None:
+            return False
+        self._tree = None
+        self._free_slots -= self._free(team)
+        for event_id in team.assignments:
+            self._requeue(event_id)
+        return True
+
+    def move_team(self, team_id: str, coords: List[float]) -> Team:
+        team = self.teams[team_id]
+        team.coords = coords
+        self._tree = None
+        return team
+
+    def nearest_available(self, coords: List[float]) -> Optional[Tuple[float, Team]]:
+        if self._free_slots <= 0:
+            return None
+        if self._tree is None:
+            teams = list(self.teams.values())
+            self._tree = KDTree([t.coords for t in teams], [t.id for t in teams])
+        k = 8
+        while True:
+            matches = self._tree.nearest(coords[0], coords[1], min(k, len(self._tree)))
+            for dist, team_id in matches:
+                team = self.teams[team_id]
+                if team.active and len(team.assignments) < team.capacity:
+                    return dist, team
+            if k >= len(self._tree):
+                return None
+            k *= 4
+
+    # --- Events ---
+
+    def priority(self, event: Event) -> float:
+        weight = SEVERITY_WEIGHT.get(event.severity, 1.0) * max(event.confidence, 1e-6)
+        return math.log(weight) - self._first_seen[event.id] / self.tau_s
+
+    def upsert(self, event: Event):
+        """Queues a new open event or re-prioritises a queued one."""
+        if event.status == "resolved" or event.assigned_team:
+            return
+        self.events[event.id] = event
+        self._first_seen.setdefault(event.id, time.time() - self._epoch)
+        version = self._version.get(event.id, 0) + 1
+        self._version[event.id] = version
+        self._seq += 1
+        heapq.heappush(self._heap, (-self.priority(event), self._seq, event.id, version))
+
+    def _requeue(self, event_id: str):
+        event = self.events.get(event_id)
+        if event is not None:
+            event.assigned_team = None
+            event.status = "verified" if event.confidence > 0.7 else "detected"
+            self._changed(event)
+            self.upsert(event)
+
+    def pending(self) -> int:
+        return len(self._version)
+
+    def dispatch(self) -> List[dict]:
+        """Assigns queued events to teams until either runs out."""
+        assigned = []
+        while self._heap:
+            neg_priority, _, event_id, version = self._heap[0]
+            if self._version.get(event_id) != version:
+                heapq.heappop(self._heap)
+                continue
+            event = self.events[event_id]
+            match = self.nearest_available(event.coords)
+            if match is None:
+                break
+            heapq.heappop(self._heap)
+            del self._version[event_id]
+            dist, team = match
+            team.assignments.append(event_id)
+            self._free_slots -= 1
+            event.assigned_team = team.id
+            event.status = "dispatched"
+            self._changed(event)
+            assigned.append({"event_id": event_id, "team_id": team.id, "distance_km": round(dist, 3),
+                             "priority": round(-neg_priority, 4)})
+        return assigned
+
+    def complete(self, event_id: str) -> Optional[Event]:
+        """Marks a dispatched event resolved and frees its team."""
+        event = self.events.pop(event_id, None)
+        if event is None:
+            return None
+        team = self.teams.get(event.assigned_team)
+        if team and event_id in team.assignments:
+            team.assignments.remove(event_id)
+            if team.active:
+                self._free_slots += 1
+        self._version.pop(event_id, None)
+        self._first_seen.pop(event_id, None)
+        event.status = "resolved"
+        self._changed(event)
+        return event
+
+    def queue(self, limit: int = 50) -> List[dict]:
+        live = sorted(e for e in self._heap if self._version.get(e[2]) == e[3])[:limit]
+        return [{"event_id": eid, "priority": round(-p, 4), "severity": self.events[eid].severity,
+                 "confidence": self.events[eid].confidence} for p, _, eid, _ in live]
+
+    def reset(self):
+        for team in self.teams.values():
+            team.assignments = []
+        self._free_slots = sum(self._free(t) for t in self.teams.values())
+        self.events, self._heap, self._version, self._first_seen = {}, [], {}, {}
@@ -0,0 +1,554 @@
+import asyncio
+import json
+import os
+import random
+import struct
+import time
+import uuid
+import zlib
+from collections import deque
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import requests
+from models import Signal
+
+FRAME_MAGIC = b"SADA"
+FRAME_VERSION = 1  # bump whenever the layout or ZDICT changes
+FLAG_RESYNC = 1    # the edge no longer holds what the central is missing: accept from base_seq on
+# Metadata the engine derives on ingest; the central derives it again, so it never goes on the wire
+DERIVED_KEYS = {"baseline", "cluster", "duplicate", "offline_switch", "trace_id", "nearest_assets", "asset_id", "affected_sectors"}
+# Central-side signal IDs are uuid5(node:seq), the same however often a frame is resent
+EDGE_NAMESPACE = uuid.UUID("5ada0e0d-6e00-4f5a-9c1e-0d6e5ada0001")
+EPOCH = datetime(1970, 1, 1)
+# Preset deflate dictionary: strings nearly every frame repeats, so even small frames compress
+ZDICT = ('{"raw_body":"#SOS #AID #WATER #POWER #BROKEN #DIRTY KHARTOUM OMDURMAN BAHRI KALAKLA JABRA KARARI '
+         'SHAMBAT BURRI","report_type":"AID","report_type":"WATER","report_type":"POWER","report_type":"OTHER",'
+         '"sender":"+249","metric":"turbidity_ntu","notes":"","status":"Khartoum Central Omdurman Market '
+         'Bahri Industrial Unknown Sector report sensor satellite SADA_SMS REAL_SMS SMS_SIMULATOR VIIRS '
+         'WAPOR GRID_GIS FAO_AQUASTAT HDX_HOT SENTINEL_1 REPORTS TURBIDITY critical warning info detected '
+         'verified dispatched').encode()
+
+class FrameError(ValueError):
+    """A frame that is truncated, corrupted or from an incompatible version."""
+
+# --- Frame codec ---
+# A frame is FRAME_MAGIC, version, flags, the node ID, the sequence number of its first
+# signal, the signal count and a CRC32, followed by one deflate stream holding a string
+# table, the signals and the cluster aggregates. Integers are varints; coordinates
+# (1e-6 degrees), values (1e-3) and timestamps (microseconds) are delta-coded against
+# the previous signal, so a burst from one neighbourhood costs a few bytes a field.
+
+def _varint(out: bytearray, n: int):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _zigzag(out: bytearray, n: int):
+    _varint(out, n << 1 if n >= 0 else (-n << 1) - 1)
+
+class _Reader:
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def varint(self) -> int:
+        shift = result = 0
+        while True:
+            b = self.data[self.pos]
+            self.pos += 1
+            result |= (b & 0x7F) << shift
+            if b < 0x80:
+                return result
+            shift += 7
+
+    def zigzag(self) -> int:
+        n = self.varint()
+        return (n >> 1) ^ -(n & 1)
+
+    def take(self, n: int) -> bytes:
+        if self.pos + n > len(self.data):
+            raise IndexError("read past the end")
+        chunk = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return chunk
+
+class _Strings:
+    """Per-frame string table, so each location/source/key is sent once."""
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+
+    def __call__(self, s: str) -> int:
+        i = self.index.get(s)
+        if i is None:
+            i = self.index[s] = len(self.index)
+        return i
+
+def _micros(ts: str) -> Optional[int]:
+    """Microseconds since the epoch for a naive ISO timestamp that round-trips exactly."""
+    try:
+        dt = datetime.fromisoformat(ts)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is not None or dt.isoformat() != ts:
+        return None
+    return (dt - EPOCH) // timedelta(microseconds=1)
+
+def wire_record(signal: Signal) -> dict:
+    """What an edge node ships for a signal: its fields and the metadata the engine did not derive."""
+    return {"type": signal.type, "source": signal.source, "location": signal.location,
+            "coords": [signal.coords[0], signal.coords[1]], "value": signal.value, "timestamp": signal.timestamp,
+            "metadata": {k: v for k, v in signal.metadata.items() if k not in DERIVED_KEYS}}
+
+def cluster_view(engine, key: str) -> dict:
+    """An edge cluster's aggregates as synced; clusters since merged or cleared name their fate."""
+    cluster = engine.clusters.clusters.get(key)
+    if cluster is None:
+        merged_into = engine.clusters.find(key) if key in engine.clusters.parent else ""
+        return {"key": key, "merged_into": merged_into}
+    view = {"key": key, "merged_into": None, "size": len(cluster), "centroid": cluster.centroid,
+            "extent": cluster.extent, "categories": dict(cluster.categories), "event": None}
+    event = engine.events_by_cluster.get(key)
+    if event is not None and event.status != "resolved":
+        view["event"] = {"type": event.type, "severity": event.severity,
+                         "confidence": event.confidence, "status": event.status}
+    return view
+
+def encode_frame(node_id: str, base_seq: int, records: List[dict], clusters: List[dict] = (), flags: int = 0) -> bytes:
+    strings = _Strings()
+    body = bytearray()
+    lat = lng = value = ts = 0
+    for rec in records:
+        _varint(body, strings(rec["type"]))
+        _varint(body, strings(rec["source"]))
+        _varint(body, strings(rec["location"]))
+        r_lat, r_lng = round(rec["coords"][0] * 1e6), round(rec["coords"][1] * 1e6)
+        r_value = round(rec["value"] * 1000)
+        _zigzag(body, r_lat - lat)
+        _zigzag(body, r_lng - lng)
+        _zigzag(body, r_value - value)
+        lat, lng, value = r_lat, r_lng, r_value
+        metadata = rec["metadata"]
+        micros = _micros(rec["timestamp"])
+        if micros is None:
+            metadata = {**metadata, "_timestamp": rec["timestamp"]}
+            micros = ts
+        _zigzag(body, micros - ts)
+        ts = micros
+        meta = json.dumps(metadata, separators=(",", ":"), ensure_ascii=False).encode() if metadata else b""
+        _varint(body, len(meta))
+        body += meta
+
+    _varint(body, len(clusters))
+    for view in clusters:
+        _varint(body, strings(view["key"]))
+        merged_into = view.get("merged_into")
+        _varint(body, 0 if merged_into is None else strings(merged_into) + 1)
+        if merged_into is not None:
+            continue
+        _varint(body, view["size"])
+        c_lat, c_lng = round(view["centroid"][0] * 1e6), round(view["centroid"][1] * 1e6)
+        _zigzag(body, c_lat)
+        _zigzag(body, c_lng)
+        for i, corner in enumerate(view["extent"]):
+            _zigzag(body, round(corner * 1e6) - (c_lat if i % 2 == 0 else c_lng))
+        _varint(body, len(view["categories"]))
+        for cat, n in view["categories"].items():
+            _varint(body, strings(cat))
+            _varint(body, n)
+        event = view.get("event")
+        _varint(body, 0 if event is None else strings(event["type"]) + 1)
+        if event is not None:
+            _varint(body, strings(event["severity"]))
+            _varint(body, strings(event["status"]))
+            _varint(body, round(event["confidence"] * 1000))
+
+    table = bytearray()
+    _varint(table, len(strings.index))
+    for s in strings.index:
+        raw = s.encode()
+        _varint(table, len(raw))
+        table += raw
+    deflate = zlib.compressobj(level=9, zdict=ZDICT)
+    payload = deflate.compress(bytes(table + body)) + deflate.flush()
+
+    header = bytearray(FRAME_MAGIC)
+    header += struct.pack("!BB", FRAME_VERSION, flags)
+    node = node_id.encode()
+    _varint(header, len(node))
+    header += node
+    _varint(header, base_seq)
+    _varint(header, len(records))
+    header += struct.pack("!I", zlib.crc32(payload))
+    return bytes(header) + payload
+
+def decode_frame(data: bytes) -> dict:
+    """
+    Returns {"node", "flags", "base_seq", "signals": [Signal kwargs], "clusters": [cluster views]};
+    raises FrameError for anything that does not check out.
+    """
+    if data[:4] != FRAME_MAGIC:
+        raise FrameError("not a SADA frame")
+    try:
+        version, flags = struct.unpack_from("!BB", data, 4)
+        if version != FRAME_VERSION:
+            raise FrameError(f"unsupported frame version {version}")
+        head = _Reader(data, 6)
+        node = head.take(head.varint()).decode()
+        base_seq, count = head.varint(), head.varint()
+        (crc,) = struct.unpack("!I", head.take(4))
+        payload = data[head.pos:]
+        if zlib.crc32(payload) != crc:
+            raise FrameError("checksum mismatch")
+        inflate = zlib.decompressobj(zdict=ZDICT)
+        r = _Reader(inflate.decompress(payload) + inflate.flush())
+        strings = [r.take(r.varint()).decode() for _ in range(r.varint())]
+
+        signals = []
+        lat = lng = value = ts = 0
+        for _ in range(count):
+            kind, source, location = strings[r.varint()], strings[r.varint()], strings[r.varint()]
+            lat += r.zigzag()
+            lng += r.zigzag()
+            value += r.zigzag()
+            ts += r.zigzag()
+            size = r.varint()
+            metadata = json.loads(r.take(size)) if size else {}
+            if not isinstance(metadata, dict):
+                raise FrameError("malformed frame: signal metadata is not an object")
+            timestamp = metadata.pop("_timestamp", None) or (EPOCH + timedelta(microseconds=ts)).isoformat()
+            if not isinstance(timestamp, str):
+                raise FrameError("malformed frame: signal timestamp is not a string")
+            signals.append({"type": kind, "source": source, "location": location, "coords": [lat / 1e6, lng / 1e6],
+                            "value": value / 1000, "timestamp": timestamp, "metadata": metadata})
+
+        clusters = []
+        for _ in range(r.varint()):
+            key, merged = strings[r.varint()], r.varint()
+            if merged:
+                clusters.append({"key": key, "merged_into": strings[merged - 1]})
+                continue
+            size = r.varint()
+            c_lat, c_lng = r.zigzag(), r.zigzag()
+            extent = [(r.zigzag() + (c_lat if i % 2 == 0 else c_lng)) / 1e6 for i in range(4)]
+            categories = {strings[r.varint()]: r.varint() for _ in range(r.varint())}
+            event_type = r.varint()
+            event = None
+            if event_type:
+                event = {"type": strings[event_type - 1], "severity": strings[r.varint()],
+                         "status": strings[r.varint()], "confidence": r.varint() / 1000}
+            clusters.append({"key": key, "merged_into": None, "size": size, "centroid": [c_lat / 1e6, c_lng / 1e6],
+                             "extent": extent, "categories": categories, "event": event})
+    except FrameError:
+        raise
+    except (IndexError, ValueError, UnicodeDecodeError, zlib.error, struct.error) as e:
+        raise FrameError(f"malformed frame: {e}") from e
+    return {"node": node, "flags": flags, "base_seq": base_seq, "signals": signals, "clusters": clusters}
+
+class EdgeOutbox:
+    """
+    Durable, ordered record of what a Guardian node has captured. Every
+    signal gets the next sequence number and is appended to an NDJSON
+    journal before it can be sent; `acked` -- the highest sequence number
+    the central has confirmed -- is rewritten atomically. A restarted node
+    resumes from the first unacknowledged signal, and the journal is cut
+    back whenever everything in it has been confirmed.
+    """
+    def __init__(self, directory: str, node_id: Optional[str] = None, compact_after: int = 10000):
+        os.makedirs(directory, exist_ok=True)
+        self.journal_path = os.path.join(directory, "outbox.ndjson")
+        self.state_path = os.path.join(directory, "state.json")
+        self.compact_after = compact_after
+        state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                state = json.load(f)
+        self.node_id = node_id or state.get("node_id") or f"guardian-{uuid.uuid4().hex[:8]}"
+        self.acked = state.get("acked", 0)
+        self.next_seq = max(state.get("next_seq", 1), self.acked + 1)
+        self.records: deque = deque()  # (seq, wire record) not yet confirmed, in order
+        self._load_journal()
+        self._stale = 0  # confirmed records still in the journal
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._save_state()
+
+    def _load_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break  # torn last line from a crash mid-write
+                seq = rec.pop("seq")
+                if seq > self.acked:
+                    self.records.append((seq, rec))
+                self.next_seq = max(self.next_seq, seq + 1)
+        # Rewrite without the torn tail and the confirmed head
+        self._rewrite()
+
+    def _rewrite(self):
+        tmp = self.journal_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for seq, rec in self.records:
+                f.write(json.dumps({"seq": seq, **rec}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.journal_path)
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"node_id": self.node_id, "acked": self.acked, "next_seq": self.next_seq}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.state_path)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def floor(self) -> int:
+        """The oldest sequence number still held."""
+        return self.records[0][0] if self.records else self.next_seq
+
+    def append(self, signal: Signal) -> int:
+        seq = self.next_seq
+        self.next_seq += 1
+        rec = wire_record(signal)
+        self.records.append((seq, rec))
+        self._journal.write(json.dumps({"seq": seq, **rec}, separators=(",", ":")) + "\n")
+        self._journal.flush()
+        return seq
+
+    def pending(self, limit: int) -> List[Tuple[int, dict]]:
+        return list(islice(self.records, limit))
+
+    def ack(self, seq: int):
+        seq = min(seq, self.next_seq - 1)
+        if seq <= self.acked:
+            return
+        self.acked = seq
+        while self.records and self.records[0][0] <= seq:
+            self.records.popleft()
+            self._stale += 1
+        self._save_state()
+        if not self.records or self._stale >= self.compact_after:
+            self._journal.close()
+            self._rewrite()
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            self._stale = 0
+
+    def close(self):
+        self._journal.close()
+
+class EdgeSync:
+    """
+    Pushes a Guardian node's outbox to the central engine over HTTP, one
+    frame in flight at a time: up to `max_batch` unconfirmed signals plus
+    the aggregates of every cluster that changed since the central last
+    confirmed them. The central's reply names the highest sequence number
+    it holds, so a lost reply only means the next frame overlaps, which
+    the central skips. Failures back off exponentially with full jitter.
+    """
+    def __init__(self, outbox: EdgeOutbox, central_url: str, engine=None, max_batch: int = 1000,
+                 interval: float = 1.0, timeout: float = 15.0, backoff_initial: float = 0.5, backoff_max: float = 30.0):
+        self.outbox = outbox
+        self.url = central_url.rstrip("/") + "/edge/sync"
+        self.engine = engine
+        self.max_batch = max_batch
+        self.interval = interval
+        self.timeout = timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.resync = False
+        self.unsynced: Dict[str, int] = {}  # cluster key -> change number not yet confirmed
+        self._changes = 0
+        if engine is not None:
+            engine.changed_clusters = {}
+        self.stats = {"frames": 0, "signals": 0, "bytes": 0, "clusters": 0, "failures": 0, "gaps": 0,
+                      "shed": 0, "last_error": None, "last_sync": None}
+
+    def build_frame(self) -> Tuple[Optional[bytes], int, Dict[str, int]]:
+        """(frame or None when there is nothing to send, signals in it, cluster versions in it)."""
+        if self.engine is not None and self.engine.changed_clusters:
+            changed, self.engine.changed_clusters = self.engine.changed_clusters, {}
+            for key in changed:
+                self._changes += 1
+                self.unsynced[key] = self._changes
+        records = self.outbox.pending(self.max_batch)
+        if not records and not self.unsynced:
+            return None, 0, {}
+        sent = dict(self.unsynced)
+        clusters = [cluster_view(self.engine, key) for key in sent] if self.engine is not None else []
+        base = records[0][0] if records else self.outbox.acked + 1
+        frame = encode_frame(self.outbox.node_id, base, [rec for _, rec in records], clusters,
+                             FLAG_RESYNC if self.resync else 0)
+        return frame, len(records), sent
+
+    def _post(self, frame: bytes) -> dict:
+        r = requests.post(self.url, data=frame, timeout=self.timeout,
+                          headers={"Content-Type": "application/octet-stream"})
+        r.raise_for_status()
+        return r.json()
+
+    async def sync_once(self) -> bool:
+        """Sends one frame; False when there was nothing to send."""
+        frame, count, sent = self.build_frame()
+        if frame is None:
+            return False
+        reply = await asyncio.get_running_loop().run_in_executor(None, self._post, frame)
+        if "acked" not in reply:
+            raise RuntimeError(reply.get("message", "central did not acknowledge"))
+        self.stats["frames"] += 1
+        self.stats["bytes"] += len(frame)
+        if reply.get("status") == "gap":
+            # The central lost what we already had confirmed: resend from here and say so
+            self.stats["gaps"] += 1
+            self.resync = True
+            return True
+        self.resync = False
+        before = self.outbox.acked
+        self.outbox.ack(reply["acked"])
+        self.stats["signals"] += self.outbox.acked - before
+        for key, change in sent.items():
+            if self.unsynced.get(key) == change:
+                del self.unsynced[key]
+        self.stats["clusters"] += len(sent)
+        self.stats["last_sync"] = time.time()
+        if reply.get("shed"):
+            # The central was overloaded: back off, then resend what it did not take
+            self.stats["shed"] += reply["shed"]
+            raise RuntimeError(f"central shed {reply['shed']} signals")
+        return True
+
+    async def run(self):
+        attempt = 0
+        while True:
+            try:
+                if not await self.sync_once():
+                    await asyncio.sleep(self.interval)
+                attempt = 0
+                continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["failures"] += 1
+                self.stats["last_error"] = f"{type(e).__name__}: {e}"
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_initial * (2 ** attempt)))
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def snapshot(self) -> dict:
+        return {"node_id": self.outbox.node_id, "central": self.url, "acked": self.outbox.acked,
+                "captured": self.outbox.next_seq - 1, "pending": len(self.outbox),
+                "clusters_pending": len(self.unsynced), **self.stats}
+
+class EdgeReceiver:
+    """
+    Central side of the sync. Each node's frames are applied in sequence
+    and exactly once: signals at or below the node's `applied` mark are
+    skipped, a frame starting past it is refused with the mark so the node
+    can resend (unless flagged FLAG_RESYNC), and the rest go to `submit`
+    with IDs derived from (node, seq). Signals admission sheds are not
+    acknowledged: `applied` only moves past signals that were admitted,
+    those admitted beyond a shed one are remembered so the resend skips
+    them. A node the central has not seen (including after a central
+    restart) is accepted from wherever it is.
+    Cluster aggregates are absolute, so re-applying them is harmless; they
+    are only taken from frames at least as new as the last applied.
+    """
+    def __init__(self, submit: Callable[[Signal], Awaitable]):
+        self.submit = submit
+        self.nodes: Dict[str, dict] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}  # per node: one node's frame never waits on another's
+        self.stats = {"frames": 0, "bytes": 0, "signals": 0, "duplicates": 0, "shed": 0, "gaps": 0, "rejected": 0}
+
+    async def apply(self, data: bytes) -> dict:
+        try:
+            frame = decode_frame(data)
+        except FrameError as e:
+            self.stats["rejected"] += 1
+            return {"status": "error", "message": str(e)}
+
+        node_id, base, records = frame["node"], frame["base_seq"], frame["signals"]
+        end = base + len(records) - 1
+        async with self._locks.setdefault(node_id, asyncio.Lock()):
+            node = self.nodes.get(node_id)
+            if node is None:
+                node = self.nodes[node_id] = {"applied": base - 1, "joined_at": base, "aggregate_seq": -1,
+                                              "frames": 0, "bytes": 0, "signals": 0, "duplicates": 0,
+                                              "shed": 0, "resyncs": 0, "last_sync": None, "clusters": {},
+                                              "ahead": set()}
+            elif base > node["applied"] + 1:
+                if not frame["flags"] & FLAG_RESYNC:
+                    self.stats["gaps"] += 1
+                    return {"status": "gap", "acked": node["applied"]}
+                node["applied"] = base - 1
+                node["ahead"] = {seq for seq in node["ahead"] if seq >= base}
+                node["resyncs"] += 1
+
+            # Seqs admitted past a shed signal by an earlier frame: ingested, just not acknowledged yet
+            ahead = node["ahead"]
+            skip = min(len(records), max(0, node["applied"] + 1 - base))
+            seqs, signals = [], []
+            for seq, rec in enumerate(records[skip:], base + skip):
+                if seq in ahead:
+                    skip += 1
+                    continue
+                rec["metadata"].update(edge_node=node_id, edge_seq=seq)
+                seqs.append(seq)
+                signals.append(Signal(id=str(uuid.uuid5(EDGE_NAMESPACE, f"{node_id}:{seq}")), **rec))
+            results = await asyncio.gather(*(self.submit(s) for s in signals))
+            admitted = 0
+            for seq, events in zip(seqs, results):
+                if events is not None:
+                    ahead.add(seq)
+                    admitted += 1
+            shed = len(signals) - admitted
+            # Acknowledge up to the first signal that was not admitted
+            applied = node["applied"]
+            while applied + 1 in ahead:
+                applied += 1
+                ahead.discard(applied)
+            node["applied"] = applied
+
+            if end >= node["aggregate_seq"]:
+                node["aggregate_seq"] = end
+                for view in frame["clusters"]:
+                    if view["merged_into"] is None:
+                        node["clusters"][view["key"]] = view
+                    else:
+                        node["clusters"].pop(view["key"], None)
+
+            node["frames"] += 1
+            node["bytes"] += len(data)
+            node["signals"] += admitted
+            node["duplicates"] += skip
+            node["shed"] += shed
+            node["last_sync"] = time.time()
+            self.stats["frames"] += 1
+            self.stats["bytes"] += len(data)
+            self.stats["signals"] += admitted
+            self.stats["duplicates"] += skip
+            self.stats["shed"] += shed
+            return {"status": "ok", "acked": node["applied"], "shed": shed}
+
+    def snapshot(self) -> dict:
+        nodes = {}
+        for node_id, node in self.nodes.items():
+            summary = {k: v for k, v in node.items() if k not in ("clusters", "ahead")}
+            summary["clusters"] = len(node["clusters"])
+            summary["admitted_ahead"] = len(node["ahead"])
+            summary["events"] = sum(1 for view in node["clusters"].values() if view["event"])
+            nodes[node_id] = summary
+        return {**self.stats, "nodes": nodes}
+
+    def clusters(self, node_id: str) -> Optional[List[dict]]:
+        node = self.nodes.get(node_id)
+        return list(node["clusters"].values()) if node else None
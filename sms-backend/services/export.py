@@ -0,0 +1,237 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from itertools import islice
+from typing import AsyncIterator, Iterator, List, Optional
+
+# pyarrow is optional: without it only the chunked CSV export is available
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+DATASETS = ("signals", "events", "rollups")
+# Rows copied out of the engine between yields to the event loop
+ROW_SLICE = 1000
+
+COLUMNS = {
+    "signals": ["id", "timestamp", "type", "source", "location", "lat", "lng", "value", "metadata"],
+    "events": ["id", "timestamp", "title", "type", "severity", "confidence", "location",
+               "lat", "lng", "status", "signal_count", "proxy_details"],
+    "rollups": ["location", "source", "resolution", "start", "count", "min", "max", "mean"],
+}
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXTENSIONS = {"csv": "csv", "arrow": "arrows", "parquet": "parquet"}
+
+def available_formats() -> List[str]:
+    return ["parquet", "arrow", "csv"] if pa is not None else ["csv"]
+
+def _arrow_schema(dataset: str):
+    string, double, int64 = pa.string(), pa.float64(), pa.int64()
+    types = {
+        "value": double, "lat": double, "lng": double, "confidence": double,
+        "min": double, "max": double, "mean": double,
+        "count": int64, "signal_count": int64,
+    }
+    return pa.schema([(c, types.get(c, string)) for c in COLUMNS[dataset]])
+
+def _naive_utc(ts) -> Optional[datetime]:
+    """Parses an ISO timestamp -- naive (UTC), "Z" or with an offset -- to naive UTC; None if it does not parse."""
+    if isinstance(ts, str) and ts.endswith("Z"):
+        ts = ts[:-1] + "+00:00"
+    try:
+        dt = datetime.fromisoformat(ts)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+class ExportFilter:
+    """
+    Time window on ISO timestamps and a GeoJSON-ordered bbox
+    (min_lng, min_lat, max_lng, max_lat) on [lat, lng] coords.
+    """
+    def __init__(self, since: Optional[str] = None, until: Optional[str] = None, bbox: Optional[str] = None):
+        # Both bounds and row stamps are compared as naive-UTC datetimes: spooled and edge
+        # signals may carry "Z" or offset stamps that do not sort as strings
+        self.since = self._bound("since", since)
+        self.until = self._bound("until", until)
+        self.bbox = None
+        if bbox:
+            parts = [float(p) for p in bbox.split(",")]
+            if len(parts) != 4:
+                raise ValueError("bbox must be min_lng,min_lat,max_lng,max_lat")
+            self.bbox = parts
+
+    @staticmethod
+    def _bound(name: str, value: Optional[str]) -> Optional[datetime]:
+        if not value:
+            return None
+        dt = _naive_utc(value)
+        if dt is None:
+            raise ValueError(f"{name} must be an ISO 8601 timestamp, got {value!r}")
+        return dt
+
+    def match_time(self, ts: str) -> bool:
+        if self.since is None and self.until is None:
+            return True
+        dt = _naive_utc(ts)
+        if dt is None:
+            return False  # an unreadable stamp cannot be placed in the window
+        if self.since is not None and dt < self.since:
+            return False
+        if self.until is not None and dt >= self.until:
+            return False
+        return True
+
+    def match_coords(self, coords) -> bool:
+        if not self.bbox:
+            return True
+        min_lng, min_lat, max_lng, max_lat = self.bbox
+        return min_lat <= coords[0] <= max_lat and min_lng <= coords[1] <= max_lng
+
+def iter_rows(dataset: str, engine, flt: ExportFilter, resolution: Optional[str] = None) -> Iterator[dict]:
+    """
+    Yields export rows one at a time. Lists are bounded to their length at
+    call time, so rows ingested mid-export are not included.
+    """
+    if dataset == "signals":
+        signals = engine.signals
+        for s in islice(signals, len(signals)):
+            if flt.match_time(s.timestamp) and flt.match_coords(s.coords):
+                yield {
+                    "id": s.id, "timestamp": s.timestamp, "type": s.type, "source": s.source,
+                    "location": s.location, "lat": s.coords[0], "lng": s.coords[1],
+                    "value": s.value, "metadata": json.dumps(s.metadata, default=str),
+                }
+    elif dataset == "events":
+        events = engine.events
+        for e in islice(events, len(events)):
+            if flt.match_time(e.timestamp) and flt.match_coords(e.coords):
+                yield {
+                    "id": e.id, "timestamp": e.timestamp, "title": e.title, "type": e.type,
+                    "severity": e.severity, "confidence": e.confidence, "location": e.location,
+                    "lat": e.coords[0], "lng": e.coords[1], "status": e.status,
+                    "signal_count": len(e.signals), "proxy_details": json.dumps(e.proxy_details),
+                }
+    elif dataset == "rollups":
+        # Rollups are keyed by location name only, so the bbox filter does not apply
+        resolutions = [resolution] if resolution else ["1m", "1h", "1d"]
+        for key in engine.rollups.keys():
+            for res in resolutions:
+                for point in engine.rollups.series(key["location"], key["source"], res):
+                    if flt.match_time(point["start"]):
+                        yield {"location": key["location"], "source": key["source"], "resolution": res, **point}
+    else:
+        raise ValueError(f"Unknown dataset '{dataset}'. Expected one of {list(DATASETS)}")
+
+async def _chunks(rows: Iterator[dict], size: int) -> AsyncIterator[List[dict]]:
+    """
+    Pulls rows on the event loop -- where ingest mutates the engine, so rows
+    are consistent copies -- yielding to other tasks every ROW_SLICE rows.
+    """
+    while True:
+        chunk: List[dict] = []
+        while len(chunk) < size:
+            want = min(ROW_SLICE, size - len(chunk))
+            part = list(islice(rows, want))
+            chunk.extend(part)
+            if len(part) < want:
+                break
+            await asyncio.sleep(0)
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < size:
+            return
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands back whatever was written since the last drain."""
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        data = bytes(b)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+async def stream_export(dataset: str, engine, fmt: str, flt: ExportFilter,
+                        chunk_size: int = 10000, resolution: Optional[str] = None) -> AsyncIterator[bytes]:
+    """
+    Encodes the dataset chunk by chunk. Rows are built on the event loop
+    and each chunk is encoded in a worker thread, so a download never reads
+    engine state while ingest is changing it. Only one chunk of rows and its
+    encoded bytes are held in memory at a time.
+    """
+    rows = iter_rows(dataset, engine, flt, resolution)
+    columns = COLUMNS[dataset]
+    loop = asyncio.get_running_loop()
+
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+
+        def encode(chunk: List[dict]) -> bytes:
+            writer.writerows(chunk)
+            data = buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+            return data
+
+        header = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+        yield header
+        async for chunk in _chunks(rows, chunk_size):
+            yield await loop.run_in_executor(None, encode, chunk)
+        return
+
+    if pa is None:
+        raise ValueError(f"Format '{fmt}' requires pyarrow, which is not installed")
+
+    schema = _arrow_schema(dataset)
+    sink = _ChunkSink()
+    if fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+        write = lambda chunk: writer.write_batch(pa.RecordBatch.from_pylist(chunk, schema=schema))
+    elif fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+        write = lambda chunk: writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+    else:
+        raise ValueError(f"Unknown format '{fmt}'. Expected one of {available_formats()}")
+
+    def encode(chunk: List[dict]) -> bytes:
+        write(chunk)
+        return sink.drain()
+
+    async for chunk in _chunks(rows, chunk_size):
+        data = await loop.run_in_executor(None, encode, chunk)
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
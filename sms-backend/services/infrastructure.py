@@ -0,0 +1,210 @@
+import json
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional, Set
+from models import Signal, InfrastructureStatus
+from services.baselines import is_anomalous
+from services.spatial import KDTree
+
+def _feature_coords(geometry: dict) -> List[float]:
+    """Representative [lat, lng] for a Point or the middle vertex of a line."""
+    coords = geometry["coordinates"]
+    if geometry["type"] == "Point":
+        lng, lat = coords[:2]
+    elif geometry["type"] == "LineString":
+        lng, lat = coords[len(coords) // 2][:2]
+    elif geometry["type"] == "MultiLineString":
+        line = coords[0]
+        lng, lat = line[len(line) // 2][:2]
+    else:
+        raise ValueError(f"Unsupported geometry type {geometry['type']}")
+    return [lat, lng]
+
+class InfrastructureGraph:
+    """
+    Directed "feeds" graph of substations, water plants and pipe segments
+    down to the sectors they serve.
+
+    Downstream sector reachability is precomputed once per node at load.
+    Each sector keeps the set of its offline upstream assets, so a status change
+    touches only that node's precomputed sectors instead of re-walking the graph.
+
+    Statuses come from two places. Operators (and the catalogue itself) set
+    them by hand with `override`; readings never undo those, only setting
+    the asset back to active does. Otherwise `observe` takes an asset
+    offline while any sector it feeds has an anomalous latest reading, and
+    brings it back once none has.
+    """
+    def __init__(self, nodes: List[InfrastructureStatus], edges: Dict[str, List[str]], geometries: Dict[str, dict] = None):
+        self.nodes: Dict[str, InfrastructureStatus] = {n.id: n for n in nodes}
+        self.edges = {nid: [t for t in edges.get(nid, []) if t in self.nodes] for nid in self.nodes}
+        self.geometries = geometries or {}
+        self.parents: Dict[str, List[str]] = {nid: [] for nid in self.nodes}
+        for src, targets in self.edges.items():
+            for t in targets:
+                self.parents[t].append(src)
+
+        self.sector_by_name = {n.name: n.id for n in self.nodes.values() if n.type == "sector"}
+        sectors = [self.nodes[sid] for sid in self.sector_by_name.values()]
+        self.sector_tree = KDTree([n.coords for n in sectors], [n.id for n in sectors])
+        self.downstream: Dict[str, FrozenSet[str]] = self._precompute_reachability()
+        self.offline_upstream: Dict[str, Set[str]] = {sid: set() for sid in self.sector_by_name.values()}
+        self._initial_status = {nid: n.status for nid, n in self.nodes.items()}
+        self.manual: Set[str] = {nid for nid, status in self._initial_status.items() if status != "active"}
+        self.offline_readings: Dict[str, Set[str]] = {}  # asset -> sectors whose latest reading is anomalous
+        for nid, n in self.nodes.items():
+            if n.status == "offline":
+                self._apply(nid, True)
+
+    @classmethod
+    def from_geojson(cls, path: str) -> "InfrastructureGraph":
+        with open(path) as f:
+            collection = json.load(f)
+        nodes, edges, geometries = [], {}, {}
+        for feature in collection.get("features", []):
+            props = feature.get("properties", {})
+            nid = str(props["id"])
+            nodes.append(InfrastructureStatus(
+                id=nid,
+                name=props.get("name", nid),
+                type=props.get("type", "sector"),
+                coords=_feature_coords(feature["geometry"]),
+                status=props.get("status", "active"),
+            ))
+            edges[nid] = [str(t) for t in props.get("feeds", [])]
+            geometries[nid] = feature["geometry"]
+        return cls(nodes, edges, geometries)
+
+    def _precompute_reachability(self) -> Dict[str, FrozenSet[str]]:
+        # Memoised DFS; feeds graphs are expected to be acyclic, back edges are ignored
+        memo: Dict[str, FrozenSet[str]] = {}
+        visiting: Set[str] = set()
+
+        def walk(nid: str) -> FrozenSet[str]:
+            if nid in memo:
+                return memo[nid]
+            if nid in visiting:
+                return frozenset()
+            visiting.add(nid)
+            reach = set()
+            if self.nodes[nid].type == "sector":
+                reach.add(nid)
+            for child in self.edges[nid]:
+                reach |= walk(child)
+            visiting.discard(nid)
+            memo[nid] = frozenset(reach)
+            return memo[nid]
+
+        for nid in self.nodes:
+            walk(nid)
+        return memo
+
+    def _apply(self, node_id: str, offline: bool):
+        for sid in self.downstream[node_id]:
+            if offline:
+                self.offline_upstream[sid].add(node_id)
+            else:
+                self.offline_upstream[sid].discard(node_id)
+
+    def set_status(self, node_id: str, status: str) -> List[str]:
+        """
+        Updates one asset and returns the names of sectors whose affected
+        state changed as a result.
+        """
+        node = self.nodes[node_id]
+        was_offline = node.status == "offline"
+        node.status = status
+        node.last_updated = datetime.utcnow().isoformat()
+        is_offline = status == "offline"
+        if was_offline == is_offline:
+            return []
+
+        before = {sid: bool(self.offline_upstream[sid]) for sid in self.downstream[node_id]}
+        self._apply(node_id, is_offline)
+        return [self.nodes[sid].name for sid, was in before.items() if bool(self.offline_upstream[sid]) != was]
+
+    def override(self, node_id: str, status: str) -> List[str]:
+        """
+        Operator status change. Anything but active holds the asset there
+        whatever readings say; active is the explicit recovery and also
+        clears the outage readings against it.
+        """
+        if status == "active":
+            self.manual.discard(node_id)
+            self.offline_readings.pop(node_id, None)
+        else:
+            self.manual.add(node_id)
+        return self.set_status(node_id, status)
+
+    def nearest_sector(self, coords: List[float]) -> Optional[str]:
+        match = self.sector_tree.nearest(coords[0], coords[1])
+        return match[0][1] if match else None
+
+    def assets(self) -> List[InfrastructureStatus]:
+        """Everything except sectors: the catalogue signals get attributed to."""
+        return [n for n in self.nodes.values() if n.type != "sector"]
+
+    def asset_vertices(self) -> List[tuple]:
+        """([lat, lng], asset_id) for every vertex, so pipes match along their length."""
+        points = []
+        for node in self.assets():
+            geom = self.geometries.get(node.id)
+            if geom and geom["type"] == "LineString":
+                points.extend(([lat, lng], node.id) for lng, lat in (c[:2] for c in geom["coordinates"]))
+            elif geom and geom["type"] == "MultiLineString":
+                points.extend(([lat, lng], node.id) for line in geom["coordinates"] for lng, lat in (c[:2] for c in line))
+            else:
+                points.append((node.coords, node.id))
+        return points
+
+    def feeder_of(self, sector_id: str, node_type: str) -> Optional[str]:
+        """Direct upstream asset of the given type serving a sector."""
+        return next((p for p in self.parents.get(sector_id, []) if self.nodes[p].type == node_type), None)
+
+    def observe(self, signal: Signal) -> List[str]:
+        """
+        Maps GRID_GIS and WAPOR signals onto assets: an offline substation
+        reading or a moisture burst (as judged by the signal's baseline
+        verdict) marks the feeding asset, and every sector downstream of it,
+        as affected; a normal reading withdraws that sector's outage
+        reading. Returns sectors whose state changed.
+        """
+        if signal.source == "GRID_GIS":
+            node_type = "substation"
+        elif signal.source == "WAPOR":
+            node_type = "pipe_segment"
+        else:
+            return []
+
+        sector = self.sector_by_name.get(signal.location) or self.nearest_sector(signal.coords)
+        node_id = signal.metadata.get("asset_id")
+        if node_id not in self.nodes:
+            node_id = self.feeder_of(sector, node_type) if sector else None
+        if node_id is None:
+            return []
+
+        readings = self.offline_readings.setdefault(node_id, set())
+        if is_anomalous(signal):
+            readings.add(sector or signal.location)
+        else:
+            readings.discard(sector or signal.location)
+        offline = bool(readings)
+        if not readings:
+            del self.offline_readings[node_id]
+        if node_id in self.manual or offline == (self.nodes[node_id].status == "offline"):
+            return []
+
+        changed = self.set_status(node_id, "offline" if offline else "active")
+        if changed:
+            signal.metadata["asset_id"] = node_id
+            signal.metadata["affected_sectors"] = changed
+        return changed
+
+    def affected_sectors(self) -> Dict[str, List[str]]:
+        return {self.nodes[sid].name: sorted(up) for sid, up in self.offline_upstream.items() if up}
+
+    def reset_status(self):
+        self.manual = {nid for nid, status in self._initial_status.items() if status != "active"}
+        self.offline_readings = {}
+        for nid, status in self._initial_status.items():
+            if self.nodes[nid].status != status:
+                self.set_status(nid, status)
@@ -1,194 +1,313 @@
-from typing import List, Dict
+from typing import Callable, Iterable, List, Dict, Optional, Set
 from models import Signal, Event
+from services.rollups import RollupStore
+from services.dedup import DuplicateFilter
+from services.infrastructure import InfrastructureGraph
+from services.assets import AssetIndex
+from services.subscriptions import SEVERITY_RANK
+from services.rasters import RasterProxies
+from services.clustering import ClusterIndex, Cluster, categorize
+from services.rules import RuleSet
+from services.tracing import Tracer, current_trace
+from services.baselines import BaselineStore
+from services.admission import classify, PRIORITY_CRITICAL
 import uuid
 import random
-import math
+import time
 from datetime import datetime
 
+class PendingEvaluation:
+    """What a dirty cluster has gained since it was last scored."""
+    __slots__ = ("since", "first", "signal", "added", "new_source", "traces")
+
+    def __init__(self, since: float, first: int):
+        self.since = since
+        self.first = first  # index in engine.signals of the first signal waiting on this evaluation
+        self.signal: Optional[Signal] = None  # latest signal, read by the offline switch
+        self.added: Set[str] = set()
+        self.new_source = False
+        self.traces: List[tuple] = []  # (trace_id, marked at)
+
+    def fold(self, other: "PendingEvaluation"):
+        self.since = min(self.since, other.since)
+        self.first = min(self.first, other.first)
+        self.signal = self.signal or other.signal
+        self.added |= other.added
+        self.new_source = self.new_source or other.new_source
+        self.traces.extend(other.traces)
+
 class IntelligenceEngine:
-    def __init__(self):
+    def __init__(self, infrastructure: Optional[InfrastructureGraph] = None, rasters: Optional[RasterProxies] = None,
+                 rules: Optional[RuleSet] = None, batch_window_s: float = 0.0):
         self.signals: List[Signal] = []
         self.events: List[Event] = []
-        self.active_clusters: Dict[str, List[Signal]] = {} 
+        self.events_by_id: Dict[str, Event] = {}
+        self.clusters = ClusterIndex()
+        self.events_by_cluster: Dict[str, Event] = {}
+        self.dirty_events: Dict[str, None] = {}  # IDs changed since the read model last published, in order
+        # Cluster keys changed since an edge sync last collected them; None = not tracked
+        self.changed_clusters: Optional[Dict[str, None]] = None
+        self.rollups = RollupStore()
+        self.dedup = DuplicateFilter()
+        self.infrastructure = None
+        self.assets = AssetIndex()
+        self.rasters = rasters
+        self.baselines = BaselineStore()
+        self.rules = rules or RuleSet.load()
+        self.rule_winners: Dict[str, int] = {}  # cluster key -> index of its matching rule
+        self.tracer: Optional[Tracer] = None  # records stage spans for signals carrying a trace_id
+        # Micro-batching: with a window > 0, clusters are marked dirty on ingest and scored
+        # at most once per flush; a cluster waits at most the window, SOS/AID never waits
+        self.batch_window_s = batch_window_s
+        self.pending: Dict[str, PendingEvaluation] = {}  # cluster key -> pending re-evaluation, oldest first
+        self.batch_stats = {"deferred": 0, "evaluations": 0, "flushes": 0, "fast_path": 0, "max_batch": 0}
+        # Called as listener(event, "created" | "escalated" | "merged")
+        self.event_listeners: List[Callable[[Event, str], None]] = []
+        if infrastructure:
+            self.set_infrastructure(infrastructure)
+
+    def set_infrastructure(self, infrastructure: InfrastructureGraph):
+        """Swaps in a new infrastructure catalogue and rebuilds the asset index in bulk."""
+        self.infrastructure = infrastructure
+        self.assets.rebuild(infrastructure.assets(), infrastructure.asset_vertices())
+
+    def set_rules(self, rules: RuleSet):
+        """Swaps in a new rule table; clusters are re-matched against it on their next signal."""
+        self.rules = rules
+        self.rule_winners = {}
 
     def ingest_signal(self, signal: Signal) -> List[Event]:
+        trace = signal.metadata.get("trace_id") if self.tracer else None
+        if trace is None:
+            events = self._ingest(signal, None)
+        else:
+            # Listeners (alerts, dispatch) run inside ingest and attribute their work through this
+            token = current_trace.set(trace)
+            try:
+                events = self._ingest(signal, trace)
+            finally:
+                current_trace.reset(token)
+        if self.pending:
+            self.flush(self.batch_window_s)
+        return events
+
+    def _lap(self, trace: Optional[str], stage: str, start: float, **attrs) -> float:
+        now = time.perf_counter()
+        if trace:
+            self.tracer.record(trace, stage, start, now, **attrs)
+        return now
+
+    def _ingest(self, signal: Signal, trace: Optional[str]) -> List[Event]:
+        start = time.perf_counter()
+        # Resent SMS / redelivered pushes must not inflate report_count
+        if self.dedup.is_duplicate(signal):
+            signal.metadata["duplicate"] = True
+            self._lap(trace, "ingest", start, source=signal.source, duplicate=True)
+            return self.events
+
         self.signals.append(signal)
-        return self._evaluate_context(signal)
+        # Judge against this location's own baseline before clustering reads the verdict
+        self.baselines.observe(signal)
+        self.rollups.add(signal)
+        self.assets.attribute(signal)
+        if self.infrastructure:
+            self.infrastructure.observe(signal)
+        start = self._lap(trace, "ingest", start, source=signal.source)
+        cluster = self._assign(signal)
+        start = self._lap(trace, "cluster", start, cluster=cluster.key)
+
+        added = categorize(signal)
+        new_source = any(cluster.categories.get(c) == 1 for c in added)
+        if self.batch_window_s <= 0:
+            return self._evaluate_context(cluster, added, new_source, signal, trace)
 
+        entry = self.pending.get(cluster.key)
+        if entry is None:
+            entry = self.pending[cluster.key] = PendingEvaluation(start, len(self.signals) - 1)
+        entry.signal = signal
+        entry.added.update(added)
+        entry.new_source = entry.new_source or new_source
+        if trace:
+            entry.traces.append((trace, start))
+        if classify(signal) == PRIORITY_CRITICAL:
+            # SOS/AID fast path: score the cluster now, with whatever else it was waiting on
+            self.batch_stats["fast_path"] += 1
+            self._evaluate_pending(cluster.key)
+        else:
+            self.batch_stats["deferred"] += 1
+        return self.events
 
+    def flush(self, max_age: float = 0.0) -> int:
+        """
+        Scores every dirty cluster that has waited at least `max_age`
+        seconds (all of them by default) and returns how many were scored.
+        Callers batching ingest flush when they go idle.
+        """
+        if not self.pending:
+            return 0
+        now = time.perf_counter()
+        due = []
+        for key, entry in self.pending.items():
+            if now - entry.since < max_age:
+                break  # insertion order is oldest first
+            due.append(key)
+        for key in due:
+            self._evaluate_pending(key)
+        if due:
+            self.batch_stats["flushes"] += 1
+            self.batch_stats["max_batch"] = max(self.batch_stats["max_batch"], len(due))
+        return len(due)
 
-    def _calculate_distance(self, coord1, coord2):
-        # Haversine formula
-        R = 6371  # Earth radius in km
-        lat1, lon1 = math.radians(coord1[0]), math.radians(coord1[1])
-        lat2, lon2 = math.radians(coord2[0]), math.radians(coord2[1])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = math.sin(dlat / 2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        return R * c
+    def settled_count(self) -> int:
+        """
+        How many signals, in ingest order, have had their clusters scored.
+        Later ones may still gain derived metadata (the offline switch), so
+        readers publishing signals stop here.
+        """
+        if not self.pending:
+            return len(self.signals)
+        return next(iter(self.pending.values())).first  # insertion order is oldest first
 
-    def _find_cluster_for_location(self, new_location, new_coords):
-        # 1. Try exact location match first (legacy/named locations)
-        if new_location in self.active_clusters:
-            return new_location
-            
-        # 2. Try spatial match (200m radius)
-        # Check against existing cluster keys if we stored coords mapped to keys
-        # For MVP, active_clusters key is the location string. 
-        # We need to peek at the first signal in each cluster to get its coords.
-        for loc_key, signals in self.active_clusters.items():
-            if signals:
-                ref_signal = signals[0]
-                dist = self._calculate_distance(new_coords, ref_signal.coords)
-                if dist <= 0.2: # 200 meters
-                    return loc_key
-        
-        return None
-
-    def _evaluate_context(self, new_signal: Signal) -> List[Event]:
-        # Spatial Clustering Logic
-        target_cluster_key = self._find_cluster_for_location(new_signal.location, new_signal.coords)
-        
-        if not target_cluster_key:
-            target_cluster_key = new_signal.location
-            self.active_clusters[target_cluster_key] = []
-        
-        self.active_clusters[target_cluster_key].append(new_signal)
-        cluster_signals = self.active_clusters[target_cluster_key]
-        
-        # --- 1. Signal Categorization ---
-        # Electricity
-        viirs_signals = [s for s in cluster_signals if s.source == "VIIRS" and s.value < 40]
-        grid_signals = [s for s in cluster_signals if s.source == "GRID_GIS" and s.value == 0]
-        
-        # Water
-        wapor_signals = [s for s in cluster_signals if s.source == "WAPOR" and s.value > 70]
-        aquastat_signals = [s for s in cluster_signals if s.source == "FAO_AQUASTAT" and s.value > 70]
-        water_quality_signals = [s for s in cluster_signals if s.type == "sensor" and s.metadata.get("metric") == "turbidity_ntu" and s.value > 50]
-        
-        # Ground Truth / Human
-        hdx_signals = [s for s in cluster_signals if s.source == "HDX_HOT" and s.value > 0]
-        err_reports = [s for s in cluster_signals if s.type == "report" or s.source == "SMS" or s.source == "ERR"]
-        
-        # Structural / SAR (Sentinel-1)
-        sar_signals = [s for s in cluster_signals if s.source == "SENTINEL_1"] 
-
-        # --- 2. Calculate Proxy Accuracies (Confidence Contributions) ---
-        proxy_details = {}
-        
-        # Report Threshold Categories (Yellow/Orange/Red)
-        report_count = len(err_reports)
-        
-        # Electricity Proxies
-        if viirs_signals: proxy_details["VIIRS"] = random.uniform(0.3, 1.0)
-        if grid_signals: proxy_details["GRID_GIS"] = random.uniform(0.3, 1.0)
-        
-        # Water Proxies
-        if wapor_signals: proxy_details["WAPOR"] = random.uniform(0.3, 1.0)
-        if aquastat_signals: proxy_details["FAO_AQUASTAT"] = random.uniform(0.3, 1.0)
-        
-        # Human/Ground Truth
-        if hdx_signals: proxy_details["HDX_HOT"] = random.uniform(0.3, 1.0)
-        
-        # Dynamic Human Confidence based on Cluster Density
-        if report_count > 0:
-            if report_count >= 15:
-                # 15+ Reports = Saturation (High Confidence)
-                proxy_details["HUMAN_REPORTS"] = 0.95 
-            elif report_count >= 5:
-                 proxy_details["HUMAN_REPORTS"] = 0.75
+    def _evaluate_pending(self, key: str):
+        entry = self.pending.pop(key)
+        trace = None
+        if self.tracer:
+            for trace, marked in entry.traces:
+                self.tracer.record(trace, "batch_wait", marked)
+        token = current_trace.set(trace)
+        try:
+            self._evaluate_context(self.clusters.clusters[key], entry.added, entry.new_source, entry.signal, trace)
+        finally:
+            current_trace.reset(token)
+
+    def touch(self, event: Event):
+        """Marks an event changed so the next read snapshot re-serialises it."""
+        self.dirty_events[event.id] = None
+        if self.changed_clusters is not None:
+            self.changed_clusters[event.location] = None
+
+    def _merge_events(self, cluster: Cluster, absorbed: List[str]):
+        """Folds the events of clusters merged into `cluster` into one record."""
+        survivor = self.events_by_cluster.get(cluster.key)
+        for key in absorbed:
+            event = self.events_by_cluster.pop(key, None)
+            if event is None or event.status == "resolved":
+                continue
+            if survivor is None or survivor.status == "resolved":
+                # Adopt the absorbed cluster's event under the surviving key
+                survivor = event
+                survivor.location = cluster.key
+                self.events_by_cluster[cluster.key] = survivor
+                self.touch(survivor)
             else:
-                 proxy_details["HUMAN_REPORTS"] = 0.40 # Low confidence for isolated reports
+                survivor.proxy_details = {**event.proxy_details, **survivor.proxy_details}
+                event.status = "resolved"
+                event.merged_into = survivor.id
+                self.touch(event)
+                self.touch(survivor)
+                self._notify(event, "merged")
+
+    def _assign(self, signal: Signal) -> Cluster:
+        # Spatial Clustering Logic: running centroid/extent, merged through union-find
+        cluster, absorbed = self.clusters.assign(signal)
+        signal.metadata["cluster"] = cluster.key
+        if self.changed_clusters is not None:
+            self.changed_clusters[cluster.key] = None
+            self.changed_clusters.update(dict.fromkeys(absorbed))
+        if absorbed:
+            self._merge_events(cluster, absorbed)
+            # The merged cluster is re-matched from scratch, with anything its parts were waiting on
+            self.rule_winners.pop(cluster.key, None)
+            moved = False
+            for key in absorbed:
+                self.rule_winners.pop(key, None)
+                entry = self.pending.pop(key, None)
+                if entry is not None:
+                    moved = True
+                    if cluster.key in self.pending:
+                        self.pending[cluster.key].fold(entry)
+                    else:
+                        self.pending[cluster.key] = entry
+            if moved:
+                # Keep the oldest-first order flush() relies on (merges are rare)
+                self.pending = dict(sorted(self.pending.items(), key=lambda item: item[1].since))
+        existing_event = self.events_by_cluster.get(cluster.key)
+        if existing_event:
+            # Its signal list is the cluster's and has just grown
+            self.touch(existing_event)
+        return cluster
 
-        
-        # SAR Proxy
-        if sar_signals: proxy_details["SENTINEL_1"] = random.uniform(0.7, 1.0) # High confidence for structural
+    def _evaluate_context(self, cluster: Cluster, added: Iterable[str], new_source: bool, new_signal: Signal,
+                          trace: Optional[str] = None) -> List[Event]:
+        """Scores a cluster after it gained `new_signal` (and, batched, others) and upserts its event."""
+        start = time.perf_counter()
+        self.batch_stats["evaluations"] += 1
+        target_cluster_key = cluster.key
+        cats = cluster.categories
+        existing_event = self.events_by_cluster.get(target_cluster_key)
+
+        # Only rules reading the categories the cluster gained can change the verdict
+        winner = self.rule_winners.get(target_cluster_key)
+        if winner is not None and not self.rules.referenced.intersection(added):
+            if existing_event and existing_event.status != "resolved":
+                existing_event.coords = cluster.centroid
+            self._lap(trace, "score", start, rule=self.rules.rules[winner].name, skipped=True)
+            return self.events
+
+        # --- 1. Proxy Accuracies (Confidence Contributions) from the cluster's evidence ---
+        proxy_details = self.rules.proxy_details(cats)
 
         # --- "Offline Switch" Logic ---
-        # If we have only 1 SMS report, SIMULATE checking satellites
-        # in a real system this would query an external API.
-        # Here we mock it by "discovering" a satellite signal ~30% of the time if it's missing
+        # If we have only 1 SMS report, interrogate the local VIIRS/WAPOR
+        # rasters at the report's coordinates for corroborating anomalies.
+        offline = {}
         if len(proxy_details) == 1 and "HUMAN_REPORTS" in proxy_details:
-             # Random chance to find latent satellite data "activated" by the SMS
-            if random.random() < 0.4: 
+            if self.rasters:
+                offline = self.rasters.interrogate(
+                    new_signal.coords, lambda product, value: self.baselines.assess(new_signal.location, product, value))
+                if offline:
+                    new_signal.metadata["offline_switch"] = offline
+            # Without rasters, mock it by "discovering" a satellite signal some of the time
+            elif random.random() < 0.4:
                 # "Found" a WAPOR signal matching the report
-                proxy_details["WAPOR"] = random.uniform(0.8, 0.99)
-                wapor_signals = [True] # Hack to trigger categorization logic below
+                offline = {"WAPOR": random.uniform(0.8, 0.99)}
             elif random.random() < 0.4:
                 # "Found" a VIIRS signal
-                proxy_details["VIIRS"] = random.uniform(0.8, 0.99)
-                viirs_signals = [True]
-
-        # --- 3. Strict Correlation Logic (Multi-Source Verification) ---
-        confidence = 0.0
-        event_type = "investigation"
-        severity = "info"
-        
-        sources_present = list(proxy_details.keys())
-        unique_categories = 0
-        if any(k in ["VIIRS", "GRID_GIS", "SENTINEL_1"] for k in sources_present): unique_categories += 1
-        if any(k in ["WAPOR", "FAO_AQUASTAT", "WATER_GIS"] for k in sources_present): unique_categories += 1
-        if any(k in ["HDX_HOT", "HUMAN_REPORTS"] for k in sources_present): unique_categories += 1
-        
-        source_count = len(sources_present)
-
-        # Bayesian Confidence Rules (Proposal Alignment)
-        if "HUMAN_REPORTS" in sources_present:
-            if "WAPOR" in sources_present:
-                # Rule: SMS + WAPOR = Confirmed Main-Pipe Burst (95%)
-                confidence = 0.95
-                event_type = "verified_water_issue"
-                severity = "critical"
-            elif "VIIRS" in sources_present:
-                # Rule: SMS + VIIRS = Confirmed Power Outage (95%)
-                confidence = 0.95
-                event_type = "verified_power_outage"
-                severity = "critical"
-            elif "SENTINEL_1" in sources_present:
-                 # Rule: SMS + SAR = Structural Damage
-                confidence = 0.92
-                event_type = "structural_collapse"
-                severity = "critical"
-            elif report_count >= 15:
-                 # 15+ Reports = Confirmed by density alone
-                 confidence = 0.90
-                 event_type = "mass_casualty_cluster"
-                 severity = "critical"
-            elif source_count >= 2:
-                 # Generic multi-source fallback
-                conf_sum = sum(proxy_details.values())
-                confidence = min((conf_sum / source_count), 0.90)
-                event_type = "corroborated_incident"
-                severity = "warning"
-            else:
-                 # Single source
-                confidence = proxy_details["HUMAN_REPORTS"] * 0.5
-                event_type = "unconfirmed_report"
-                
-        elif source_count >= 2:
-            # Satellite-only cross-validation (e.g. VIIRS + GRID)
-            confidence = sum(proxy_details.values()) / source_count
-            event_type = "remote_sensing_anomaly"
-            severity = "warning"
-            
+                offline = {"VIIRS": random.uniform(0.8, 0.99)}
+            proxy_details.update(offline)
+
+        # --- 2. Correlation Rules: the first matching row of the rule table decides ---
+        if offline:
+            # Interrogated proxies are not part of the cluster, so this verdict is not kept
+            rule = self.rules.best(proxy_details, cats)
+        elif winner is None:
+            rule = self.rule_winners[target_cluster_key] = self.rules.best(proxy_details, cats)
         else:
-             confidence = 0.2
-             event_type = "noise"
+            rule = self.rule_winners[target_cluster_key] = self.rules.improve(winner, added, proxy_details, cats, new_source)
+        confidence, event_type, severity = self.rules.rules[rule].outcome(proxy_details)
+        start = self._lap(trace, "score", start, rule=self.rules.rules[rule].name, offline_switch=bool(offline))
 
-        
-        # --- 4. Event Generation ---
+        # --- 3. Event Generation ---
         if confidence > 0.4:
-            # Update existing event for this CLUSTER KEY (location)
-            existing_event = next((e for e in self.events if e.location == target_cluster_key and e.status != "resolved"), None)
+            # Update existing event for this CLUSTER
+            existing_event = self.events_by_cluster.get(target_cluster_key)
+            if existing_event and existing_event.status == "resolved":
+                existing_event = None
             
             if existing_event:
+                escalated = SEVERITY_RANK.get(severity, 0) > SEVERITY_RANK.get(existing_event.severity, 0)
                 existing_event.confidence = confidence
-                existing_event.signals = [s.id for s in cluster_signals] # Update signal list
+                existing_event.signals = cluster.signal_ids # Shared with the cluster, grows in place
+                existing_event.coords = cluster.centroid
                 existing_event.timestamp = datetime.utcnow().isoformat()
                 existing_event.type = event_type
                 existing_event.severity = severity
                 existing_event.proxy_details = proxy_details # Update breakdown
+                if escalated:
+                    if trace:
+                        self.tracer.mark(trace, "event_escalated", event_id=existing_event.id, severity=severity)
+                        self.tracer.link_event(existing_event.id, trace)
+                    self._notify(existing_event, "escalated")
             else:
                 new_event = Event(
                     title=f"{event_type.replace('_', ' ').title()} in {target_cluster_key}",
@@ -196,19 +315,57 @@ class IntelligenceEngine:
                     severity=severity,
                     confidence=confidence,
                     location=target_cluster_key,
-                    coords=new_signal.coords,
-                    signals=[s.id for s in cluster_signals],
+                    coords=cluster.centroid,
+                    signals=cluster.signal_ids,
                     status="verified" if confidence > 0.7 else "detected",
                     proxy_details=proxy_details
                 )
                 self.events.append(new_event)
-                
+                self.events_by_id[new_event.id] = new_event
+                self.events_by_cluster[target_cluster_key] = new_event
+                self.touch(new_event)
+                if trace:
+                    self.tracer.mark(trace, "event_created", event_id=new_event.id, status=new_event.status,
+                                     type=event_type, confidence=round(confidence, 3))
+                    self.tracer.link_event(new_event.id, trace)
+                self._notify(new_event, "created")
+
+        self._lap(trace, "event", start)
         return self.events
+
+    def _notify(self, event: Event, change: str):
+        for listener in self.event_listeners:
+            try:
+                listener(event, change)
+            except Exception as e:
+                print(f"--- Event listener error: {e} ---")
     
     def reset(self):
+        if self.changed_clusters is not None:
+            # Synced clusters are reported as gone
+            self.changed_clusters.update(dict.fromkeys(self.clusters.clusters))
         self.signals = []
         self.events = []
-        self.active_clusters = {}
+        self.events_by_id = {}
+        self.clusters.reset()
+        self.rule_winners = {}
+        self.pending = {}
+        self.events_by_cluster = {}
+        self.dirty_events = {}
+        self.rollups = RollupStore()
+        self.dedup = DuplicateFilter()
+        self.baselines.reset()
+        self.assets.reset_rollups()
+        if self.infrastructure:
+            self.infrastructure.reset_status()
+
+    def event_for_signal(self, signal: Signal) -> Optional[Event]:
+        """The open event of the cluster a signal joined, following later merges."""
+        key = signal.metadata.get("cluster")
+        if key is None or key not in self.clusters.parent:
+            return None
+        event = self.events_by_cluster.get(self.clusters.find(key))
+        return event if event is not None and event.status != "resolved" else None
 
     def get_active_events(self):
         return [e for e in self.events if e.status != "resolved"]
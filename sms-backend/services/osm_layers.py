@@ -0,0 +1,223 @@
+import gzip
+import json
+import math
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+LAYERS = ("water", "power")
+GRID_DEG = 0.05  # spatial index cell size (~5.5 km)
+
+def classify_tags(tags: dict) -> Optional[str]:
+    """Maps OSM tags to the layer they belong on, or None to skip the feature."""
+    if "power" in tags and tags["power"] in ("line", "minor_line", "cable", "substation", "plant", "generator"):
+        return "power"
+    if tags.get("man_made") == "pipeline" and tags.get("substance", "water") in ("water", "waste_water", "wastewater"):
+        return "water"
+    if tags.get("waterway") in ("canal", "drain", "ditch"):
+        return "water"
+    if tags.get("man_made") in ("water_works", "water_tower", "pumping_station", "reservoir_covered"):
+        return "water"
+    if tags.get("sada_layer") in LAYERS:  # pre-classified GeoJSON
+        return tags["sada_layer"]
+    return None
+
+def _open(path: str):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+def _iter_geojson(path: str) -> Iterator[Tuple[dict, dict]]:
+    with _open(path) as f:
+        collection = json.load(f)
+    for feature in collection.get("features", []):
+        geom = feature.get("geometry")
+        if geom and geom["type"] in ("Point", "LineString", "MultiLineString", "Polygon"):
+            yield feature.get("properties") or {}, geom
+
+def _iter_osm_xml(path: str) -> Iterator[Tuple[dict, dict]]:
+    """
+    Streams an .osm extract. Node coordinates are kept only as compact
+    tuples so city-sized extracts fit comfortably in memory.
+    """
+    nodes: Dict[str, Tuple[float, float]] = {}
+    with _open(path) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == "node":
+                nodes[elem.get("id")] = (float(elem.get("lon")), float(elem.get("lat")))
+                tags = {t.get("k"): t.get("v") for t in elem.findall("tag")}
+                if tags and classify_tags(tags):
+                    yield {"id": f"node/{elem.get('id')}", **tags}, {"type": "Point", "coordinates": list(nodes[elem.get("id")])}
+                elem.clear()
+            elif elem.tag == "way":
+                tags = {t.get("k"): t.get("v") for t in elem.findall("tag")}
+                if classify_tags(tags):
+                    coords = [list(nodes[nd.get("ref")]) for nd in elem.findall("nd") if nd.get("ref") in nodes]
+                    if len(coords) >= 2:
+                        yield {"id": f"way/{elem.get('id')}", **tags}, {"type": "LineString", "coordinates": coords}
+                elem.clear()
+            elif elem.tag == "relation":
+                elem.clear()
+
+def _simplify(points: List[List[float]], tolerance: float) -> List[List[float]]:
+    """Iterative Douglas-Peucker on [lng, lat] vertices."""
+    if len(points) < 3 or tolerance <= 0:
+        return points
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    tol2 = tolerance * tolerance
+    while stack:
+        start, end = stack.pop()
+        ax, ay = points[start]
+        bx, by = points[end]
+        dx, dy = bx - ax, by - ay
+        seg2 = dx * dx + dy * dy
+        best, best_d = -1, tol2
+        for i in range(start + 1, end):
+            px, py = points[i]
+            if seg2 == 0:
+                d = (px - ax) ** 2 + (py - ay) ** 2
+            else:
+                t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / seg2))
+                d = (px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2
+            if d > best_d:
+                best, best_d = i, d
+        if best >= 0:
+            keep[best] = True
+            stack.append((start, best))
+            stack.append((best, end))
+    return [p for p, k in zip(points, keep) if k]
+
+def _bounds(geom: dict) -> Tuple[float, float, float, float]:
+    if geom["type"] == "Point":
+        lng, lat = geom["coordinates"][:2]
+        return lng, lat, lng, lat
+    if geom["type"] == "LineString":
+        pts = geom["coordinates"]
+    else:
+        pts = [p for part in geom["coordinates"] for p in part]
+    lngs = [p[0] for p in pts]
+    lats = [p[1] for p in pts]
+    return min(lngs), min(lats), max(lngs), max(lats)
+
+def tile_bbox(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Slippy-map tile -> (min_lng, min_lat, max_lng, max_lat)."""
+    n = 2 ** z
+    lng0, lng1 = x / n * 360 - 180, (x + 1) / n * 360 - 180
+    lat0 = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    lat1 = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lng0, lat0, lng1, lat1
+
+class OSMLayerStore:
+    """
+    Water and power networks loaded once from a local OSM extract or GeoJSON.
+
+    Features are bucketed on a coarse lat/lng grid for bbox lookups. Each
+    zoom level gets its own Douglas-Peucker simplification, computed on
+    first use. Simplified features and finished gzip-compressed responses
+    are each kept in a bounded LRU.
+    """
+    def __init__(self, cache_size: int = 2048, simplified_size: int = 20000):
+        self.features: Dict[str, List[dict]] = {layer: [] for layer in LAYERS}
+        self.bounds: Dict[str, List[Tuple[float, float, float, float]]] = {layer: [] for layer in LAYERS}
+        self.grid: Dict[str, Dict[Tuple[int, int], List[int]]] = {layer: {} for layer in LAYERS}
+        self._simplified: "OrderedDict[Tuple[str, int, int], dict]" = OrderedDict()
+        self.simplified_size = simplified_size
+        self._cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @classmethod
+    def load(cls, path: str) -> "OSMLayerStore":
+        store = cls()
+        is_xml = path.endswith(".osm") or path.endswith(".osm.gz")
+        for props, geom in (_iter_osm_xml(path) if is_xml else _iter_geojson(path)):
+            layer = classify_tags(props)
+            if layer:
+                store.add(layer, props, geom)
+        return store
+
+    def add(self, layer: str, props: dict, geom: dict):
+        idx = len(self.features[layer])
+        self.features[layer].append({"type": "Feature", "properties": props, "geometry": geom})
+        b = _bounds(geom)
+        self.bounds[layer].append(b)
+        for gx in range(int(math.floor(b[0] / GRID_DEG)), int(math.floor(b[2] / GRID_DEG)) + 1):
+            for gy in range(int(math.floor(b[1] / GRID_DEG)), int(math.floor(b[3] / GRID_DEG)) + 1):
+                self.grid[layer].setdefault((gx, gy), []).append(idx)
+
+    def counts(self) -> Dict[str, int]:
+        return {layer: len(f) for layer, f in self.features.items()}
+
+    def _query(self, layer: str, bbox: Tuple[float, float, float, float]) -> List[int]:
+        min_lng, min_lat, max_lng, max_lat = bbox
+        found = set()
+        grid = self.grid[layer]
+        gx0, gx1 = int(math.floor(min_lng / GRID_DEG)), int(math.floor(max_lng / GRID_DEG))
+        gy0, gy1 = int(math.floor(min_lat / GRID_DEG)), int(math.floor(max_lat / GRID_DEG))
+        if (gx1 - gx0 + 1) * (gy1 - gy0 + 1) > len(grid):
+            # Low zooms cover more cells than are populated; walk the populated ones instead
+            for (gx, gy), ids in grid.items():
+                if gx0 <= gx <= gx1 and gy0 <= gy <= gy1:
+                    found.update(ids)
+        else:
+            for gx in range(gx0, gx1 + 1):
+                for gy in range(gy0, gy1 + 1):
+                    found.update(grid.get((gx, gy), ()))
+        bounds = self.bounds[layer]
+        return sorted(i for i in found
+                      if bounds[i][0] <= max_lng and bounds[i][2] >= min_lng
+                      and bounds[i][1] <= max_lat and bounds[i][3] >= min_lat)
+
+    def _feature_at_zoom(self, layer: str, idx: int, zoom: int) -> dict:
+        key = (layer, zoom, idx)
+        feature = self._simplified.get(key)
+        if feature is not None:
+            self._simplified.move_to_end(key)
+        else:
+            src = self.features[layer][idx]
+            geom = src["geometry"]
+            # Tolerance of ~1 screen pixel at this zoom; coordinates rounded to match
+            tolerance = 360 / (256 * 2 ** zoom)
+            digits = max(4, min(7, int(math.ceil(math.log10(1 / tolerance)))))
+            rnd = lambda pts: [[round(p[0], digits), round(p[1], digits)] for p in pts]
+            if geom["type"] == "LineString":
+                geom = {"type": "LineString", "coordinates": rnd(_simplify(geom["coordinates"], tolerance))}
+            elif geom["type"] in ("MultiLineString", "Polygon"):
+                geom = {"type": geom["type"], "coordinates": [rnd(_simplify(part, tolerance)) for part in geom["coordinates"]]}
+            feature = {"type": "Feature", "properties": src["properties"], "geometry": geom}
+            self._simplified[key] = feature
+            if len(self._simplified) > self.simplified_size:
+                self._simplified.popitem(last=False)
+        return feature
+
+    def render(self, layer: str, bbox: Tuple[float, float, float, float], zoom: int) -> bytes:
+        """gzip-compressed GeoJSON FeatureCollection for a bbox at a zoom level."""
+        zoom = max(0, min(18, zoom))
+        key = (layer, zoom, tuple(round(v, 5) for v in bbox))
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(key)
+            return cached
+
+        self.cache_misses += 1
+        features = [self._feature_at_zoom(layer, i, zoom) for i in self._query(layer, bbox)]
+        body = json.dumps({"type": "FeatureCollection", "features": features}, separators=(",", ":"))
+        data = gzip.compress(body.encode("utf-8"), compresslevel=6)
+        self._cache[key] = data
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return data
+
+    def tile(self, layer: str, z: int, x: int, y: int) -> bytes:
+        return self.render(layer, tile_bbox(z, x, y), z)
+
+    def stats(self) -> dict:
+        return {
+            "features": self.counts(),
+            "cached_responses": len(self._cache),
+            "simplified_features": len(self._simplified),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
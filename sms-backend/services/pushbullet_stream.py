@@ -0,0 +1,138 @@
+import asyncio
+import json
+import random
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable
+import websockets
+
+# Single pass over the raw frame instead of one str(push) scan per tag
+TAG_PATTERN = re.compile(r"#(POWER|WATER|AID|SOS|BROKEN|DIRTY)\b", re.IGNORECASE)
+
+def extract_push(push: dict, raw: str = "") -> tuple:
+    """
+    Returns (dedup_key, body, title) for a Pushbullet push.
+    Falls back to the first #TAG found anywhere in the frame when the
+    push has no body in the usual fields.
+    """
+    p_type = push.get("type", "unknown")
+    key = push.get("iden")
+    body, title = "", "SADA Node"
+
+    if p_type == "sms_changed":
+        notifs = push.get("notifications", [])
+        if notifs:
+            body = notifs[0].get("body", "")
+            title = notifs[0].get("title", "SMS")
+            # Ephemeral SMS pushes carry no iden; thread + timestamp is stable across redeliveries.
+            # Without a timestamp nothing tells two texts apart, so such pushes are not deduped.
+            if key is None and notifs[0].get("timestamp") is not None:
+                key = f"sms:{notifs[0].get('thread_id')}:{notifs[0]['timestamp']}"
+    else:
+        body = push.get("body", "")
+        title = push.get("title", "Notification")
+
+    if not body:
+        match = TAG_PATTERN.search(raw or json.dumps(push))
+        if match:
+            body = "#" + match.group(1).upper()
+
+    return key, body, title
+
+class PushbulletStreamConsumer:
+    """
+    Reads the Pushbullet websocket stream and hands pushes to `handler`
+    through a bounded queue, so slow processing never stalls the socket
+    reader. Seen push idens are remembered across reconnects.
+    """
+    def __init__(self, uri: str, handler: Callable[[str, str], Awaitable[None]],
+                 queue_size: int = 1000, workers: int = 2, dedup_size: int = 10000,
+                 backoff_initial: float = 1.0, backoff_max: float = 60.0):
+        self.uri = uri
+        self.handler = handler
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.workers = workers
+        self.dedup_size = dedup_size
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.seen: "OrderedDict[str, None]" = OrderedDict()
+        self.stats = {
+            "received": 0,
+            "processed": 0,
+            "duplicates": 0,
+            "ignored": 0,
+            "errors": 0,
+            "reconnects": 0,
+            "queue_full_waits": 0,
+        }
+
+    async def run(self):
+        """
+        Runs the socket reader and processing workers until cancelled.
+        """
+        worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            await self._reader()
+        finally:
+            for t in worker_tasks:
+                t.cancel()
+
+    async def _reader(self):
+        attempt = 0
+        while True:
+            try:
+                # ping_interval=None disables pings to avoid timeout errors
+                async with websockets.connect(self.uri, ping_interval=None, ping_timeout=None) as websocket:
+                    print("--- Pushbullet Listener: CONNECTION ESTABLISHED ---")
+                    async for raw_msg in websocket:
+                        attempt = 0
+                        self.stats["received"] += 1
+                        if self.queue.full():
+                            self.stats["queue_full_waits"] += 1
+                        await self.queue.put(raw_msg)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"--- Pushbullet Listener ERROR: {e} ---")
+
+            # Exponential backoff with full jitter
+            self.stats["reconnects"] += 1
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_initial * (2 ** attempt)))
+            attempt += 1
+            print(f"--- Pushbullet Listener: Reconnecting in {delay:.1f}s ---")
+            await asyncio.sleep(delay)
+
+    async def _worker(self):
+        while True:
+            raw_msg = await self.queue.get()
+            try:
+                await self._process(raw_msg)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"--- [Pushbullet] Failed to process push: {e} ---")
+            finally:
+                self.queue.task_done()
+
+    async def _process(self, raw_msg):
+        data = json.loads(raw_msg)
+        if data.get("type") != "push":
+            self.stats["ignored"] += 1  # nop heartbeats, tickles
+            return
+
+        push = data.get("push", {})
+        key, body, title = extract_push(push, raw_msg)
+        if key is not None:
+            if key in self.seen:
+                self.stats["duplicates"] += 1
+                return
+            self.seen[key] = None
+            if len(self.seen) > self.dedup_size:
+                self.seen.popitem(last=False)
+
+        if not body:
+            self.stats["ignored"] += 1
+            print(f"--- [Pushbullet] Push type '{push.get('type', 'unknown')}' had no usable content ---")
+            return
+
+        await self.handler(body, title)
+        self.stats["processed"] += 1
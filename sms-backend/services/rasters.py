@@ -0,0 +1,200 @@
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from models import Signal
+from services.baselines import fixed_assessment
+
+TILE = 256
+
+# Products with a raster proxy; their anomaly rules live in services.baselines
+PRODUCTS = ("VIIRS", "WAPOR")
+
+def write_raster(path: str, array: np.ndarray, west: float, north: float, res_deg: float,
+                 nodata: float = float("nan"), tile: int = TILE):
+    """
+    Writes a north-up float32 grid as `<path>.npy` in tile-major order
+    (tiles_y, tiles_x, tile, tile) plus a `<path>.json` georeference sidecar.
+    Tiles are copied one row of tiles at a time, so `array` may itself be a memmap.
+    """
+    height, width = array.shape
+    tiles_y, tiles_x = -(-height // tile), -(-width // tile)
+    out = np.lib.format.open_memmap(path + ".npy", mode="w+", dtype=np.float32, shape=(tiles_y, tiles_x, tile, tile))
+    for ty in range(tiles_y):
+        band = np.full((tile, tiles_x * tile), nodata, dtype=np.float32)
+        rows = array[ty * tile:(ty + 1) * tile]
+        band[:rows.shape[0], :width] = rows
+        out[ty] = band.reshape(tile, tiles_x, tile).transpose(1, 0, 2)
+    out.flush()
+    del out
+    with open(path + ".json", "w") as f:
+        json.dump({"west": west, "north": north, "res_deg": res_deg, "width": width, "height": height,
+                   "tile": tile, "nodata": None if np.isnan(nodata) else nodata}, f)
+
+class TiledRaster:
+    """
+    Read-only, memory-mapped tiled raster. Only the pages a query touches are
+    read. A tile is copied into the LRU on its second touch; one-off touches
+    (scattered points) read their pixels straight from the map instead.
+    Point and window samples take coordinate arrays and are grouped by tile
+    so each tile is visited once per call.
+    """
+    def __init__(self, path: str, cache_tiles: int = 64):
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        self.path = path
+        self.west, self.north, self.res = meta["west"], meta["north"], meta["res_deg"]
+        self.width, self.height, self.tile = meta["width"], meta["height"], meta["tile"]
+        self.nodata = meta.get("nodata")
+        self._tiles = np.load(path + ".npy", mmap_mode="r")
+        self.tiles_x = self._tiles.shape[1]
+        self._cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self.cache_tiles = cache_tiles
+        self._touched: "OrderedDict[int, None]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _read(self, tid: int, r: np.ndarray, c: np.ndarray) -> np.ndarray:
+        data = self._cache.get(tid)
+        if data is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(tid)
+            return data[r, c]
+
+        self.cache_misses += 1
+        tile = self._tiles[tid // self.tiles_x, tid % self.tiles_x]
+        if tid in self._touched:
+            del self._touched[tid]
+            data = np.array(tile)
+            if self.nodata is not None:
+                data[data == self.nodata] = np.nan
+            self._cache[tid] = data
+            if len(self._cache) > self.cache_tiles:
+                self._cache.popitem(last=False)
+            return data[r, c]
+
+        self._touched[tid] = None
+        if len(self._touched) > 4 * self.cache_tiles:
+            self._touched.popitem(last=False)
+        values = np.asarray(tile[r, c], dtype=np.float32)
+        if self.nodata is not None:
+            values[values == self.nodata] = np.nan
+        return values
+
+    def _gather(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        out = np.full(rows.shape, np.nan, dtype=np.float32)
+        valid = np.flatnonzero((rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width))
+        if not len(valid):
+            return out
+        r, c = rows[valid], cols[valid]
+        tid = (r // self.tile) * self.tiles_x + c // self.tile
+        order = np.argsort(tid, kind="stable")
+        tid_sorted = tid[order]
+        bounds = np.flatnonzero(np.diff(tid_sorted)) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(order)]):
+            sel = order[start:end]
+            out[valid[sel]] = self._read(int(tid_sorted[start]), r[sel] % self.tile, c[sel] % self.tile)
+        return out
+
+    def _pixels(self, lats: Sequence[float], lngs: Sequence[float]):
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        rows = np.floor((self.north - lats) / self.res).astype(np.int64)
+        cols = np.floor((lngs - self.west) / self.res).astype(np.int64)
+        return rows, cols
+
+    def sample(self, lats: Sequence[float], lngs: Sequence[float]) -> np.ndarray:
+        """Pixel values at each point; NaN outside the raster or on nodata."""
+        rows, cols = self._pixels(lats, lngs)
+        return self._gather(rows, cols)
+
+    def window_mean(self, lats: Sequence[float], lngs: Sequence[float], radius_px: int = 1) -> np.ndarray:
+        """Mean of the (2r+1)^2 neighbourhood around each point, ignoring nodata."""
+        rows, cols = self._pixels(lats, lngs)
+        offsets = np.arange(-radius_px, radius_px + 1)
+        dy, dx = np.meshgrid(offsets, offsets, indexing="ij")
+        values = self._gather((rows[:, None] + dy.ravel()).ravel(), (cols[:, None] + dx.ravel()).ravel())
+        values = values.reshape(len(rows), -1)
+        valid = ~np.isnan(values)
+        counts = valid.sum(axis=1)
+        sums = np.where(valid, values, 0).sum(axis=1)
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    def stats(self) -> dict:
+        return {
+            "size": [self.width, self.height],
+            "cached_tiles": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+class RasterProxies:
+    """
+    VIIRS night-light and WAPOR soil-moisture proxies backed by local
+    rasters (`<dir>/viirs.npy` / `<dir>/wapor.npy` with JSON sidecars).
+    Products without a file are simply absent.
+    """
+    def __init__(self, rasters: Dict[str, TiledRaster] = None, radius_px: int = 1):
+        self.rasters = rasters or {}
+        self.radius_px = radius_px
+
+    @classmethod
+    def from_dir(cls, directory: str, cache_tiles: int = 64) -> "RasterProxies":
+        rasters = {}
+        for product in PRODUCTS:
+            path = os.path.join(directory, product.lower())
+            if os.path.exists(path + ".npy") and os.path.exists(path + ".json"):
+                rasters[product] = TiledRaster(path, cache_tiles)
+        return cls(rasters)
+
+    def __bool__(self):
+        return bool(self.rasters)
+
+    def sample(self, product: str, coords: List[List[float]]) -> np.ndarray:
+        """Neighbourhood means for many [lat, lng] points at once."""
+        pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        return self.rasters[product].window_mean(pts[:, 0], pts[:, 1], self.radius_px)
+
+    def interrogate(self, coords: List[float], assess: Optional[Callable[[str, float], dict]] = None) -> Dict[str, float]:
+        """
+        Offline Switch: checks every product at a report's coordinates and
+        returns {product: confidence} for the ones showing an anomaly.
+        `assess(product, value)` judges a reading (the fixed thresholds by
+        default). Confidence rises from 0.8 at the cut-off to 0.99 at the end
+        of the scale, or at twice the z cut-off for a baseline.
+        """
+        found = {}
+        for product in PRODUCTS:
+            if product not in self.rasters:
+                continue
+            value = float(self.sample(product, [coords])[0])
+            if np.isnan(value):
+                continue
+            verdict = assess(product, value) if assess else fixed_assessment(product, value)
+            if verdict["anomalous"]:
+                found[product] = round(0.8 + 0.19 * min(1.0, verdict["excess"]), 3)
+        return found
+
+    def signal(self, product: str, location: str, coords: List[float]) -> Optional[Signal]:
+        """A verification signal read from the raster, or None if the point has no data."""
+        if product not in self.rasters:
+            return None
+        value = float(self.sample(product, [coords])[0])
+        if np.isnan(value):
+            return None
+        anomalous = fixed_assessment(product, value)["anomalous"]
+        return Signal(
+            type="satellite" if product == "VIIRS" else "sensor",
+            source=product,
+            location=location,
+            coords=coords,
+            value=value,
+            timestamp=datetime.utcnow().isoformat(),
+            metadata={"raster": os.path.basename(self.rasters[product].path), "notes": "Anomalous" if anomalous else "Normal"},
+        )
+
+    def stats(self) -> dict:
+        return {product: r.stats() for product, r in self.rasters.items()}
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+from models import Signal
+
+SOURCE_LABELS = {"SADA_SMS": "SMS", "REAL_SMS": "REAL SMS", "SMS_SIMULATOR": "SIMULATOR"}
+
+def message_view(s: Signal) -> dict:
+    """Maps a signal to the props the frontend feed expects."""
+    # Urgency/priority for frontend highlighting
+    priority = 100 if s.type == "SOS" or (s.metadata and s.metadata.get("urgency") == "high") else 0
+    return {
+        "id": s.id,
+        "time": s.timestamp,
+        "type": s.metadata.get("report_type", s.type) if s.type == "report" else s.type,
+        "location": s.location,
+        "coords": s.coords,
+        "source": SOURCE_LABELS.get(s.source, s.source),
+        "body": s.metadata.get("raw_body") or s.metadata.get("notes") or f"Detected {s.type} anomaly",
+        "priority": priority,
+        "action": s.metadata.get("status") or "Verify",
+    }
+
+def _array(fragments) -> bytes:
+    return b"[" + b",".join(fragments) + b"]"
+
+class ReadSnapshot:
+    """
+    One published view of events, signals and the message feed, as JSON.
+    Nothing in it changes after publication: the signal and message logs
+    are append-only and the snapshot only reads its first `signal_count`
+    entries. The joined /signals body is built on first request.
+    """
+    __slots__ = ("version", "published_at", "events_body", "event_count", "signal_count",
+                 "_signal_log", "_message_log", "_signals_body")
+
+    def __init__(self, version: int, events_body: bytes, event_count: int,
+                 signal_log: List[bytes], message_log: List[bytes], signal_count: int):
+        self.version = version
+        self.published_at = time.time()
+        self.events_body = events_body
+        self.event_count = event_count
+        self.signal_count = signal_count
+        self._signal_log = signal_log
+        self._message_log = message_log
+        self._signals_body = None
+
+    def signals_body(self) -> bytes:
+        if self._signals_body is None:
+            self._signals_body = _array(self._signal_log[:self.signal_count])
+        return self._signals_body
+
+    def messages_body(self, limit: int = 50) -> bytes:
+        """The latest `limit` signals as feed messages, newest first."""
+        start = max(0, self.signal_count - limit) if limit > 0 else 0
+        return _array(reversed(self._message_log[start:self.signal_count]))
+
+class ReadModel:
+    """
+    Serves GET /events, /signals and /messages from immutable snapshots so
+    reads never walk the lists ingest is mutating.
+
+    `publish` serialises only what changed since the last snapshot -- new
+    signals whose clusters have been scored (appended to the logs once,
+    with everything scoring adds to them) and the events the engine or the
+    dispatch queue marked dirty -- then swaps the new snapshot in with a
+    single assignment. `run` publishes whenever ingest has moved on, at most
+    every `interval` seconds, so a burst of signals costs one publish.
+    Handlers that change an event publish straight away for read-your-writes.
+    """
+    def __init__(self, engine, interval: float = 0.05):
+        self.engine = engine
+        self.interval = interval
+        self.stats = {"publishes": 0, "signals_serialized": 0, "events_serialized": 0,
+                      "last_build_ms": 0.0, "max_build_ms": 0.0, "total_build_ms": 0.0}
+        self._version = 0
+        self.reset()
+
+    def reset(self):
+        """Starts new logs; snapshots already handed out keep the old ones."""
+        self._signal_log: List[bytes] = []
+        self._message_log: List[bytes] = []
+        self._event_json: Dict[str, bytes] = {}  # active events in creation order
+        self.snapshot = ReadSnapshot(self._version, b"[]", 0, self._signal_log, self._message_log, 0)
+
+    def stale(self) -> bool:
+        return self.engine.settled_count() != len(self._signal_log) or bool(self.engine.dirty_events)
+
+    def publish(self) -> ReadSnapshot:
+        start = time.perf_counter()
+        engine = self.engine
+        if len(engine.signals) < len(self._signal_log):
+            self.reset()  # the engine was cleared underneath us
+        # Signals still waiting on a batched evaluation are held back until scored
+        new = engine.signals[len(self._signal_log):engine.settled_count()]
+        for s in new:
+            self._signal_log.append(s.model_dump_json().encode())
+            self._message_log.append(json.dumps(message_view(s)).encode())
+
+        # Dirty IDs are in touch order, so new events land in creation order
+        dirty, engine.dirty_events = engine.dirty_events, {}
+        for event_id in dirty:
+            event = engine.events_by_id.get(event_id)
+            if event is None or event.status == "resolved":
+                self._event_json.pop(event_id, None)
+            else:
+                self._event_json[event_id] = event.model_dump_json().encode()
+
+        self._version += 1
+        self.snapshot = ReadSnapshot(self._version, _array(self._event_json.values()), len(self._event_json),
+                                     self._signal_log, self._message_log, len(self._signal_log))
+
+        elapsed = (time.perf_counter() - start) * 1000
+        stats = self.stats
+        stats["publishes"] += 1
+        stats["signals_serialized"] += len(new)
+        stats["events_serialized"] += len(dirty)
+        stats["last_build_ms"] = round(elapsed, 3)
+        stats["max_build_ms"] = round(max(stats["max_build_ms"], elapsed), 3)
+        stats["total_build_ms"] = round(stats["total_build_ms"] + elapsed, 3)
+        return self.snapshot
+
+    def snapshot_stats(self) -> dict:
+        snap = self.snapshot
+        return {**self.stats, "version": snap.version, "events": snap.event_count, "signals": snap.signal_count,
+                "age_s": round(time.time() - snap.published_at, 3)}
+
+    async def run(self):
+        while True:
+            if self.stale():
+                self.publish()
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,111 @@
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from models import Signal
+
+# resolution -> (bucket width in seconds, number of buckets kept)
+RESOLUTIONS = {
+    "1m": (60, 720),      # last 12 hours
+    "1h": (3600, 336),    # last 14 days
+    "1d": (86400, 366),   # last year
+}
+
+def signal_epoch(signal: Signal) -> float:
+    """Signal timestamps are naive UTC ISO strings; convert to epoch seconds."""
+    try:
+        ts = datetime.fromisoformat(signal.timestamp)
+    except (TypeError, ValueError):
+        return datetime.now(timezone.utc).timestamp()
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+class RingSeries:
+    """
+    Fixed-size ring of time buckets. Slot i holds the bucket whose index
+    (epoch // width) maps to i; a stale slot is recycled the first time a
+    newer bucket lands on it, so updates never allocate.
+    """
+    def __init__(self, width: int, size: int):
+        self.width = width
+        self.size = size
+        self.bucket = array("q", [-1]) * size
+        self.count = array("q", [0]) * size
+        self.min = array("d", [0.0]) * size
+        self.max = array("d", [0.0]) * size
+        self.sum = array("d", [0.0]) * size
+        self.latest = -1
+
+    def add(self, epoch: float, value: float):
+        b = int(epoch // self.width)
+        if self.latest >= 0 and b <= self.latest - self.size:
+            return  # older than the retained window
+        i = b % self.size
+        if self.bucket[i] != b:
+            if self.bucket[i] > b:
+                return
+            self.bucket[i] = b
+            self.count[i] = 1
+            self.min[i] = self.max[i] = self.sum[i] = value
+        else:
+            self.count[i] += 1
+            self.sum[i] += value
+            if value < self.min[i]: self.min[i] = value
+            if value > self.max[i]: self.max[i] = value
+        if b > self.latest:
+            self.latest = b
+
+    def series(self, limit: Optional[int] = None) -> List[dict]:
+        if self.latest < 0:
+            return []
+        n = self.size if limit is None else max(0, min(limit, self.size))
+        points = []
+        for b in range(self.latest - n + 1, self.latest + 1):
+            i = b % self.size
+            if b < 0 or self.bucket[i] != b:
+                continue
+            points.append({
+                "start": datetime.fromtimestamp(b * self.width, timezone.utc).replace(tzinfo=None).isoformat(),
+                "count": self.count[i],
+                "min": self.min[i],
+                "max": self.max[i],
+                "mean": self.sum[i] / self.count[i],
+            })
+        return points
+
+class RollupStore:
+    """
+    Multi-resolution count/min/max/mean rollups per (location, source).
+    The number of tracked series is capped; the least recently updated
+    series is evicted first, so memory is bounded for the process lifetime.
+    """
+    def __init__(self, max_series: int = 512):
+        self.max_series = max_series
+        self.series_map: "OrderedDict[Tuple[str, str], Dict[str, RingSeries]]" = OrderedDict()
+
+    def add(self, signal: Signal):
+        key = (signal.location, signal.source)
+        rings = self.series_map.get(key)
+        if rings is None:
+            rings = {res: RingSeries(width, size) for res, (width, size) in RESOLUTIONS.items()}
+            self.series_map[key] = rings
+            if len(self.series_map) > self.max_series:
+                self.series_map.popitem(last=False)
+        else:
+            self.series_map.move_to_end(key)
+
+        epoch = signal_epoch(signal)
+        for ring in rings.values():
+            ring.add(epoch, signal.value)
+
+    def series(self, location: str, source: str, resolution: str = "1m", limit: Optional[int] = None) -> List[dict]:
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution '{resolution}'. Expected one of {list(RESOLUTIONS)}")
+        rings = self.series_map.get((location, source))
+        if rings is None:
+            return []
+        return rings[resolution].series(limit)
+
+    def keys(self) -> List[dict]:
+        return [{"location": loc, "source": src} for loc, src in self.series_map.keys()]
@@ -0,0 +1,186 @@
+import asyncio
+import heapq
+import json
+import os
+import random
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Shipped correlation table; SADA_RULES points the backend at another one
+DEFAULT_RULES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "rules.json")
+# Index key for rules that depend on how many proxies are present, whichever they are
+ANY_SOURCE = "*"
+SEVERITIES = ("info", "warning", "critical")
+
+class Rule:
+    __slots__ = ("index", "name", "requires", "min_counts", "min_sources", "confidence", "max_confidence",
+                 "event_type", "severity", "keys")
+
+    def __init__(self, index: int, spec: dict, proxies: Dict[str, dict]):
+        self.index = index
+        self.name = spec.get("name") or f"rule_{index}"
+        self.requires = tuple(spec.get("requires", ()))
+        self.min_counts = tuple((spec.get("min_counts") or {}).items())
+        self.min_sources = int(spec.get("min_sources", 0))
+        self.confidence = spec.get("confidence", 0.0)
+        self.max_confidence = float(spec.get("max_confidence", 1.0))
+        self.event_type = spec.get("event_type", "investigation")
+        self.severity = spec.get("severity", "info")
+
+        for proxy in self.requires:
+            if proxy not in proxies:
+                raise ValueError(f"rule {self.name!r} requires unknown proxy {proxy!r}")
+        if self.severity not in SEVERITIES:
+            raise ValueError(f"rule {self.name!r} has unknown severity {self.severity!r}")
+        conf = self.confidence
+        if not (isinstance(conf, (int, float)) or conf == "mean"
+                or (isinstance(conf, dict) and conf.get("proxy") in self.requires)):
+            raise ValueError(f"rule {self.name!r}: confidence must be a number, \"mean\" or "
+                             "{\"proxy\": <required proxy>, \"scale\": x}")
+
+        # Evidence categories whose arrival can make this rule start matching
+        keys = {proxies[p]["category"] for p in self.requires} | {c for c, _ in self.min_counts}
+        if self.min_sources:
+            keys.add(ANY_SOURCE)
+        self.keys = keys
+
+    def matches(self, proxy_details: Dict[str, float], counts: Dict[str, int]) -> bool:
+        return (all(p in proxy_details for p in self.requires)
+                and all(counts.get(c, 0) >= n for c, n in self.min_counts)
+                and len(proxy_details) >= self.min_sources)
+
+    def outcome(self, proxy_details: Dict[str, float]) -> Tuple[float, str, str]:
+        conf = self.confidence
+        if conf == "mean":
+            conf = sum(proxy_details.values()) / len(proxy_details)
+        elif isinstance(conf, dict):
+            conf = proxy_details[conf["proxy"]] * float(conf.get("scale", 1.0))
+        return min(float(conf), self.max_confidence), self.event_type, self.severity
+
+class RuleSet:
+    """
+    Correlation rules compiled from a declarative table (see data/rules.json).
+
+    `proxies` turns a cluster's evidence counts into proxy confidences;
+    `rules` are tried top to bottom and the first match decides the event,
+    like the if/elif chain they replace. Every condition only gets easier
+    to meet as a cluster grows, so a cluster's winning rule can only move
+    up the table: `improve` re-checks just the rules above the current
+    winner that are indexed under the categories a new signal added to,
+    and `best` starts from the rules indexed under whatever is present.
+    """
+    def __init__(self, table: dict, source: str = ""):
+        self.source = source
+        self.proxies: Dict[str, dict] = {}
+        for name, spec in table.get("proxies", {}).items():
+            if "category" not in spec or not ("confidence" in spec or "tiers" in spec):
+                raise ValueError(f"proxy {name!r} needs a category and a confidence range or tiers")
+            spec = dict(spec)
+            if "tiers" in spec:
+                spec["tiers"] = sorted((int(n), float(c)) for n, c in spec["tiers"])[::-1]
+            self.proxies[name] = spec
+
+        self.rules = [Rule(i, spec, self.proxies) for i, spec in enumerate(table.get("rules", []))]
+        if not self.rules or self.rules[-1].keys or self.rules[-1].requires:
+            raise ValueError("the last rule must be an unconditional fallback")
+        self.fallback = len(self.rules) - 1
+        self.index: Dict[str, List[int]] = {}
+        for rule in self.rules:
+            for key in rule.keys:
+                self.index.setdefault(key, []).append(rule.index)
+        self.referenced = set(self.index) - {ANY_SOURCE}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_RULES) -> "RuleSet":
+        with open(path) as f:
+            return cls(json.load(f), source=path)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def proxy_details(self, counts: Dict[str, int]) -> Dict[str, float]:
+        """Confidence contribution of every proxy the cluster has evidence for."""
+        details = {}
+        for name, spec in self.proxies.items():
+            n = counts.get(spec["category"], 0)
+            if not n:
+                continue
+            if "tiers" in spec:
+                conf = next((c for at_least, c in spec["tiers"] if n >= at_least), None)
+                if conf is not None:
+                    details[name] = conf
+            else:
+                details[name] = random.uniform(*spec["confidence"])
+        return details
+
+    def best(self, proxy_details: Dict[str, float], counts: Dict[str, int]) -> int:
+        """Index of the first matching rule, trying only rules indexed under present evidence."""
+        present = {c for c, n in counts.items() if n} | {self.proxies[p]["category"] for p in proxy_details}
+        lists = [self.index[k] for k in present | {ANY_SOURCE} if k in self.index]
+        last = None
+        for i in heapq.merge(*lists):
+            if i != last and self.rules[i].matches(proxy_details, counts):
+                return i
+            last = i
+        return self.fallback
+
+    def improve(self, winner: int, categories: Iterable[str], proxy_details: Dict[str, float],
+                counts: Dict[str, int], new_source: bool = True) -> int:
+        """
+        The winning rule after a signal added to `categories`, given the
+        previous winner. Rules counting sources are only re-checked when the
+        signal brought a category the cluster did not have (`new_source`).
+        """
+        keys = (*categories, ANY_SOURCE) if new_source else categories
+        for key in keys:
+            for i in self.index.get(key, ()):
+                if i >= winner:
+                    break
+                if self.rules[i].matches(proxy_details, counts):
+                    winner = i
+                    break
+        return winner
+
+    def describe(self) -> dict:
+        return {"source": self.source, "proxies": list(self.proxies), "rules": len(self.rules),
+                "indexed_categories": {k: len(v) for k, v in self.index.items()}}
+
+class RuleFile:
+    """
+    Hot reload: watches a rule table file and hands every version that
+    compiles to `apply`. A broken edit is reported and the rules already
+    in force stay in force.
+    """
+    def __init__(self, path: str, apply: Callable[[RuleSet], None], poll_interval: float = 2.0):
+        self.path = path
+        self.apply = apply
+        self.poll_interval = poll_interval
+        self._mtime = os.stat(path).st_mtime if os.path.exists(path) else None
+        self.stats = {"reloads": 0, "errors": 0, "last_error": None}
+
+    def reload(self) -> RuleSet:
+        try:
+            self._mtime = os.stat(self.path).st_mtime
+            rules = RuleSet.load(self.path)
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            self.stats["errors"] += 1
+            self.stats["last_error"] = f"{type(e).__name__}: {e}"
+            raise
+        self.apply(rules)
+        self.stats["reloads"] += 1
+        self.stats["last_error"] = None
+        return rules
+
+    def check(self) -> Optional[RuleSet]:
+        """Reloads if the file changed since the last load."""
+        if not os.path.exists(self.path) or os.stat(self.path).st_mtime == self._mtime:
+            return None
+        try:
+            return self.reload()
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            print(f"--- Rule reload failed, keeping current rules: {e} ---")
+            return None
+
+    async def run(self):
+        while True:
+            self.check()
+            await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,105 @@
+import heapq
+import math
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LNG_EQUATOR = 111.320
+
+class KDTree:
+    """
+    Static 2-d tree over [lat, lng] points, projected to a local
+    equirectangular km plane so distances are Euclidean. Rebuild rather than
+    mutate: construction is O(n log^2 n) and a new tree can be swapped in
+    while readers keep using the old one.
+    """
+    def __init__(self, coords: Sequence[Sequence[float]], keys: Sequence[Hashable], ref_lat: Optional[float] = None):
+        if ref_lat is None:
+            ref_lat = sum(c[0] for c in coords) / len(coords) if coords else 0.0
+        self.kx = KM_PER_DEG_LNG_EQUATOR * math.cos(math.radians(ref_lat))
+        self.ky = KM_PER_DEG_LAT
+        pts = [(c[1] * self.kx, c[0] * self.ky, key) for c, key in zip(coords, keys)]
+
+        # Flat node arrays: faster to walk than node objects
+        self.x: List[float] = []
+        self.y: List[float] = []
+        self.key: List[Hashable] = []
+        self.left: List[int] = []
+        self.right: List[int] = []
+        self.axis: List[int] = []
+        self.root = self._build(pts, 0)
+
+    def __len__(self):
+        return len(self.key)
+
+    def _build(self, pts: list, depth: int) -> int:
+        if not pts:
+            return -1
+        axis = depth & 1
+        pts.sort(key=lambda p: p[axis])
+        mid = len(pts) // 2
+        px, py, key = pts[mid]
+        idx = len(self.key)
+        self.x.append(px)
+        self.y.append(py)
+        self.key.append(key)
+        self.axis.append(axis)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.left[idx] = self._build(pts[:mid], depth + 1)
+        self.right[idx] = self._build(pts[mid + 1:], depth + 1)
+        return idx
+
+    def project(self, lat: float, lng: float) -> Tuple[float, float]:
+        return lng * self.kx, lat * self.ky
+
+    def nearest(self, lat: float, lng: float, k: int = 1, max_km: float = math.inf) -> List[Tuple[float, Hashable]]:
+        """Returns up to k (distance_km, key) pairs, closest first."""
+        if self.root < 0 or k <= 0:
+            return []
+        qx, qy = lng * self.kx, lat * self.ky
+        best: List[Tuple[float, int]] = []  # max-heap on squared distance via negation
+        bound = max_km * max_km
+        xs, ys, lefts, rights, axes = self.x, self.y, self.left, self.right, self.axis
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            dx = xs[node] - qx
+            dy = ys[node] - qy
+            d2 = dx * dx + dy * dy
+            if d2 <= bound:
+                if len(best) < k:
+                    heapq.heappush(best, (-d2, node))
+                    if len(best) == k:
+                        bound = -best[0][0]
+                elif d2 < -best[0][0]:
+                    heapq.heapreplace(best, (-d2, node))
+                    bound = -best[0][0]
+            diff = dx if axes[node] == 0 else dy
+            near, far = (lefts[node], rights[node]) if diff > 0 else (rights[node], lefts[node])
+            # Far side is pushed first so the near side is explored first
+            if far >= 0 and diff * diff <= bound:
+                stack.append(far)
+            if near >= 0:
+                stack.append(near)
+        return [(math.sqrt(-d), self.key[n]) for d, n in sorted(best, reverse=True)]
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[Tuple[float, Hashable]]:
+        """All (distance_km, key) pairs within radius_km, closest first."""
+        if self.root < 0:
+            return []
+        qx, qy = lng * self.kx, lat * self.ky
+        r2 = radius_km * radius_km
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            dx = self.x[node] - qx
+            dy = self.y[node] - qy
+            if dx * dx + dy * dy <= r2:
+                found.append((math.hypot(dx, dy), self.key[node]))
+            diff = dx if self.axis[node] == 0 else dy
+            if self.left[node] >= 0 and (diff > 0 or diff * diff <= r2):
+                stack.append(self.left[node])
+            if self.right[node] >= 0 and (diff <= 0 or diff * diff <= r2):
+                stack.append(self.right[node])
+        return sorted(found)
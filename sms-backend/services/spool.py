@@ -0,0 +1,272 @@
+import asyncio
+import csv
+import gzip
+import hashlib
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from models import Signal
+
+SUFFIXES = (".csv", ".ndjson", ".jsonl", ".csv.gz", ".ndjson.gz", ".jsonl.gz")
+SIGNAL_FIELDS = ("id", "timestamp", "type", "source", "location", "value")
+
+def _record(raw: dict) -> dict:
+    """Normalises a CSV row or NDJSON object into Signal keyword arguments."""
+    rec = {k: raw[k] for k in SIGNAL_FIELDS if raw.get(k) not in (None, "")}
+    metadata = raw.get("metadata") or {}
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+    # Unknown CSV columns are kept as metadata
+    metadata.update({k: v for k, v in raw.items() if k not in SIGNAL_FIELDS + ("metadata", "coords", "lat", "lng") and v not in (None, "")})
+    coords = raw.get("coords") or [raw.get("lat"), raw.get("lng")]
+    rec["coords"] = [float(coords[0]), float(coords[1])]
+    rec["value"] = float(rec["value"])
+    rec.setdefault("type", "sensor")
+    rec.setdefault("location", "Unknown Sector")
+    if "source" not in rec:
+        raise ValueError("missing source")
+    rec["metadata"] = metadata
+    return rec
+
+def _parse_row(raw) -> Optional[Signal]:
+    # Signal validation (pydantic's ValidationError is a ValueError) rejects e.g. numeric timestamps
+    try:
+        return Signal(**_record(raw))
+    except (ValueError, TypeError, KeyError, IndexError, AttributeError):
+        return None
+
+def read_spool(path: str, pos: int = 0) -> Iterator[Tuple[int, Optional[Signal]]]:
+    """
+    Streams one spool file from byte `pos` of its (decompressed) contents,
+    yielding (position after the row, Signal) for every row. A row that
+    does not parse or validate yields None instead and the stream goes on;
+    a truncated gzip ends it with a final None.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        header = None
+        if ".csv" in os.path.basename(path):
+            first = f.readline()
+            header = next(csv.reader([first.decode("utf-8")]), [])
+            pos = max(pos, len(first))
+        if pos:
+            f.seek(pos)
+        end = pos
+
+        def lines():
+            nonlocal end
+            for line in f:
+                end += len(line)
+                yield line
+
+        try:
+            if header is None:
+                for line in lines():
+                    if not line.strip():
+                        continue
+                    try:
+                        raw = json.loads(line)
+                    except ValueError:
+                        raw = None
+                    yield end, _parse_row(raw) if raw is not None else None
+                return
+            rows = csv.reader(line.decode("utf-8", "replace") for line in lines())
+            while True:
+                try:
+                    row = next(rows)
+                except StopIteration:
+                    return
+                except csv.Error:
+                    yield end, None
+                    continue
+                if row:
+                    yield end, _parse_row(dict(zip(header, row)))
+        except (EOFError, OSError, zlib.error):
+            yield end, None  # truncated gzip: keep what parsed
+
+def spool_digest(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def parse_spool_chunk(path: str, pos: int = 0, limit: int = 20000) -> dict:
+    """
+    Runs in a worker process: parses up to `limit` rows of a spool file
+    from byte `pos`, so a large file reaches the engine chunk by chunk.
+    """
+    rows = list(islice(read_spool(path, pos), limit))
+    return {"rows": rows, "eof": len(rows) < limit}
+
+class SpoolIngestor:
+    """
+    Watches a spool directory for CSV / NDJSON (optionally gzipped) batches
+    dropped by Guardian nodes or partner syncs.
+
+    Files are picked up once their size and mtime have been stable for
+    `settle_s`, parsed in a process pool `chunk_rows` rows at a time (the
+    next chunk is parsed while the current one is fed to `submit`), and fed
+    in batches. A batch counts as ingested once admission took every signal
+    in it: whatever was shed is resubmitted with backoff. After every batch
+    the file's row offset and byte position are committed to the checkpoint
+    (rewritten atomically), so a restart resumes mid-file and finished
+    files -- or byte-identical copies under another name -- are never
+    ingested twice.
+    """
+    def __init__(self, directory: str, submit: Callable[[Signal], Awaitable], checkpoint_path: Optional[str] = None,
+                 workers: int = 2, batch_size: int = 500, chunk_rows: int = 20000, poll_interval: float = 2.0,
+                 settle_s: float = 1.0, retry_s: float = 0.05):
+        self.directory = directory
+        self.submit = submit
+        self.checkpoint_path = checkpoint_path or os.path.join(directory, ".sada_checkpoint.json")
+        self.workers = workers
+        self.batch_size = batch_size
+        self.chunk_rows = chunk_rows
+        self.retry_s = retry_s
+        self.poll_interval = poll_interval
+        self.settle_s = settle_s
+        self.files: Dict[str, dict] = {}
+        self.done_hashes = set()
+        self._seen: Dict[str, tuple] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.stats = {"files": 0, "duplicate_files": 0, "records": 0, "errors": 0, "batches": 0, "shed_retries": 0}
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+            self.files = state.get("files", {})
+            self.done_hashes = {e["sha1"] for e in self.files.values() if e.get("done")}
+
+    def _save_checkpoint(self):
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"files": self.files}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint_path)
+
+    def pending(self) -> List[str]:
+        """Settled spool files not yet fully ingested, oldest first."""
+        ready = []
+        for entry in os.scandir(self.directory):
+            name = entry.name
+            if not entry.is_file() or name.startswith(".") or not name.endswith(SUFFIXES):
+                continue
+            st = entry.stat()
+            state = (st.st_size, st.st_mtime)
+            known = self.files.get(name)
+            if known and known.get("done") and (known["size"], known["mtime"]) == state:
+                continue
+            # Still being copied if size/mtime moved since the last scan
+            if self._seen.get(name) != state:
+                self._seen[name] = state
+                if self.settle_s > 0:
+                    continue
+            ready.append((st.st_mtime, name))
+        return [name for _, name in sorted(ready)]
+
+    async def scan(self) -> int:
+        """Ingests every settled file; returns the number of records ingested."""
+        names = self.pending()
+        if not names:
+            return 0
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        loop = asyncio.get_running_loop()
+        digests = {name: loop.run_in_executor(self._pool, spool_digest, os.path.join(self.directory, name))
+                   for name in names}
+        ingested = 0
+        # Ingest in arrival order so a restart resumes the same file first
+        for name in names:
+            ingested += await self._ingest(name, await digests[name])
+        return ingested
+
+    async def _submit_all(self, signals: List[Signal]) -> int:
+        """
+        Submits a batch; signals admission shed are resubmitted until all of
+        it is in. Returns how many failed to ingest -- counted, not retried.
+        """
+        delay, failed = self.retry_s, 0
+        while signals:
+            results = await asyncio.gather(*(self.submit(sig) for sig in signals), return_exceptions=True)
+            shed = []
+            for sig, events in zip(signals, results):
+                if isinstance(events, Exception):
+                    print(f"--- Spool record {sig.id} failed to ingest: {events} ---")
+                    failed += 1
+                elif events is None:
+                    shed.append(sig)
+            signals = shed
+            if signals:
+                self.stats["shed_retries"] += len(signals)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 1.0)
+        return failed
+
+    async def _ingest(self, name: str, sha1: str) -> int:
+        path = os.path.join(self.directory, name)
+        st = os.stat(path)
+        entry = self.files.get(name)
+        if not entry or entry["sha1"] != sha1 or "pos" not in entry:
+            entry = {"sha1": sha1, "offset": 0, "pos": 0, "records": 0, "errors": 0, "done": False}
+        entry.update(size=st.st_size, mtime=st.st_mtime)
+        self.files[name] = entry
+
+        if sha1 in self.done_hashes:
+            entry.update(done=True, duplicate=True)
+            self.stats["duplicate_files"] += 1
+            self._save_checkpoint()
+            return 0
+
+        loop = asyncio.get_running_loop()
+        parse = lambda pos: loop.run_in_executor(self._pool, parse_spool_chunk, path, pos, self.chunk_rows)
+        ingested, errors = 0, 0
+        chunk = await parse(entry["pos"])
+        while True:
+            rows = chunk["rows"]
+            ahead = None if chunk["eof"] else parse(rows[-1][0])
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                signals = [sig for _, sig in batch if sig is not None]
+                failed = await self._submit_all(signals)
+                entry["offset"] += len(batch)
+                entry["pos"] = batch[-1][0]
+                entry["records"] += len(signals) - failed
+                entry["errors"] += len(batch) - len(signals) + failed
+                ingested += len(signals) - failed
+                errors += len(batch) - len(signals) + failed
+                self.stats["batches"] += 1
+                self._save_checkpoint()
+            if ahead is None:
+                break
+            chunk = await ahead
+
+        entry["done"] = True
+        self.done_hashes.add(sha1)
+        self._save_checkpoint()
+        self.stats["files"] += 1
+        self.stats["records"] += ingested
+        self.stats["errors"] += errors
+        return ingested
+
+    async def run(self):
+        try:
+            while True:
+                try:
+                    await self.scan()
+                except Exception as e:
+                    print(f"--- Spool scan error: {e} ---")
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
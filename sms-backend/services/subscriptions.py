@@ -0,0 +1,123 @@
+import math
+from typing import Dict, List, Set, Tuple
+from models import Subscription, Event
+
+SEVERITY_RANK = {"info": 0, "warning": 1, "critical": 2}
+
+# Grid levels in degrees. Each geofence is indexed on the finest level where
+# its bbox covers at most MAX_CELLS cells, so both tiny radii and whole-city
+# polygons cost a handful of entries and a match is one lookup per level.
+LEVELS = (0.0025, 0.01, 0.04, 0.16, 0.64, 2.56, 10.24)
+MAX_CELLS = 16
+
+def _point_in_polygon(lat: float, lng: float, polygon: List[List[float]]) -> bool:
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        yi, xi = polygon[i][0], polygon[i][1]
+        yj, xj = polygon[j][0], polygon[j][1]
+        if (yi > lat) != (yj > lat) and lng < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+EARTH_RADIUS_KM = 6371
+
+def _haversine_km(a, b):
+    R = EARTH_RADIUS_KM
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * R * math.asin(math.sqrt(h))
+
+def _bbox(sub: Subscription) -> Tuple[float, float, float, float]:
+    if sub.polygon:
+        lats = [p[0] for p in sub.polygon]
+        lngs = [p[1] for p in sub.polygon]
+        return min(lats), min(lngs), max(lats), max(lngs)
+    # Same sphere as the haversine test, padded 1% so the bbox never clips a match
+    dlat = math.degrees(sub.radius_km / EARTH_RADIUS_KM) * 1.01
+    dlng = dlat / max(0.01, math.cos(math.radians(abs(sub.center[0]) + dlat)))
+    return sub.center[0] - dlat, sub.center[1] - dlng, sub.center[0] + dlat, sub.center[1] + dlng
+
+class SubscriptionRegistry:
+    """
+    Geofenced alert subscriptions (polygons or radii) with event-type and
+    minimum-severity filters, indexed on a multi-level lat/lng grid.
+    """
+    def __init__(self):
+        self.subscriptions: Dict[str, Subscription] = {}
+        self.index: Dict[Tuple[int, int, int], Set[str]] = {}
+        self._cells: Dict[str, List[Tuple[int, int, int]]] = {}
+        # Plain tuples for the hot match loop: (min_rank, event_types, bbox, polygon, center, radius_km)
+        self._compiled: Dict[str, tuple] = {}
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def add(self, sub: Subscription) -> Subscription:
+        if not sub.polygon and not (sub.center and sub.radius_km):
+            raise ValueError("Subscription needs a polygon or a center and radius_km")
+        if sub.polygon and len(sub.polygon) < 3:
+            raise ValueError("Polygon needs at least 3 points")
+        if sub.min_severity not in SEVERITY_RANK:
+            raise ValueError(f"Unknown severity '{sub.min_severity}'")
+        if sub.id in self.subscriptions:
+            self.remove(sub.id)
+
+        bbox = _bbox(sub)
+        min_lat, min_lng, max_lat, max_lng = bbox
+        self._compiled[sub.id] = (
+            SEVERITY_RANK[sub.min_severity],
+            frozenset(sub.event_types) if sub.event_types else None,
+            bbox,
+            [(p[0], p[1]) for p in sub.polygon] if sub.polygon else None,
+            sub.center,
+            sub.radius_km,
+        )
+        for level, size in enumerate(LEVELS):
+            r0, r1 = math.floor(min_lat / size), math.floor(max_lat / size)
+            c0, c1 = math.floor(min_lng / size), math.floor(max_lng / size)
+            if (r1 - r0 + 1) * (c1 - c0 + 1) <= MAX_CELLS or level == len(LEVELS) - 1:
+                break
+        cells = [(level, r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+        for cell in cells:
+            self.index.setdefault(cell, set()).add(sub.id)
+        self._cells[sub.id] = cells
+        self.subscriptions[sub.id] = sub
+        return sub
+
+    def remove(self, sub_id: str) -> bool:
+        if sub_id not in self.subscriptions:
+            return False
+        for cell in self._cells.pop(sub_id):
+            ids = self.index.get(cell)
+            if ids:
+                ids.discard(sub_id)
+                if not ids:
+                    del self.index[cell]
+        del self.subscriptions[sub_id]
+        del self._compiled[sub_id]
+        return True
+
+    def match_point(self, coords: List[float], event_type: str = None, severity: str = "info") -> List[Subscription]:
+        lat, lng = coords[0], coords[1]
+        rank = SEVERITY_RANK.get(severity, 0)
+        compiled = self._compiled
+        matched = []
+        for level, size in enumerate(LEVELS):
+            for sub_id in self.index.get((level, math.floor(lat / size), math.floor(lng / size)), ()):
+                min_rank, types, bbox, polygon, center, radius_km = compiled[sub_id]
+                if min_rank > rank or (types is not None and event_type not in types):
+                    continue
+                if not (bbox[0] <= lat <= bbox[2] and bbox[1] <= lng <= bbox[3]):
+                    continue
+                if polygon is not None:
+                    if not _point_in_polygon(lat, lng, polygon):
+                        continue
+                elif _haversine_km(coords, center) > radius_km:
+                    continue
+                matched.append(self.subscriptions[sub_id])
+        return matched
+
+    def match(self, event: Event) -> List[Subscription]:
+        return self.match_point(event.coords, event.type, event.severity)
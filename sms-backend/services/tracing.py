@@ -0,0 +1,125 @@
+import itertools
+import os
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+# Trace of the signal being ingested, so engine listeners can attribute their work
+current_trace: ContextVar[Optional[str]] = ContextVar("sada_trace", default=None)
+
+class Trace:
+    __slots__ = ("id", "kind", "started_at", "t0", "attrs", "spans", "end")
+
+    def __init__(self, trace_id: str, kind: str, attrs: dict):
+        self.id = trace_id
+        self.kind = kind
+        self.started_at = time.time()
+        self.t0 = time.perf_counter()
+        self.attrs = attrs
+        self.spans: List[tuple] = []  # (stage, offset_ms, duration_ms, attrs)
+        self.end = 0.0  # ms from receipt to the end of the last span
+
+    def summary(self, spans: bool = False) -> dict:
+        stages: Dict[str, float] = {}
+        for stage, _, duration, _ in self.spans:
+            stages[stage] = round(stages.get(stage, 0.0) + duration, 3)
+        out = {"trace_id": self.id, "kind": self.kind, "received_at": self.started_at,
+               "total_ms": round(self.end, 3), "attrs": self.attrs, "stages": stages}
+        if spans:
+            out["spans"] = [{"stage": s, "offset_ms": round(o, 3), "duration_ms": round(d, 3), **a}
+                            for s, o, d, a in self.spans]
+        return out
+
+class Tracer:
+    """
+    Per-report latency traces. A trace starts when a report is received and
+    its ID travels with the report's signal (metadata["trace_id"]) and with
+    the verification signals it triggers, so every stage up to the outbound
+    alert lands in the same trace.
+
+    Traces live in a ring of the `capacity` most recent ones; each keeps at
+    most `max_spans` spans. Span offsets are measured from receipt, so a
+    trace's total is receipt -> end of its last span.
+    """
+    def __init__(self, capacity: int = 2048, max_spans: int = 64):
+        self.capacity = capacity
+        self.max_spans = max_spans
+        self.traces: "OrderedDict[str, Trace]" = OrderedDict()
+        self.event_traces: "OrderedDict[str, str]" = OrderedDict()  # event ID -> trace that created it
+        self.dropped_spans = 0
+        # Per-process random prefix + counter: unique IDs without a uuid4() per report
+        self._prefix = os.urandom(4).hex()
+        self._ids = itertools.count(1)
+
+    def start(self, kind: str, **attrs) -> str:
+        trace = Trace(f"{self._prefix}{next(self._ids):08x}", kind, attrs)
+        self.traces[trace.id] = trace
+        if len(self.traces) > self.capacity:
+            self.traces.popitem(last=False)
+        return trace.id
+
+    def record(self, trace_id: Optional[str], stage: str, start: float, end: Optional[float] = None, **attrs):
+        """Adds a span given perf_counter() start/end; unknown or evicted traces are ignored."""
+        trace = self.traces.get(trace_id) if trace_id else None
+        if trace is None:
+            return
+        if len(trace.spans) >= self.max_spans:
+            self.dropped_spans += 1
+            return
+        end = time.perf_counter() if end is None else end
+        offset = (start - trace.t0) * 1000
+        duration = (end - start) * 1000
+        trace.spans.append((stage, offset, duration, attrs))
+        trace.end = max(trace.end, offset + duration)
+
+    def mark(self, trace_id: Optional[str], stage: str, **attrs):
+        """A zero-length milestone (event created, verified, ...)."""
+        now = time.perf_counter()
+        self.record(trace_id, stage, now, now, **attrs)
+
+    def annotate(self, trace_id: Optional[str], **attrs):
+        trace = self.traces.get(trace_id) if trace_id else None
+        if trace is not None:
+            trace.attrs.update(attrs)
+
+    def link_event(self, event_id: str, trace_id: Optional[str]):
+        if trace_id and event_id not in self.event_traces:
+            self.event_traces[event_id] = trace_id
+            if len(self.event_traces) > self.capacity:
+                self.event_traces.popitem(last=False)
+
+    def trace_for_event(self, event_id: str) -> Optional[str]:
+        return self.event_traces.get(event_id)
+
+    def get(self, trace_id: str) -> Optional[dict]:
+        trace = self.traces.get(trace_id)
+        return trace.summary(spans=True) if trace else None
+
+    def slowest(self, limit: int = 20, kind: str = "", stage: str = "") -> List[dict]:
+        """The slowest traces in the ring, with per-stage totals; `stage` ranks by that stage alone."""
+        traces = [t for t in self.traces.values() if not kind or t.kind == kind]
+        if stage:
+            key = lambda t: sum(d for s, _, d, _ in t.spans if s == stage)
+        else:
+            key = lambda t: t.end
+        return [t.summary() for t in sorted(traces, key=key, reverse=True)[:limit]]
+
+    def stage_stats(self, kind: str = "") -> Dict[str, dict]:
+        """Per-stage duration percentiles across the traces in the ring."""
+        durations: Dict[str, List[float]] = {}
+        for trace in self.traces.values():
+            if kind and trace.kind != kind:
+                continue
+            for stage, _, duration, _ in trace.spans:
+                durations.setdefault(stage, []).append(duration)
+        stats = {}
+        for stage, values in durations.items():
+            values.sort()
+            pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))], 3)
+            stats[stage] = {"count": len(values), "p50_ms": pick(0.5), "p95_ms": pick(0.95),
+                            "p99_ms": pick(0.99), "max_ms": round(values[-1], 3)}
+        return stats
+
+    def stats(self) -> dict:
+        return {"traces": len(self.traces), "capacity": self.capacity, "dropped_spans": self.dropped_spans}
@@ -1,8 +1,91 @@
-import { Polyline, Circle, Popup } from "react-leaflet";
+import { useEffect, useState } from "react";
+import { Polyline, Circle, CircleMarker, Popup, useMap } from "react-leaflet";
+import { toast } from "sonner";
 
 export function ElectricityLayer() {
+    const map = useMap();
+    const [lines, setLines] = useState<any[]>([]);
+    const [stations, setStations] = useState<any[]>([]);
+
+    // Fetch the power network from the backend's cached local OSM extract
+    useEffect(() => {
+        const fetchPowerInfra = async () => {
+            // Greater Khartoum / Omdurman / Bahri, same area as the water layer
+            const bbox = "32.30,15.40,32.75,15.80";
+            const zoom = Math.round(map.getZoom());
+
+            try {
+                const response = await fetch(`/layers/power?bbox=${bbox}&zoom=${zoom}`);
+
+                if (!response.ok) throw new Error("Power Layer Fetch Failed");
+
+                const data = await response.json();
+
+                // GeoJSON is [lng, lat]; Leaflet wants [lat, lng]
+                const toLatLng = (coords: number[][]) => coords.map(([lng, lat]) => [lat, lng] as [number, number]);
+                const ways: any[] = [];
+                const points: any[] = [];
+                (data.features || []).forEach((f: any, idx: number) => {
+                    const props = f.properties || {};
+                    const type = props.power || props.kind || "line";
+                    const id = props.id || `power-${idx}`;
+                    if (f.geometry.type === "LineString") {
+                        ways.push({ id, type, positions: toLatLng(f.geometry.coordinates) });
+                    } else if (f.geometry.type === "MultiLineString") {
+                        f.geometry.coordinates.forEach((line: number[][], i: number) => ways.push({ id: `${id}-${i}`, type, positions: toLatLng(line) }));
+                    } else if (f.geometry.type === "Point") {
+                        const [lng, lat] = f.geometry.coordinates;
+                        points.push({ id, type, name: props.name, center: [lat, lng] as [number, number] });
+                    }
+                });
+
+                setLines(ways);
+                setStations(points);
+                if (ways.length + points.length > 0) {
+                    toast.success(`Loaded ${ways.length} power lines from local OSM extract`);
+                } else {
+                    toast.info("No OSM power data found, using mapped grid");
+                }
+            } catch (e) {
+                console.error("Power Layer Error", e);
+                toast.error("Failed to load power infra, switching to mapped grid");
+            }
+        };
+
+        fetchPowerInfra();
+    }, []);
+
     return (
         <>
+            {/* Real OSM Power Network */}
+            {lines.map((l) => (
+                <Polyline
+                    key={l.id}
+                    positions={l.positions}
+                    pathOptions={{
+                        color: '#fbbf24', // Amber
+                        weight: l.type === "line" ? 2 : 1,
+                        opacity: 0.5
+                    }}
+                >
+                    <Popup>
+                        <span className="text-xs font-bold uppercase">{l.type} (OSM Extract)</span>
+                    </Popup>
+                </Polyline>
+            ))}
+            {stations.map((s) => (
+                <CircleMarker
+                    key={s.id}
+                    center={s.center}
+                    radius={4}
+                    pathOptions={{ color: '#f59e0b', fillColor: '#fbbf24', fillOpacity: 0.8, weight: 1 }}
+                >
+                    <Popup>
+                        <span className="text-xs font-bold uppercase">{s.name || s.type} (OSM Extract)</span>
+                    </Popup>
+                </CircleMarker>
+            ))}
+
             {/* High Voltage Transmission Lines - Yellow/Orange */}
             <Polyline
                 positions={[
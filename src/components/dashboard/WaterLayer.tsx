@@ -8,66 +8,47 @@ export function WaterLayer() {
     const [pipelines, setPipelines] = useState<any[]>([]);
     const [loading, setLoading] = useState(false);
 
-    // Fetch real water infrastructure from OpenStreetMap (Overpass API)
+    // Fetch water infrastructure from the backend's cached local OSM extract
     useEffect(() => {
         const fetchWaterInfra = async () => {
             if (loading || pipelines.length > 0) return;
             setLoading(true);
 
-            // Query for pipelines, canals, and drains in Khartoum area
-            // 15.635/32.485 is approx Omdurman/Khartoum center
-            // Query for pipelines, canals, and drains in Khartoum area
-            const query = `
-                [out:json];
-                (
-                  way["man_made"="pipeline"]["substance"="water"](around:25000, 15.589, 32.535);
-                  way["waterway"="canal"](around:25000, 15.589, 32.535);
-                  way["waterway"="drain"](around:25000, 15.589, 32.535);
-                );
-                out body;
-                >;
-                out skel qt;
-            `;
+            // Greater Khartoum / Omdurman / Bahri, same area the old Overpass query covered
+            const bbox = "32.30,15.40,32.75,15.80";
+            const zoom = Math.round(map.getZoom());
 
             try {
-                const response = await fetch("https://overpass-api.de/api/interpreter", {
-                    method: "POST",
-                    body: query
-                });
+                const response = await fetch(`/layers/water?bbox=${bbox}&zoom=${zoom}`);
 
-                if (!response.ok) throw new Error("OSM Fetch Failed");
+                if (!response.ok) throw new Error("Water Layer Fetch Failed");
 
                 const data = await response.json();
 
-                // Process Ways into LatLng Arrays
-                const nodes: Record<number, [number, number]> = {};
-                if (data.elements) {
-                    data.elements.forEach((el: any) => {
-                        if (el.type === "node") {
-                            nodes[el.id] = [el.lat, el.lon];
-                        }
-                    });
-
-                    const ways = data.elements
-                        .filter((el: any) => el.type === "way")
-                        .map((way: any) => ({
-                            id: way.id,
-                            type: way.tags.waterway || "pipeline",
-                            positions: way.nodes.map((nid: number) => nodes[nid]).filter(Boolean)
-                        }));
-
-                    setPipelines(ways);
-                    if (ways.length > 0) {
-                        toast.success(`Loaded ${ways.length} real water segments from OSM`);
-                    } else {
-                        // Fallback if OSM has no data for Khartoum (likely triggers)
-                        // Sudan OSM data is sparse, so we might need fallback static lines if this is empty
-                        toast.info("No OSM water data found, using estimated arteries");
+                // GeoJSON is [lng, lat]; Leaflet wants [lat, lng]
+                const toLatLng = (coords: number[][]) => coords.map(([lng, lat]) => [lat, lng] as [number, number]);
+                const ways = (data.features || []).flatMap((f: any, idx: number) => {
+                    const props = f.properties || {};
+                    const type = props.waterway || props.kind || "pipeline";
+                    const id = props.id || `water-${idx}`;
+                    if (f.geometry.type === "LineString") {
+                        return [{ id, type, positions: toLatLng(f.geometry.coordinates) }];
                     }
+                    if (f.geometry.type === "MultiLineString") {
+                        return f.geometry.coordinates.map((line: number[][], i: number) => ({ id: `${id}-${i}`, type, positions: toLatLng(line) }));
+                    }
+                    return [];
+                });
+
+                setPipelines(ways);
+                if (ways.length > 0) {
+                    toast.success(`Loaded ${ways.length} water segments from local OSM extract`);
+                } else {
+                    toast.info("No OSM water data found, using estimated arteries");
                 }
             } catch (e) {
                 console.error("Water Layer Error", e);
-                toast.error("Failed to load real water infra, switching to estimate");
+                toast.error("Failed to load water infra, switching to estimate");
             } finally {
                 setLoading(false);
             }
@@ -112,7 +93,7 @@ export function WaterLayer() {
                     }}
                 >
                     <Popup>
-                        <span className="text-xs font-bold uppercase">{p.type} (OSM Real Data)</span>
+                        <span className="text-xs font-bold uppercase">{p.type} (OSM Extract)</span>
                     </Popup>
                 </Polyline>
             ))}
@@ -24,6 +24,10 @@ export default defineConfig(({ mode }) => ({
       '/reciveSms': {
         target: 'http://localhost:8001',
         changeOrigin: true,
+      },
+      '/layers': {
+        target: 'http://localhost:8001',
+        changeOrigin: true,
       }
     },
     hmr: {